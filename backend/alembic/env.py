@@ -11,7 +11,7 @@ from sqlmodel import SQLModel
 # Import your models here so Alembic can detect them
 from app.models import (
     User, Exam, Question, Option, 
-    ExamSession, StudentAnswer, Tag
+    ExamSession, StudentAnswer, Tag, ExamStatistics
 )
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,30 @@
+"""Add examsession answer key hash
+
+Revision ID: 2f6d8b3a1c75
+Revises: 9a4c1e7b2d58
+Create Date: 2026-10-20 09:14:37.602184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6d8b3a1c75'
+down_revision: Union[str, Sequence[str], None] = '9a4c1e7b2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las sesiones en curso quedan sin huella y se corrigen completas al sellar
+    op.add_column('examsession', sa.Column('answer_key_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('examsession', 'answer_key_hash')
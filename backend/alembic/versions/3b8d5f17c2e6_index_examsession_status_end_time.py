@@ -0,0 +1,28 @@
+"""Index examsession status end_time
+
+Revision ID: 3b8d5f17c2e6
+Revises: a91f3c07be42
+Create Date: 2026-10-19 15:02:37.481920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8d5f17c2e6'
+down_revision: Union[str, Sequence[str], None] = 'a91f3c07be42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_examsession_status_end_time', 'examsession', ['status', 'end_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_examsession_status_end_time', table_name='examsession')
@@ -0,0 +1,28 @@
+"""Add examsession shuffle seed
+
+Revision ID: 5e0c7a3d9f14
+Revises: 3b8d5f17c2e6
+Create Date: 2026-10-19 16:21:09.553017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0c7a3d9f14'
+down_revision: Union[str, Sequence[str], None] = '3b8d5f17c2e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('examsession', sa.Column('shuffle_seed', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('examsession', 'shuffle_seed')
@@ -0,0 +1,30 @@
+"""Add regrade count watermark
+
+Revision ID: 6b1e9d4f2a83
+Revises: 2f6d8b3a1c75
+Create Date: 2026-10-20 11:02:53.418906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1e9d4f2a83'
+down_revision: Union[str, Sequence[str], None] = '2f6d8b3a1c75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('examstatistics', sa.Column('regrade_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('similarityreport', sa.Column('regrade_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('similarityreport', 'regrade_count')
+    op.drop_column('examstatistics', 'regrade_count')
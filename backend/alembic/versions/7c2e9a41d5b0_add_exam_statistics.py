@@ -0,0 +1,75 @@
+"""Add exam statistics
+
+Revision ID: 7c2e9a41d5b0
+Revises: 4de3509c4210
+Create Date: 2026-10-19 10:12:04.318220
+
+"""
+from typing import Sequence, Union
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9a41d5b0'
+down_revision: Union[str, Sequence[str], None] = '4de3509c4210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('examstatistics',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('attempt_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('score_sum_squares', sa.Float(), nullable=False),
+    sa.Column('score_histogram', sa.JSON(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.PrimaryKeyConstraint('exam_id')
+    )
+
+    # Rellenar los agregados a partir de las sesiones existentes
+    bind = op.get_bind()
+    stats: dict = {}
+    rows = bind.execute(sa.text(
+        "SELECT exam_id, status, score FROM examsession"
+    ))
+    for exam_id, status, score in rows:
+        entry = stats.setdefault(exam_id, {
+            "attempt_count": 0, "completed_count": 0,
+            "score_sum": 0.0, "score_sum_squares": 0.0,
+            "score_histogram": [0] * 10,
+        })
+        entry["attempt_count"] += 1
+        if status in ("COMPLETED", "EXPIRED") and score is not None:
+            entry["completed_count"] += 1
+            entry["score_sum"] += score
+            entry["score_sum_squares"] += score * score
+            entry["score_histogram"][max(0, min(int(score // 10), 9))] += 1
+
+    if stats:
+        table = sa.table('examstatistics',
+            sa.column('exam_id', sa.Integer()),
+            sa.column('created_at', sa.DateTime()),
+            sa.column('attempt_count', sa.Integer()),
+            sa.column('completed_count', sa.Integer()),
+            sa.column('score_sum', sa.Float()),
+            sa.column('score_sum_squares', sa.Float()),
+            sa.column('score_histogram', sa.JSON()),
+        )
+        now = datetime.utcnow()
+        op.bulk_insert(table, [
+            {"exam_id": exam_id, "created_at": now, **entry}
+            for exam_id, entry in stats.items()
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('examstatistics')
@@ -0,0 +1,28 @@
+"""Add user token version
+
+Revision ID: 8d2f6b4e1a37
+Revises: 5e0c7a3d9f14
+Create Date: 2026-10-19 17:05:44.120583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6b4e1a37'
+down_revision: Union[str, Sequence[str], None] = '5e0c7a3d9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'token_version')
@@ -0,0 +1,29 @@
+"""Add completed count watermark to similarity reports
+
+Revision ID: 9a4c1e7b2d58
+Revises: d7a2c5e9f381
+Create Date: 2026-10-19 23:58:41.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c1e7b2d58'
+down_revision: Union[str, Sequence[str], None] = 'd7a2c5e9f381'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los informes existentes quedan con 0 y se regeneran en la siguiente pasada
+    op.add_column('similarityreport', sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('similarityreport', 'completed_count')
@@ -0,0 +1,62 @@
+"""Unique student answer per question
+
+Revision ID: a91f3c07be42
+Revises: 7c2e9a41d5b0
+Create Date: 2026-10-19 12:40:51.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91f3c07be42'
+down_revision: Union[str, Sequence[str], None] = '7c2e9a41d5b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('studentanswer', sa.Column('selected_option_ids', sa.JSON(), nullable=True))
+
+    # Fusionar respuestas duplicadas: se conserva la más reciente de cada
+    # (session_id, question_id); en opción múltiple se guardan todas las opciones
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT sa.id, sa.session_id, sa.question_id, sa.selected_option_id, q.question_type "
+        "FROM studentanswer sa JOIN question q ON q.id = sa.question_id "
+        "ORDER BY sa.session_id, sa.question_id, sa.id"
+    )).all()
+
+    groups: dict = {}
+    for answer_id, session_id, question_id, option_id, question_type in rows:
+        groups.setdefault((session_id, question_id), []).append((answer_id, option_id, question_type))
+
+    for answers in groups.values():
+        if len(answers) < 2:
+            continue
+        keep_id = answers[-1][0]
+        if answers[-1][2] == 'MULTIPLE_CHOICE':
+            option_ids = sorted({option_id for _, option_id, _ in answers if option_id is not None})
+            bind.execute(
+                sa.text("UPDATE studentanswer SET selected_option_id = NULL, selected_option_ids = :ids WHERE id = :id")
+                .bindparams(sa.bindparam('ids', type_=sa.JSON())),
+                {"ids": option_ids, "id": keep_id},
+            )
+        bind.execute(
+            sa.text("DELETE FROM studentanswer WHERE id IN :ids").bindparams(sa.bindparam('ids', expanding=True)),
+            {"ids": [answer_id for answer_id, _, _ in answers[:-1]]},
+        )
+
+    op.create_unique_constraint(
+        'uq_studentanswer_session_question', 'studentanswer', ['session_id', 'question_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_studentanswer_session_question', 'studentanswer', type_='unique')
+    op.drop_column('studentanswer', 'selected_option_ids')
@@ -0,0 +1,48 @@
+"""Add exam score digest
+
+Revision ID: b6d1e8f4a027
+Revises: f3a9c6e2b748
+Create Date: 2026-10-19 21:58:36.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.core.tdigest import TDigest
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1e8f4a027'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c6e2b748'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('examstatistics', sa.Column('score_digest', sa.LargeBinary(), nullable=True))
+
+    # Construir el t-digest de cada examen con las puntuaciones ya corregidas
+    bind = op.get_bind()
+    digests: dict = {}
+    rows = bind.execute(sa.text(
+        "SELECT exam_id, score FROM examsession "
+        "WHERE status IN ('COMPLETED', 'EXPIRED') AND score IS NOT NULL"
+    ))
+    for exam_id, score in rows:
+        digests.setdefault(exam_id, TDigest(settings.SCORE_DIGEST_COMPRESSION)).add(score)
+
+    for exam_id, digest in digests.items():
+        bind.execute(
+            sa.text("UPDATE examstatistics SET score_digest = :digest WHERE exam_id = :exam_id")
+            .bindparams(sa.bindparam('digest', type_=sa.LargeBinary())),
+            {"digest": digest.to_bytes(), "exam_id": exam_id},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('examstatistics', 'score_digest')
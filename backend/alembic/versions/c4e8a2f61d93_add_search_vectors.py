@@ -0,0 +1,51 @@
+"""Add full-text search vectors
+
+Revision ID: c4e8a2f61d93
+Revises: 8d2f6b4e1a37
+Create Date: 2026-10-19 19:12:08.305417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f61d93'
+down_revision: Union[str, Sequence[str], None] = '8d2f6b4e1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Misma configuración de texto que la aplicación (validada en Settings: spanish o english)
+SEARCH_TEXT_CONFIG = settings.SEARCH_TEXT_CONFIG
+
+SEARCH_FIELDS = {
+    "exam": [("title", "A"), ("description", "B"), ("instructions", "C")],
+    "question": [("text", "A"), ("explanation", "B")],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for table, fields in SEARCH_FIELDS.items():
+        vector = " || ".join(
+            f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}'::regconfig, coalesce({column}, '')), '{weight}')"
+            for column, weight in fields
+        )
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED")
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in SEARCH_FIELDS:
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,38 @@
+"""Add similarity reports
+
+Revision ID: d7a2c5e9f381
+Revises: b6d1e8f4a027
+Create Date: 2026-10-19 22:47:09.513862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a2c5e9f381'
+down_revision: Union[str, Sequence[str], None] = 'b6d1e8f4a027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('similarityreport',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('generated_at', sa.DateTime(), nullable=False),
+    sa.Column('sessions_analyzed', sa.Integer(), nullable=False),
+    sa.Column('candidate_pairs', sa.Integer(), nullable=False),
+    sa.Column('pairs', sa.JSON(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.PrimaryKeyConstraint('exam_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('similarityreport')
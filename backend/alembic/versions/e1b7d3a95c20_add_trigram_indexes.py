@@ -0,0 +1,42 @@
+"""Add trigram indexes
+
+Revision ID: e1b7d3a95c20
+Revises: c4e8a2f61d93
+Create Date: 2026-10-19 20:03:51.917264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7d3a95c20'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a2f61d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_COLUMNS = {"exam": ["title", "subject"], "tag": ["name"]}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                f'ix_{table}_{column}_trgm', table, [column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
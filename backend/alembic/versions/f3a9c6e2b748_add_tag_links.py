@@ -0,0 +1,46 @@
+"""Add exam and question tag links
+
+Revision ID: f3a9c6e2b748
+Revises: e1b7d3a95c20
+Create Date: 2026-10-19 20:41:17.552034
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c6e2b748'
+down_revision: Union[str, Sequence[str], None] = 'e1b7d3a95c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('examtaglink',
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('exam_id', 'tag_id')
+    )
+    op.create_index(op.f('ix_examtaglink_tag_id'), 'examtaglink', ['tag_id'], unique=False)
+    op.create_table('questiontaglink',
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['question.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('question_id', 'tag_id')
+    )
+    op.create_index(op.f('ix_questiontaglink_tag_id'), 'questiontaglink', ['tag_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_questiontaglink_tag_id'), table_name='questiontaglink')
+    op.drop_table('questiontaglink')
+    op.drop_index(op.f('ix_examtaglink_tag_id'), table_name='examtaglink')
+    op.drop_table('examtaglink')
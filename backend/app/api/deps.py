@@ -1,12 +1,15 @@
-from typing import Generator, Annotated
-from fastapi import Depends, HTTPException, status
+from typing import Generator, Annotated, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
 
+from app.core.config import settings
 from app.core.database import get_session
-from app.core.security import verify_token
+from app.core.principal import Principal, PrincipalCache
+from app.core.revocation import TokenRevocationList
+from app.core.security import get_token_data
 from app.core.exceptions import authentication_error
-from app.models.user import User
+from app.models.user import User, UserRole
 
 # Security scheme
 security = HTTPBearer()
@@ -14,28 +17,91 @@ security = HTTPBearer()
 # Database dependency
 DatabaseSession = Annotated[Session, Depends(get_session)]
 
-def get_current_user_id(
+def get_client_ip(request: Request) -> Optional[str]:
+    """
+    IP real del cliente
+    Detrás de TRUSTED_PROXY_HOPS proxies la conexión llega desde el último proxy:
+    la IP del cliente es la que añadió el proxy más externo en X-Forwarded-For.
+    Las entradas anteriores las controla el cliente y no se usan.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return request.client.host if request.client else None
+
+def get_access_token_data(
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> str:
-    """Get current user ID from JWT token"""
-    token_data = verify_token(credentials.credentials)
+) -> dict:
+    """Datos del token de acceso; comprueba la revocación sin E/S en el caso habitual"""
+    token_data = get_token_data(credentials.credentials)
     if token_data is None:
         raise authentication_error("Could not validate credentials")
+    if TokenRevocationList.is_revoked(token_data["jti"]):
+        raise authentication_error("Token has been revoked")
     return token_data
 
+def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> str:
+    """Get current user ID from JWT token"""
+    return str(get_access_token_data(credentials)["user_id"])
+
 # Current user ID dependency
 CurrentUserId = Annotated[str, Depends(get_current_user_id)]
 
+def load_principal(user_id: int, session: Session) -> Optional[Principal]:
+    """Principal desde la caché o, si no está, con una consulta de columnas"""
+    principal = PrincipalCache.get(user_id)
+    if principal is not None:
+        return principal
+    # Una invalidación entre la consulta y el guardado descarta lo leído
+    generation = PrincipalCache.generation(user_id)
+    row = session.exec(
+        select(User.id, User.role, User.is_active, User.token_version).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    principal = Principal(user_id=row[0], role=UserRole(row[1]).value, is_active=row[2], token_version=row[3])
+    PrincipalCache.store(principal, generation)
+    return principal
+
+def get_current_principal(
+    session: Session = Depends(get_session),
+    token_data: dict = Depends(get_access_token_data)
+) -> Principal:
+    """Usuario autenticado sin cargar la fila completa (cacheado)"""
+    principal = load_principal(token_data["user_id"], session)
+    if principal is None:
+        raise authentication_error("User not found")
+    if not principal.is_active:
+        raise authentication_error("Inactive user")
+    if token_data["token_version"] != principal.token_version:
+        raise authentication_error("Token has been revoked")
+    return principal
+
+# Current principal dependency
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+def get_current_principal_id(principal: Principal = Depends(get_current_principal)) -> str:
+    """ID del usuario autenticado tras validar estado y versión del token"""
+    return str(principal.user_id)
+
 def get_current_user(
     session: Session = Depends(get_session),
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_principal_id)
 ) -> User:
-    """Get current user from database"""
-    user = session.exec(select(User).where(User.id == int(user_id))).first()
-    if not user:
+    """Get current user from database (solo para endpoints que necesitan la fila completa)"""
+    principal = load_principal(int(user_id), session)
+    if principal is None:
         raise authentication_error("User not found")
-    if not user.is_active:
+    if not principal.is_active:
         raise authentication_error("Inactive user")
+    user = session.get(User, principal.user_id)
+    if not user:
+        raise authentication_error("User not found")
     return user
 
 # Current user dependency
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .routers import auth, users, exams, questions, sessions
+from .routers import auth, users, exams, questions, sessions, search, tags, exports
 
 api_router = APIRouter()
 
@@ -13,3 +13,9 @@ api_router.include_router(exams.router)
 api_router.include_router(questions.router)
 # Include sessions router
 api_router.include_router(sessions.router)
+# Include search router
+api_router.include_router(search.router)
+# Include tags router
+api_router.include_router(tags.router)
+# Include exports router
+api_router.include_router(exports.router)
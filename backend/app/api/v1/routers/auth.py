@@ -1,33 +1,59 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
-from app.core.security import create_access_token, verify_password, get_password_hash
+from starlette.concurrency import run_in_threadpool
+from app.core.exceptions import authentication_error, rate_limit_error
+from app.core.login_throttle import LoginThrottle
+from app.core.revocation import TokenRevocationList
+from app.core.security import (
+    create_access_token, create_refresh_token, get_token_data, REFRESH_TOKEN,
+    verify_password_async, get_password_hash_async
+)
 from app.models.user import User, UserCreate, UserRead, UserLogin
-from app.models.auth import LoginResponse
-from app.api.deps import get_session, get_current_user
+from app.models.auth import LoginResponse, RefreshTokenRequest, LogoutRequest, TokenRefreshResponse
+from app.api.deps import get_session, get_current_user, get_access_token_data, get_client_ip
 
 router = APIRouter(tags=["auth"])
 
+def _get_user_by_email(email: str, session: Session):
+    return session.exec(select(User).where(User.email == email)).first()
+
+def _save_user(user: User, session: Session) -> User:
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
 @router.post("/register", response_model=UserRead)
-def register(user_in: UserCreate, session: Session = Depends(get_session)):
-    existing = session.exec(select(User).where(User.email == user_in.email)).first()
+async def register(user_in: UserCreate, session: Session = Depends(get_session)):
+    # Endpoint async: la BD va al threadpool y bcrypt al pool de hashing
+    existing = await run_in_threadpool(_get_user_by_email, user_in.email, session)
     if existing:
         raise HTTPException(status_code=400, detail="Email ya registrado")
     
     # Create user manually to handle password hashing
     user_data = user_in.model_dump(exclude={"password"})
     user = User(**user_data)
-    user.hashed_password = get_password_hash(user_in.password)
+    user.hashed_password = await get_password_hash_async(user_in.password)
     
-    session.add(user)
-    session.commit()
-    session.refresh(user)
-    return user
+    return await run_in_threadpool(_save_user, user, session)
 
 @router.post("/login", response_model=LoginResponse)
-def login(form_data: UserLogin, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.email)).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(
+    form_data: UserLogin,
+    session: Session = Depends(get_session),
+    client_ip: Optional[str] = Depends(get_client_ip)
+):
+    # El límite de intentos se aplica antes de tocar la BD o bcrypt
+    # (con Redis es E/S de red: al threadpool para no bloquear el bucle)
+    throttle = await run_in_threadpool(LoginThrottle.hit, form_data.email, client_ip)
+    if not throttle.allowed:
+        raise rate_limit_error(throttle.retry_after, "Demasiados intentos de login")
+
+    user = await run_in_threadpool(_get_user_by_email, form_data.email, session)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
+    await run_in_threadpool(LoginThrottle.record_success, form_data.email, client_ip, throttle)
     
     # Verificar que el usuario tenga ID (debe tenerlo si viene de la BD)
     if user.id is None:
@@ -36,14 +62,56 @@ def login(form_data: UserLogin, session: Session = Depends(get_session)):
     token = create_access_token(
         user_id=user.id,
         username=user.username,
-        role=user.role.value
+        role=user.role.value,
+        token_version=user.token_version
     )
     return LoginResponse(
         access_token=token,
         token_type="bearer",
-        current_user=UserRead.model_validate(user)
+        current_user=UserRead.model_validate(user),
+        refresh_token=create_refresh_token(user.id, user.token_version)
+    )
+
+@router.post("/refresh", response_model=TokenRefreshResponse)
+def refresh(request: RefreshTokenRequest, session: Session = Depends(get_session)):
+    """
+    Emite un token de acceso nuevo a partir de un refresh token
+    El refresh token se rota: el usado queda revocado
+    """
+    token_data = get_token_data(request.refresh_token, REFRESH_TOKEN)
+    if token_data is None or TokenRevocationList.is_revoked(token_data["jti"]):
+        raise authentication_error("Invalid refresh token")
+    
+    user = session.get(User, token_data["user_id"])
+    if not user or not user.is_active or user.id is None:
+        raise authentication_error("Invalid refresh token")
+    if token_data["token_version"] != user.token_version:
+        raise authentication_error("Token has been revoked")
+    
+    # Rotación de un solo uso: solo la primera petición con este token lo consume
+    if not TokenRevocationList.claim(token_data["jti"], token_data["expires_at"]):
+        raise authentication_error("Invalid refresh token")
+    return TokenRefreshResponse(
+        access_token=create_access_token(
+            user_id=user.id,
+            username=user.username,
+            role=user.role.value,
+            token_version=user.token_version
+        ),
+        refresh_token=create_refresh_token(user.id, user.token_version),
+        token_type="bearer"
     )
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: Optional[LogoutRequest] = None, token_data: dict = Depends(get_access_token_data)):
+    """Revoca el token de acceso actual y, si se envía, el refresh token"""
+    TokenRevocationList.revoke(token_data["jti"], token_data["expires_at"])
+    if request is not None and request.refresh_token:
+        refresh_data = get_token_data(request.refresh_token, REFRESH_TOKEN)
+        if refresh_data and refresh_data["user_id"] == token_data["user_id"]:
+            TokenRevocationList.revoke(refresh_data["jti"], refresh_data["expires_at"])
+    return None
+
 @router.get("/me", response_model=UserRead)
 def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Endpoint protegido para obtener información del usuario actual"""
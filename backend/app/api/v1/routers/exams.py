@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import Field
 from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError
 from app.core.database import get_session
-from app.models.exam import Exam, ExamCreate, ExamUpdate, ExamRead
-from app.services import ExamService
-from typing import List
+from app.models.exam import Exam, ExamCreate, ExamUpdate, ExamRead, ExamStatus
+from app.models.integrity import SimilarityReportRead
+from app.models.snapshot import StudentExamRead
+from app.models.statistics import ItemAnalysisReport, ScoreDistribution, ScorePercentileRank
+from app.models.tag import TagAssignment, TagRead
+from app.services import (
+    ExamService, ItemAnalysisService, ScoringService, SimilarityService, SnapshotService,
+    StatisticsService, TagService
+)
+from typing import Annotated, List
 
 router = APIRouter(prefix="/exams", tags=["exams"])
 
@@ -59,6 +67,7 @@ def update_exam(exam_id: int, exam: ExamUpdate, session: Session = Depends(get_s
     session.add(db_exam)
     session.commit()
     session.refresh(db_exam)
+    SnapshotService.invalidate(exam_id)
     return db_exam
 
 @router.delete("/{exam_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -70,6 +79,7 @@ def delete_exam(exam_id: int, session: Session = Depends(get_session)):
     
     session.delete(exam)
     session.commit()
+    SnapshotService.invalidate(exam_id)
     return None
 
 # =============================================================================
@@ -92,6 +102,19 @@ def archive_exam(exam_id: int, session: Session = Depends(get_session)):
     """
     return ExamService.archive_exam(exam_id, session)
 
+@router.get("/{exam_id}/snapshot", response_model=StudentExamRead)
+def get_exam_snapshot(exam_id: int, session: Session = Depends(get_session)):
+    """
+    Examen completo para el alumno (sin respuestas correctas)
+    Se sirve desde la caché de snapshots; solo exámenes publicados
+    """
+    snapshot = SnapshotService.get_snapshot(exam_id, session)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if snapshot.status != ExamStatus.PUBLISHED:
+        raise HTTPException(status_code=400, detail="Exam is not published")
+    return SnapshotService.to_student_view(snapshot)
+
 @router.get("/{exam_id}/statistics")
 def get_exam_statistics(exam_id: int, session: Session = Depends(get_session)):
     """
@@ -100,6 +123,65 @@ def get_exam_statistics(exam_id: int, session: Session = Depends(get_session)):
     """
     return ExamService.get_exam_statistics(exam_id, session)
 
+@router.get("/{exam_id}/statistics/distribution", response_model=ScoreDistribution)
+def get_score_distribution(
+    exam_id: int,
+    q: List[Annotated[float, Field(ge=0.0, le=1.0)]] = Query([]),
+    bins: int = Query(10, ge=1, le=100),
+    session: Session = Depends(get_session)
+):
+    """
+    Mediana, p90, percentiles arbitrarios (q=0.25&q=0.75) e histograma de puntuaciones
+    Se calculan sobre el t-digest del examen, sin recorrer sus sesiones
+    """
+    if not session.get(Exam, exam_id):
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return StatisticsService.get_distribution(exam_id, session, quantiles=q, bins=bins)
+
+@router.get("/{exam_id}/statistics/percentile-rank", response_model=ScorePercentileRank)
+def get_score_percentile_rank(
+    exam_id: int,
+    score: float = Query(..., ge=0.0, le=100.0),
+    session: Session = Depends(get_session)
+):
+    """Porcentaje de sesiones finalizadas del examen con menor puntuación que score"""
+    if not session.get(Exam, exam_id):
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return StatisticsService.get_percentile_rank(exam_id, score, session)
+
+@router.get("/{exam_id}/item-analysis", response_model=ItemAnalysisReport)
+def get_item_analysis(exam_id: int, session: Session = Depends(get_session)):
+    """
+    Análisis de ítems: tasa de acierto, discriminación, biserial puntual,
+    selección de distractores y alfa de Cronbach sobre las sesiones corregidas
+    Usa ItemAnalysisService (cálculo vectorizado, cacheado por versión del examen)
+    """
+    return ItemAnalysisService.get_report(exam_id, session)
+
+@router.get("/{exam_id}/similarity", response_model=SimilarityReportRead)
+def get_similarity_report(exam_id: int, session: Session = Depends(get_session)):
+    """
+    Último informe de pares de sesiones con respuestas sospechosamente similares
+    Lo regenera la tarea periódica cuando el examen tiene sesiones nuevas
+    """
+    return SimilarityService.get_report(exam_id, session)
+
+@router.post("/{exam_id}/similarity", response_model=SimilarityReportRead)
+def generate_similarity_report(exam_id: int, session: Session = Depends(get_session)):
+    """Genera ahora el informe de similitud del examen (MinHash + LSH)"""
+    return SimilarityService.generate_report(exam_id, session)
+
+@router.post("/{exam_id}/regrade")
+def regrade_exam(exam_id: int, session: Session = Depends(get_session)):
+    """
+    Vuelve a corregir todas las sesiones finalizadas de un examen
+    Útil tras corregir la clave de respuestas. Usa ScoringService (corrección por lotes)
+    """
+    exam = session.get(Exam, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return ScoringService.regrade_exam(exam_id, session)
+
 @router.get("/{exam_id}/validate")
 def validate_exam_for_publication(exam_id: int, session: Session = Depends(get_session)):
     """
@@ -112,3 +194,8 @@ def validate_exam_for_publication(exam_id: int, session: Session = Depends(get_s
         "can_publish": can_publish,
         "message": "Exam is ready for publication" if can_publish else "Exam needs at least one question"
     }
+
+@router.put("/{exam_id}/tags", response_model=List[TagRead])
+def set_exam_tags(exam_id: int, assignment: TagAssignment, session: Session = Depends(get_session)):
+    """Reemplazar las etiquetas de un examen"""
+    return TagService.set_exam_tags(exam_id, assignment.tag_ids, session)
@@ -0,0 +1,87 @@
+"""
+API endpoints para exportar preguntas y resultados de sesiones
+Las respuestas se envían en streaming: no se cargan todas las filas en memoria
+"""
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from typing import Callable, Dict, Iterator, List, Optional
+from app.core.database import get_session
+from app.models.export import ColumnarFormat, ExportCompression, ExportFormat
+from app.models.session import SessionStatus
+from app.services.export_service import (
+    ExportService, QUESTION_COLUMNS, QUESTION_CSV_FORMATTERS, SESSION_COLUMNS
+)
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+_MEDIA_TYPES = {ExportFormat.CSV: "text/csv; charset=utf-8", ExportFormat.NDJSON: "application/x-ndjson"}
+_COLUMNAR_MEDIA_TYPES = {
+    ColumnarFormat.PARQUET: "application/vnd.apache.parquet",
+    ColumnarFormat.ARROW: "application/vnd.apache.arrow.file",
+}
+
+def _export_response(
+    name: str,
+    rows: Iterator[dict],
+    columns: List[str],
+    export_format: ExportFormat,
+    compression: ExportCompression,
+    formatters: Optional[Dict[str, Callable[[dict], object]]] = None,
+) -> StreamingResponse:
+    if export_format == ExportFormat.CSV:
+        chunks = ExportService.to_csv(rows, columns, formatters)
+    else:
+        chunks = ExportService.to_ndjson(rows)
+    filename = f"{name}.{export_format.value}"
+    media_type = _MEDIA_TYPES[export_format]
+    if compression == ExportCompression.GZIP:
+        chunks = ExportService.gzip(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/questions")
+def export_questions(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    compression: ExportCompression = Query(ExportCompression.NONE),
+    exam_id: Optional[int] = Query(None),
+    db: Session = Depends(get_session)
+):
+    """Exportar preguntas con sus opciones"""
+    rows = ExportService.question_rows(db.get_bind(), exam_id=exam_id)
+    name = f"questions-exam-{exam_id}" if exam_id is not None else "questions"
+    return _export_response(name, rows, QUESTION_COLUMNS, format, compression, QUESTION_CSV_FORMATTERS)
+
+@router.get("/sessions")
+def export_sessions(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    compression: ExportCompression = Query(ExportCompression.NONE),
+    exam_id: Optional[int] = Query(None),
+    status: Optional[SessionStatus] = Query(None),
+    db: Session = Depends(get_session)
+):
+    """Exportar los resultados de las sesiones de examen"""
+    rows = ExportService.session_rows(db.get_bind(), exam_id=exam_id, status=status)
+    name = f"sessions-exam-{exam_id}" if exam_id is not None else "sessions"
+    return _export_response(name, rows, SESSION_COLUMNS, format, compression)
+
+@router.get("/answers")
+def export_answer_matrix(
+    format: ColumnarFormat = Query(ColumnarFormat.PARQUET),
+    exam_id: Optional[int] = Query(None),
+    status: Optional[SessionStatus] = Query(None),
+    db: Session = Depends(get_session)
+):
+    """Exportar la matriz de respuestas (estudiante × pregunta) en formato columnar"""
+    chunks = ExportService.answer_matrix(db.get_bind(), format, exam_id=exam_id, status=status)
+    name = f"answers-exam-{exam_id}" if exam_id is not None else "answers"
+    return StreamingResponse(
+        chunks,
+        media_type=_COLUMNAR_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format.value}"'},
+    )
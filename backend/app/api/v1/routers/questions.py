@@ -6,7 +6,8 @@ from app.models.question import (
     Question, QuestionCreate, QuestionUpdate, QuestionRead, QuestionReadWithOptions,
     Option, OptionCreate, OptionUpdate, OptionRead
 )
-from app.services import QuestionService
+from app.models.tag import TagAssignment, TagRead
+from app.services import QuestionService, SnapshotService, TagService
 from typing import List, Optional
 
 router = APIRouter(prefix="/questions", tags=["questions"])
@@ -39,6 +40,7 @@ def create_question(question: QuestionCreate, exam_id: int, session: Session = D
         session.add(db_question)
         session.commit()
         session.refresh(db_question)
+        SnapshotService.invalidate(exam_id)
         return db_question
     except IntegrityError as e:
         session.rollback()
@@ -67,6 +69,7 @@ def update_question(question_id: int, question: QuestionUpdate, session: Session
     session.add(db_question)
     session.commit()
     session.refresh(db_question)
+    SnapshotService.invalidate(db_question.exam_id)
     return db_question
 
 @router.delete("/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -76,8 +79,10 @@ def delete_question(question_id: int, session: Session = Depends(get_session)):
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
+    exam_id = question.exam_id
     session.delete(question)
     session.commit()
+    SnapshotService.invalidate(exam_id)
     return None
 
 # =============================================================================
@@ -110,6 +115,7 @@ def create_option(question_id: int, option: OptionCreate, session: Session = Dep
         session.add(db_option)
         session.commit()
         session.refresh(db_option)
+        SnapshotService.invalidate(question.exam_id)
         return db_option
     except IntegrityError as e:
         session.rollback()
@@ -140,6 +146,7 @@ def update_option(option_id: int, option: OptionUpdate, session: Session = Depen
     session.add(db_option)
     session.commit()
     session.refresh(db_option)
+    SnapshotService.invalidate(db_option.question.exam_id)
     return db_option
 
 @router.delete("/options/{option_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -149,8 +156,10 @@ def delete_option(option_id: int, session: Session = Depends(get_session)):
     if not option:
         raise HTTPException(status_code=404, detail="Option not found")
     
+    exam_id = option.question.exam_id
     session.delete(option)
     session.commit()
+    SnapshotService.invalidate(exam_id)
     return None
 
 # =============================================================================
@@ -184,3 +193,8 @@ def reorder_exam_questions(exam_id: int, question_ids: List[int], session: Sessi
     Reordena las preguntas de un examen
     """
     return QuestionService.reorder_questions(exam_id, question_ids, session)
+
+@router.put("/{question_id}/tags", response_model=List[TagRead])
+def set_question_tags(question_id: int, assignment: TagAssignment, session: Session = Depends(get_session)):
+    """Reemplazar las etiquetas de una pregunta"""
+    return TagService.set_question_tags(question_id, assignment.tag_ids, session)
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+from app.core.database import get_session
+from app.models.question import QuestionDifficulty
+from app.models.search import FacetEntity, FacetResults, SearchResults, SearchScope, SuggestionField, SuggestionResults
+from app.services import AutocompleteService, FacetService, SearchService
+from typing import List, Optional
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=SearchResults)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: SearchScope = Query(SearchScope.ALL),
+    exam_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    session: Session = Depends(get_session)
+):
+    """Buscar exámenes y preguntas por texto, ordenados por relevancia"""
+    results = SearchService.search(q, session, scope=scope, exam_id=exam_id, limit=limit, offset=offset)
+    return SearchResults(query=q, results=results)
+
+@router.get("/autocomplete", response_model=SuggestionResults)
+def autocomplete(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    field: SuggestionField = Query(SuggestionField.TITLE),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session)
+):
+    """Sugerencias de autocompletado (trie en memoria, sin consultas por petición)"""
+    suggestions = AutocompleteService.suggest(prefix, field, session, limit=limit)
+    return SuggestionResults(query=prefix, suggestions=suggestions)
+
+@router.get("/fuzzy", response_model=SuggestionResults)
+def fuzzy_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    field: SuggestionField = Query(SuggestionField.TITLE),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session)
+):
+    """Valores parecidos a la consulta aunque tengan errores de escritura"""
+    suggestions = AutocompleteService.fuzzy(q, field, session, limit=limit)
+    return SuggestionResults(query=q, suggestions=suggestions)
+
+@router.get("/facets", response_model=FacetResults)
+def facet_filter(
+    entity: FacetEntity = Query(FacetEntity.QUESTION),
+    tag_ids: List[int] = Query([]),
+    subject: Optional[str] = Query(None),
+    difficulty: Optional[QuestionDifficulty] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session)
+):
+    """Filtrar por etiquetas (todas), asignatura y dificultad con recuentos por faceta"""
+    return FacetService.filter(
+        session, entity=entity, tag_ids=tag_ids, subject=subject,
+        difficulty=difficulty.value if difficulty else None, limit=limit, offset=offset
+    )
@@ -1,18 +1,30 @@
 """
 API endpoints para gestión de sesiones de examen y respuestas de estudiantes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
+from datetime import datetime
+from app.core.admission import AdmissionController
 from app.core.database import get_session
+from app.core.exceptions import rate_limit_error
+from app.core.idempotency import reserve_key, store_response, release_key, request_fingerprint
 from app.models.session import (
     ExamSession, ExamSessionCreate, ExamSessionRead, ExamSessionUpdate, SessionStatus,
     StudentAnswer, StudentAnswerCreate, StudentAnswerRead, StudentAnswerUpdate,
-    SessionFinishResponse, TimeRemainingResponse
+    SessionFinishResponse, TimeRemainingResponse, AnswerAutosaveResponse
 )
-from app.models.exam import Exam
+from app.models.snapshot import StudentExamRead
 from app.models.user import User
 from app.services.session_service import SessionService
+from app.services.scoring_service import ScoringService
+from app.services.statistics_service import StatisticsService
+from app.services.answer_buffer import AnswerBuffer
+from app.services.timer_hub import timer_hub, TimerEvent
+import asyncio
+import json
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -35,28 +47,32 @@ def get_session_by_id(session_id: int, db: Session = Depends(get_session)):
     
     return db_session
 
-@router.post("/", status_code=201, response_model=ExamSessionRead)
+async def admit_exam_start(session_create: ExamSessionCreate) -> None:
+    """
+    Control de admisión por examen para inicios simultáneos
+    Espera el turno asignado o responde 429 con Retry-After y la posición en cola
+    """
+    if not AdmissionController.is_enabled():
+        return
+    admission = await run_in_threadpool(AdmissionController.reserve, session_create.exam_id)
+    if not admission.admitted:
+        raise rate_limit_error(admission.retry_after, {
+            "message": "Too many students starting this exam, retry later",
+            "position": admission.position,
+            "retry_after": admission.retry_after,
+        })
+    if admission.wait_seconds > 0:
+        await asyncio.sleep(admission.wait_seconds)
+
+@router.post("/", status_code=201, response_model=ExamSessionRead, dependencies=[Depends(admit_exam_start)])
 def create_session(session_create: ExamSessionCreate, db: Session = Depends(get_session)):
-    """Crear una nueva sesión de examen"""
-    # Verificar que el examen existe
-    exam = db.get(Exam, session_create.exam_id)
-    if not exam:
-        raise HTTPException(status_code=404, detail="Exam not found")
-    
+    """Crear una nueva sesión de examen (las comprobaciones las hace el servicio)"""
     # Verificar que el usuario existe
     user = db.get(User, session_create.student_id)
     if not user:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Verificar si el usuario puede iniciar el examen
-    can_start, reason = SessionService.can_start_exam(session_create.student_id, session_create.exam_id, db)
-    if not can_start:
-        raise HTTPException(status_code=400, detail=reason)
-    
-    # Crear la sesión usando el servicio
-    exam_session = SessionService.start_exam_session(session_create.student_id, session_create.exam_id, db)
-    
-    return exam_session
+    return SessionService.start_exam_session(session_create.student_id, session_create.exam_id, db)
 
 @router.put("/{session_id}", response_model=ExamSessionRead)
 def update_session(session_id: int, session_update: ExamSessionUpdate, db: Session = Depends(get_session)):
@@ -91,20 +107,62 @@ def delete_session(session_id: int, db: Session = Depends(get_session)):
 # =============================
 
 @router.post("/{session_id}/finish", response_model=SessionFinishResponse)
-def finish_session(session_id: int, db: Session = Depends(get_session)):
-    """Finalizar una sesión de examen y calcular puntuación"""
+def finish_session(
+    session_id: int,
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """
+    Finalizar una sesión de examen y calcular puntuación
+    Con Idempotency-Key los reintentos reciben la misma respuesta
+    """
+    scope = f"finish:{session_id}"
+    fingerprint = request_fingerprint(None)
+    stored = reserve_key(scope, idempotency_key, fingerprint)
+    if stored is not None:
+        return stored
+    
+    try:
+        response = _finish_session(session_id, db)
+    except BaseException:
+        # Sin respuesta guardada: un reintento vuelve a ejecutar la petición
+        release_key(scope, idempotency_key, fingerprint)
+        raise
+    store_response(scope, idempotency_key, fingerprint, 200, response.model_dump(mode="json"))
+    return response
+
+def _finish_session(session_id: int, db: Session) -> SessionFinishResponse:
     try:
         finished_session = SessionService.finish_exam_session(session_id, db)
-        return SessionFinishResponse(
-            id=finished_session.id,
-            status=finished_session.status,
-            end_time=finished_session.end_time,
-            score=finished_session.score,
-            earned_points=finished_session.earned_points,
-            total_points=finished_session.total_points
-        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    percentile_rank = None
+    if finished_session.score is not None:
+        percentile_rank = StatisticsService.get_percentile_rank(
+            finished_session.exam_id, finished_session.score, db
+        ).percentile_rank
+    
+    return SessionFinishResponse(
+        id=finished_session.id,
+        status=finished_session.status,
+        end_time=finished_session.end_time,
+        score=finished_session.score,
+        earned_points=finished_session.earned_points,
+        total_points=finished_session.total_points,
+        percentile_rank=percentile_rank
+    )
+
+@router.get("/{session_id}/exam", response_model=StudentExamRead)
+def get_session_exam(session_id: int, db: Session = Depends(get_session)):
+    """
+    Examen de la sesión para el alumno, con el orden aleatorio de la sesión
+    El orden es reproducible (semilla guardada en la sesión) para revisión
+    """
+    db_session = db.get(ExamSession, session_id)
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return SessionService.get_session_exam(db_session, db)
 
 @router.get("/{session_id}/time-remaining", response_model=TimeRemainingResponse)
 def get_time_remaining(session_id: int, db: Session = Depends(get_session)):
@@ -115,6 +173,46 @@ def get_time_remaining(session_id: int, db: Session = Depends(get_session)):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/{session_id}/timer")
+async def session_timer(session_id: int, db: Session = Depends(get_session)):
+    """
+    Temporizador push (Server-Sent Events) de una sesión
+    Envía la fecha límite una vez, después latidos periódicos y el evento
+    de expiración. Sustituye al sondeo de /time-remaining.
+    """
+    db_session = await run_in_threadpool(db.get, ExamSession, session_id)
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    status_value = db_session.status
+    deadline = db_session.end_time
+    # La conexión de BD no se mantiene durante el stream
+    await run_in_threadpool(db.close)
+    
+    async def event_stream():
+        if status_value != SessionStatus.IN_PROGRESS:
+            yield _format_sse(TimerEvent("closed", {"session_id": session_id, "status": status_value.value}))
+            return
+        
+        queue = timer_hub.subscribe(session_id, deadline)
+        try:
+            while True:
+                event = await queue.get()
+                yield _format_sse(event)
+                if event.is_final:
+                    break
+        finally:
+            timer_hub.unsubscribe(session_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _format_sse(event: TimerEvent) -> str:
+    return f"event: {event.event}\ndata: {json.dumps(event.data)}\n\n"
+
 # =============================
 # CRUD StudentAnswer
 # =============================
@@ -134,28 +232,64 @@ def list_answers(session_id: int, db: Session = Depends(get_session)):
     return answers
 
 @router.post("/{session_id}/answers", status_code=201, response_model=StudentAnswerRead)
-def create_answer(session_id: int, answer_create: StudentAnswerCreate, db: Session = Depends(get_session)):
-    """Crear una respuesta de estudiante"""
-    # Verificar que la sesión existe y está activa
-    db_session = db.get(ExamSession, session_id)
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    if db_session.status != SessionStatus.IN_PROGRESS:
-        raise HTTPException(status_code=400, detail="Session is not in progress")
+def create_answer(
+    session_id: int,
+    answer_create: StudentAnswerCreate,
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """
+    Crear (o reemplazar) la respuesta de estudiante a una pregunta
+    Con Idempotency-Key los reintentos reciben la misma respuesta sin acceder a la BD
+    """
+    scope = f"answers:{session_id}"
+    fingerprint = request_fingerprint(answer_create.model_dump(mode="json"))
+    stored = reserve_key(scope, idempotency_key, fingerprint)
+    if stored is not None:
+        return stored
     
-    # Crear la respuesta
-    answer = StudentAnswer(
-        session_id=session_id,
-        question_id=answer_create.question_id,
-        selected_option_id=answer_create.selected_option_id
+    try:
+        # Verificar que la sesión existe, está activa y dentro de plazo
+        db_session = SessionService.get_writable_session(session_id, db)
+        
+        # Upsert sobre (session_id, question_id) y corrección de la respuesta
+        answer = SessionService.upsert_answers(db_session, [answer_create], db)[0]
+    except BaseException:
+        # Sin respuesta guardada: un reintento vuelve a ejecutar la petición
+        release_key(scope, idempotency_key, fingerprint)
+        raise
+    store_response(
+        scope, idempotency_key, fingerprint, 201,
+        StudentAnswerRead.model_validate(answer).model_dump(mode="json")
     )
+    return answer
+
+@router.post("/{session_id}/answers/batch", response_model=List[StudentAnswerRead])
+def create_answers_batch(session_id: int, answers: List[StudentAnswerCreate], db: Session = Depends(get_session)):
+    """
+    Guardar varias respuestas en una sola petición (autoguardado de la hoja completa)
+    Usa un único INSERT ... ON CONFLICT sobre (session_id, question_id)
+    """
+    db_session = SessionService.get_writable_session(session_id, db)
     
-    db.add(answer)
-    db.commit()
-    db.refresh(answer)
+    return SessionService.upsert_answers(db_session, answers, db)
+
+@router.put("/{session_id}/answers/autosave", status_code=202, response_model=AnswerAutosaveResponse)
+def autosave_answers(session_id: int, answers: List[StudentAnswerCreate], db: Session = Depends(get_session)):
+    """
+    Autoguardado de respuestas durante el examen
+    En modo buffered se acumulan en Redis y se vuelcan en segundo plano;
+    si no, se guardan directamente en la base de datos
+    """
+    db_session = SessionService.get_writable_session(session_id, db)
     
-    return answer
+    if AnswerBuffer.is_enabled():
+        # Los ids se validan aquí: el volcado en segundo plano no puede rechazar la petición
+        count = AnswerBuffer.buffer_answers(session_id, SessionService.known_answers(db_session, answers, db))
+        return AnswerAutosaveResponse(session_id=session_id, buffered=True, answers_count=count)
+    
+    saved = SessionService.upsert_answers(db_session, answers, db)
+    return AnswerAutosaveResponse(session_id=session_id, buffered=False, answers_count=len(saved))
 
 @router.put("/{session_id}/answers/{answer_id}", response_model=StudentAnswerRead)
 def update_answer(
@@ -165,25 +299,24 @@ def update_answer(
     db: Session = Depends(get_session)
 ):
     """Actualizar una respuesta de estudiante"""
-    # Verificar que la sesión existe y está activa
-    db_session = db.get(ExamSession, session_id)
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    if db_session.status != SessionStatus.IN_PROGRESS:
-        raise HTTPException(status_code=400, detail="Session is not in progress")
+    # Verificar que la sesión existe, está activa y dentro de plazo
+    db_session = SessionService.get_writable_session(session_id, db)
     
     # Verificar que la respuesta existe y pertenece a la sesión
     answer = db.get(StudentAnswer, answer_id)
     if not answer or answer.session_id != session_id:
         raise HTTPException(status_code=404, detail="Answer not found")
     
-    # Actualizar campos proporcionados
-    update_data = answer_update.model_dump(exclude_unset=True)
+    # Actualizar campos proporcionados (la corrección la calcula el servidor)
+    update_data = answer_update.model_dump(exclude_unset=True, exclude={"is_correct", "points_earned"})
     for field, value in update_data.items():
         setattr(answer, field, value)
+    # Un autoguardado anterior que siga en el buffer no debe pisar este cambio al volcarse
+    answer.answered_at = datetime.utcnow()
     
     db.add(answer)
+    db.flush()
+    ScoringService.update_running_score(db_session, [answer.question_id], db)
     db.commit()
     db.refresh(answer)
     
@@ -192,18 +325,17 @@ def update_answer(
 @router.delete("/{session_id}/answers/{answer_id}", status_code=204)
 def delete_answer(session_id: int, answer_id: int, db: Session = Depends(get_session)):
     """Eliminar una respuesta de estudiante"""
-    # Verificar que la sesión existe y está activa
-    db_session = db.get(ExamSession, session_id)
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    if db_session.status != SessionStatus.IN_PROGRESS:
-        raise HTTPException(status_code=400, detail="Session is not in progress")
+    # Verificar que la sesión existe, está activa y dentro de plazo
+    db_session = SessionService.get_writable_session(session_id, db)
     
     # Verificar que la respuesta existe y pertenece a la sesión
     answer = db.get(StudentAnswer, answer_id)
     if not answer or answer.session_id != session_id:
         raise HTTPException(status_code=404, detail="Answer not found")
     
+    question_id = answer.question_id
+    removed_points = answer.points_earned or 0.0
     db.delete(answer)
+    db.flush()
+    ScoringService.update_running_score(db_session, [question_id], db, removed_points)
     db.commit()
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from app.core.database import get_session
+from app.models.tag import Tag, TagCreate, TagRead
+from typing import List
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+@router.get("/", response_model=List[TagRead])
+def list_tags(session: Session = Depends(get_session)):
+    """Listar todas las etiquetas"""
+    return session.exec(select(Tag).order_by(Tag.name)).all()
+
+@router.post("/", response_model=TagRead, status_code=status.HTTP_201_CREATED)
+def create_tag(tag: TagCreate, session: Session = Depends(get_session)):
+    """Crear una etiqueta"""
+    db_tag = Tag(**tag.model_dump())
+    try:
+        session.add(db_tag)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=400, detail="Tag with this name already exists")
+    session.refresh(db_tag)
+    return db_tag
+
+@router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_tag(tag_id: int, session: Session = Depends(get_session)):
+    """Eliminar una etiqueta (y sus asignaciones)"""
+    tag = session.get(Tag, tag_id)
+    if not tag:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    session.delete(tag)
+    session.commit()
+    return None
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError
 from app.core.database import get_session
+from app.core.principal import PrincipalCache
 from app.models.user import User
 from typing import List
 
@@ -53,11 +54,16 @@ def update_user(user_id: int, user: User, session: Session = Depends(get_session
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    for key, value in user.model_dump(exclude_unset=True).items():
+    previous = (db_user.role, db_user.is_active, db_user.hashed_password)
+    for key, value in user.model_dump(exclude_unset=True, exclude={"id", "token_version"}).items():
         setattr(db_user, key, value)
+    # Cambios de seguridad: los tokens emitidos dejan de ser válidos
+    if (db_user.role, db_user.is_active, db_user.hashed_password) != previous:
+        db_user.token_version += 1
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    PrincipalCache.invalidate(user_id)
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -67,4 +73,5 @@ def delete_user(user_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="User not found")
     session.delete(user)
     session.commit()
+    PrincipalCache.invalidate(user_id)
     return None
@@ -0,0 +1,98 @@
+"""
+Control de admisión para inicios de examen sincronizados
+Token bucket por examen implementado como GCRA (tiempo teórico de llegada):
+se admite una ráfaga de ADMISSION_BURST inicios y el resto se espacia a
+ADMISSION_RATE_PER_SECOND. Las peticiones que caben en la cola esperan su
+turno en el servidor; las que no, reciben 429 con Retry-After y su posición.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+import math
+import threading
+import time
+
+from .config import settings
+from .redis import get_redis
+
+ADMISSION_KEY = "exam-scan:admission:{exam_id}"
+
+# Reserva atómica de turno en Redis (compartida entre workers)
+# KEYS[1] = clave del examen; ARGV = now, interval, burst_window, max_wait
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst_window = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local wait = tat - now - burst_window
+if wait <= max_wait then
+    local new_tat = tat + interval
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+    return {1, tostring(wait)}
+end
+return {0, tostring(wait - max_wait)}
+"""
+
+
+@dataclass(frozen=True)
+class Admission:
+    """Resultado de pedir turno para iniciar un examen"""
+    admitted: bool
+    # Admitido: segundos a esperar antes de entrar; rechazado: Retry-After
+    wait_seconds: float
+    # Peticiones por delante en la cola (estimación)
+    position: int
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.wait_seconds))
+
+
+class AdmissionController:
+
+    _local_tat: Dict[int, float] = {}
+    _local_lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.ADMISSION_RATE_PER_SECOND > 0
+
+    @staticmethod
+    def reserve(exam_id: int, now: Optional[float] = None) -> Admission:
+        """Reserva un turno de inicio para el examen"""
+        now = time.time() if now is None else now
+        interval = 1.0 / settings.ADMISSION_RATE_PER_SECOND
+        # La ráfaga incluye la propia petición
+        burst_window = max(settings.ADMISSION_BURST - 1, 0) * interval
+        max_wait = settings.ADMISSION_MAX_WAIT_SECONDS
+
+        redis = get_redis()
+        if redis is not None:
+            admitted, wait = redis.eval(
+                _RESERVE_SCRIPT, 1, ADMISSION_KEY.format(exam_id=exam_id),
+                now, interval, burst_window, max_wait,
+            )
+            admitted, wait = bool(int(admitted)), float(wait)
+        else:
+            with AdmissionController._local_lock:
+                tat = max(AdmissionController._local_tat.get(exam_id, now), now)
+                wait = tat - now - burst_window
+                admitted = wait <= max_wait
+                if admitted:
+                    AdmissionController._local_tat[exam_id] = tat + interval
+                else:
+                    wait -= max_wait
+
+        if admitted:
+            wait = max(0.0, wait)
+            position = math.ceil(wait / interval)
+        else:
+            position = math.ceil((wait + max_wait) / interval)
+        return Admission(admitted=admitted, wait_seconds=wait, position=position)
+
+    @staticmethod
+    def reset() -> None:
+        """Vacía el estado en proceso (tests)"""
+        with AdmissionController._local_lock:
+            AdmissionController._local_tat.clear()
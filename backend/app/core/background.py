@@ -0,0 +1,21 @@
+"""
+Utilidades para tareas periódicas en segundo plano
+"""
+import asyncio
+import logging
+from typing import Callable
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+async def run_periodically(name: str, interval_seconds: float, job: Callable[[], object]) -> None:
+    """
+    Ejecuta una tarea síncrona cada interval_seconds en el threadpool
+    Los errores se registran y no detienen el bucle
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(job)
+        except Exception:
+            logger.exception("Background job %s failed", name)
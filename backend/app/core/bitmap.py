@@ -0,0 +1,131 @@
+"""
+Bitmap comprimido de enteros no negativos al estilo roaring
+Los ids se reparten en bloques de 2^16 por sus 16 bits altos; cada bloque es
+un array ordenado de uint16 si tiene pocos elementos o un bitset (1024 palabras
+uint64, 8 KiB) si está denso. Los contenedores son arrays de numpy: bitset con
+bitset es un AND por palabras con popcount, array con bitset comprueba los bits
+por índice en bloque. Las intersecciones y sus cardinalidades trabajan bloque a
+bloque sin expandir los conjuntos.
+"""
+from typing import Dict, Iterable, Iterator
+import numpy as np
+
+# Por encima de este tamaño un array ocupa más que el bitset del bloque
+ARRAY_MAX_SIZE = 4096
+_BLOCK_WORDS = 1 << 10
+# Palabras little-endian: el bit v está en la palabra v >> 6, posición v & 63
+_WORD = np.dtype("<u8")
+
+# Contenedor: np.ndarray uint16 ordenado (array) o de _BLOCK_WORDS uint64 (bitset)
+Container = np.ndarray
+
+
+def _is_bitset(container: Container) -> bool:
+    return container.dtype == _WORD
+
+
+def _cardinality(container: Container) -> int:
+    return int(np.bitwise_count(container).sum()) if _is_bitset(container) else len(container)
+
+
+def _to_bitset(values: Container) -> Container:
+    bits = np.zeros(_BLOCK_WORDS * 64, dtype=bool)
+    bits[values] = True
+    return np.packbits(bits, bitorder="little").view(_WORD)
+
+
+def _to_array(bitset: Container) -> Container:
+    bits = np.unpackbits(bitset.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def _contains_mask(bitset: Container, values: Container) -> np.ndarray:
+    """Máscara de los valores de un array presentes en un bitset"""
+    values = values.astype(np.uint64)
+    return (bitset[values >> np.uint64(6)] >> (values & np.uint64(63))) & np.uint64(1) == 1
+
+
+def _optimize(container: Container) -> Container:
+    if _is_bitset(container) and _cardinality(container) <= ARRAY_MAX_SIZE:
+        return _to_array(container)
+    if not _is_bitset(container) and len(container) > ARRAY_MAX_SIZE:
+        return _to_bitset(container)
+    return container
+
+
+def _intersect(left: Container, right: Container) -> Container:
+    if _is_bitset(left) and _is_bitset(right):
+        return _optimize(left & right)
+    if _is_bitset(left):
+        left, right = right, left
+    if _is_bitset(right):
+        return left[_contains_mask(right, left)]
+    return np.intersect1d(left, right, assume_unique=True)
+
+
+def _intersection_cardinality(left: Container, right: Container) -> int:
+    if _is_bitset(left) and _is_bitset(right):
+        return int(np.bitwise_count(left & right).sum())
+    if _is_bitset(left):
+        left, right = right, left
+    if _is_bitset(right):
+        return int(np.count_nonzero(_contains_mask(right, left)))
+    return len(np.intersect1d(left, right, assume_unique=True))
+
+
+class RoaringBitmap:
+    """Conjunto inmutable de ids con intersección eficiente"""
+
+    __slots__ = ("_blocks",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        ids = np.unique(np.fromiter(values, dtype=np.int64))
+        highs = ids >> 16
+        bounds = np.flatnonzero(np.diff(highs)) + 1
+        self._blocks: Dict[int, Container] = {
+            int(chunk_highs[0]): _optimize((chunk & 0xFFFF).astype(np.uint16))
+            for chunk, chunk_highs in zip(np.split(ids, bounds), np.split(highs, bounds))
+            if len(chunk)
+        }
+
+    @classmethod
+    def _from_blocks(cls, blocks: Dict[int, Container]) -> "RoaringBitmap":
+        bitmap = cls.__new__(cls)
+        bitmap._blocks = blocks
+        return bitmap
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        blocks = {}
+        for high, container in self._blocks.items():
+            if high in other._blocks:
+                result = _intersect(container, other._blocks[high])
+                if _cardinality(result):
+                    blocks[high] = result
+        return RoaringBitmap._from_blocks(blocks)
+
+    def intersection_len(self, other: "RoaringBitmap") -> int:
+        """len(self & other) sin construir la intersección"""
+        return sum(
+            _intersection_cardinality(container, other._blocks[high])
+            for high, container in self._blocks.items() if high in other._blocks
+        )
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self._blocks.values())
+
+    def __contains__(self, value: int) -> bool:
+        container = self._blocks.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if _is_bitset(container):
+            return bool(int(container[low >> 6]) >> (low & 63) & 1)
+        index = int(np.searchsorted(container, low))
+        return index < len(container) and int(container[index]) == low
+
+    def __iter__(self) -> Iterator[int]:
+        """Ids en orden ascendente"""
+        for high in sorted(self._blocks):
+            container = self._blocks[high]
+            values = _to_array(container) if _is_bitset(container) else container
+            yield from ((high << 16) | values.astype(np.int64)).tolist()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Literal
 
 class Settings(BaseSettings):
     # App Configuration
@@ -17,6 +17,88 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-super-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 7 * 24 * 60
+
+    # Revocación de tokens: filtro de Bloom por worker sincronizado desde Redis
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 5.0
+
+    # Pool de procesos para bcrypt (login/registro) y máximo de operaciones en cola
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 200
+
+    # Límite de intentos de login por ventana deslizante (0 = deshabilitado)
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: float = 300.0
+    LOGIN_MAX_ATTEMPTS_PER_EMAIL: int = 10
+    LOGIN_MAX_ATTEMPTS_PER_IP: int = 100
+    LOGIN_THROTTLE_CACHE_SIZE: int = 10000
+    # Proxies inversos de confianza delante de la API (X-Forwarded-For); 0 = conexión directa
+    TRUSTED_PROXY_HOPS: int = 0
+
+    # Caché del usuario autenticado (en proceso y en Redis)
+    PRINCIPAL_LOCAL_TTL_SECONDS: float = 5.0
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 300
+    PRINCIPAL_CACHE_SIZE: int = 10000
+
+    # Redis Configuration (vacío = deshabilitado)
+    REDIS_URL: str = ""
+
+    # Answer ingest: "direct" (escritura en BD) o "buffered" (Redis + volcado en lotes)
+    ANSWER_INGEST_MODE: Literal["direct", "buffered"] = "direct"
+    ANSWER_FLUSH_INTERVAL_SECONDS: float = 2.0
+    ANSWER_FLUSH_BATCH_SIZE: int = 200
+
+    # Expiración de sesiones con tiempo agotado (barrido periódico)
+    SESSION_EXPIRY_INTERVAL_SECONDS: float = 30.0
+    SESSION_EXPIRY_BATCH_SIZE: int = 200
+
+    # Intervalo de latidos del temporizador push (SSE)
+    TIMER_HEARTBEAT_SECONDS: float = 15.0
+
+    # Admisión de inicios de examen por examen (0 = deshabilitado)
+    ADMISSION_RATE_PER_SECOND: float = 20.0
+    ADMISSION_BURST: int = 20
+    ADMISSION_MAX_WAIT_SECONDS: float = 5.0
+
+    # Caché de snapshots de exámenes (LRU por worker + Redis)
+    EXAM_SNAPSHOT_CACHE_SIZE: int = 256
+    EXAM_SNAPSHOT_TTL_SECONDS: int = 24 * 60 * 60
+    # Sin Redis, segundos que un worker usa su snapshot sin compararlo con la BD
+    EXAM_SNAPSHOT_LOCAL_TTL_SECONDS: float = 5.0
+
+    # Idempotency-Key: tiempo de vida de las respuestas guardadas y tamaño de la LRU local
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    # Caducidad de la marca "en curso" si el worker muere sin guardar ni liberar la clave
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 60
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+
+    # Búsqueda de texto completo: configuración de PostgreSQL para stemming y stopwords
+    # Cambiarla requiere regenerar las columnas search_vector (migración)
+    SEARCH_TEXT_CONFIG: Literal["spanish", "english"] = "spanish"
+    # Backend: "postgres" (tsvector + GIN), "memory" (índice invertido por worker) o "auto"
+    SEARCH_BACKEND: Literal["auto", "postgres", "memory"] = "auto"
+    # Reconstrucción periódica del índice en memoria (recoge cambios de otros workers)
+    SEARCH_INDEX_REBUILD_SECONDS: float = 300.0
+    # Autocompletado: reconstrucción del trie y sugerencias guardadas por prefijo
+    AUTOCOMPLETE_REBUILD_SECONDS: float = 60.0
+    AUTOCOMPLETE_MAX_SUGGESTIONS: int = 10
+    # Vida máxima del índice de facetas (recoge escrituras de otros workers)
+    FACET_INDEX_TTL_SECONDS: float = 60.0
+
+    # Exportaciones: filas por lote del cursor de servidor
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Estadísticas: compresión del t-digest de puntuaciones por examen
+    SCORE_DIGEST_COMPRESSION: int = 100
+
+    # Similitud de respuestas (integridad): tarea periódica y parámetros de MinHash/LSH
+    SIMILARITY_JOB_INTERVAL_SECONDS: float = 900.0
+    SIMILARITY_LSH_BANDS: int = 32
+    SIMILARITY_LSH_ROWS: int = 4
+    SIMILARITY_MIN_SHARED_WRONG: int = 3
+    SIMILARITY_MIN_SCORE: float = 0.5
+    SIMILARITY_MAX_PAIRS: int = 100
+    SIMILARITY_MINHASH_CHUNK_SIZE: int = 1000  # Sesiones por bloque al calcular firmas
 
     # CORS Configuration
     ALLOWED_ORIGINS: List[str] = ["http://localhost:4200", "http://localhost:3000"]
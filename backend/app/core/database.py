@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from typing import Any, Generator
 
 # Import settings with relative import to avoid circular dependencies
 from .config import settings
@@ -17,10 +17,24 @@ def create_db_and_tables():
     # Import models to register them with SQLModel
     from app.models import (
         User, Exam, Question, Option, 
-        ExamSession, StudentAnswer, Tag
+        ExamSession, StudentAnswer, Tag, ExamStatistics
     )
     SQLModel.metadata.create_all(engine)
 
+def dialect_insert(session: Session, model: Any) -> Any:
+    """
+    Construye un INSERT específico del dialecto activo
+    Permite usar ON CONFLICT tanto en PostgreSQL como en SQLite (tests)
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT not supported for dialect {dialect}")
+    return insert(model)
+
 def get_session() -> Generator[Session, None, None]:
     """Dependency to get database session"""
     session = Session(engine)
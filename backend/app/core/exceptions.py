@@ -24,3 +24,15 @@ def validation_error(detail: str = "Validation failed") -> HTTPException:
 def conflict_error(detail: str = "Resource conflict") -> HTTPException:
     """Resource conflict exception"""
     return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+def not_implemented_error(detail: str = "Not implemented") -> HTTPException:
+    """Feature not available in this deployment exception"""
+    return HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=detail)
+
+def rate_limit_error(retry_after: int, detail: object = "Too many requests") -> HTTPException:
+    """Too many requests exception with Retry-After header"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(retry_after)},
+    )
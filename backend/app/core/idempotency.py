@@ -0,0 +1,166 @@
+"""
+Almacén de respuestas para peticiones con cabecera Idempotency-Key
+Un reintento con la misma clave recibe la respuesta guardada sin tocar la base de datos.
+La primera petición reserva la clave (SET NX) con una marca "en curso" antes de
+ejecutarse: un reintento concurrente recibe 409 en vez de repetir la escritura.
+Usa Redis si está configurado y, si no, una LRU en proceso con caducidad.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+import hashlib
+import json
+import threading
+import time
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from .config import settings
+from .redis import get_redis
+
+IDEMPOTENCY_KEY = "exam-scan:idempotency:{scope}:{key}"
+# Longitud máxima aceptada para la cabecera
+MAX_KEY_LENGTH = 255
+
+# Borra la clave solo si sigue siendo la marca en curso (no una respuesta ya guardada)
+# KEYS[1] = clave; ARGV[1] = marca serializada
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    # None mientras la primera petición con la clave se está procesando
+    status_code: Optional[int]
+    body: Any
+
+    @property
+    def in_progress(self) -> bool:
+        return self.status_code is None
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__)
+
+
+# LRU en proceso: clave -> (expiración monotónica, respuesta)
+_local_store: "OrderedDict[str, tuple[float, StoredResponse]]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Huella del cuerpo de la petición para detectar claves reutilizadas con otro contenido"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _store_key(scope: str, key: str) -> str:
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    return IDEMPOTENCY_KEY.format(scope=scope, key=key)
+
+
+def _load_local(store_key: str) -> Optional[StoredResponse]:
+    """Entrada vigente de la LRU local; llamar con _local_lock adquirido"""
+    entry = _local_store.get(store_key)
+    if entry is None:
+        return None
+    expires_at, stored = entry
+    if expires_at <= time.monotonic():
+        del _local_store[store_key]
+        return None
+    _local_store.move_to_end(store_key)
+    return stored
+
+
+def _save_local(store_key: str, stored: StoredResponse, ttl: float) -> None:
+    """Guarda en la LRU local; llamar con _local_lock adquirido"""
+    _local_store[store_key] = (time.monotonic() + ttl, stored)
+    _local_store.move_to_end(store_key)
+    while len(_local_store) > settings.IDEMPOTENCY_CACHE_SIZE:
+        _local_store.popitem(last=False)
+
+
+def _reserve(store_key: str, marker: StoredResponse) -> Optional[StoredResponse]:
+    """Reserva la clave con la marca; si ya existía retorna lo guardado"""
+    redis = get_redis()
+    if redis is not None:
+        while True:
+            if redis.set(store_key, marker.to_json(), nx=True, ex=settings.IDEMPOTENCY_LOCK_TTL_SECONDS):
+                return None
+            raw = redis.get(store_key)
+            if raw:  # Si caducó entre SET y GET se vuelve a intentar la reserva
+                return StoredResponse(**json.loads(raw))
+
+    with _local_lock:
+        stored = _load_local(store_key)
+        if stored is None:
+            _save_local(store_key, marker, settings.IDEMPOTENCY_LOCK_TTL_SECONDS)
+        return stored
+
+
+def reserve_key(scope: str, key: Optional[str], fingerprint: str) -> Optional[JSONResponse]:
+    """
+    Reserva la clave para ejecutar la petición; None si es la primera petición
+    Si la clave ya tiene respuesta la devuelve. Mientras la primera petición sigue
+    en curso los reintentos reciben 409; reutilizar la clave con un cuerpo distinto
+    es un error del cliente (422). Quien reserva debe llamar a store_response o,
+    si la petición falla, a release_key.
+    """
+    if not key:
+        return None
+    stored = _reserve(_store_key(scope, key), StoredResponse(fingerprint=fingerprint, status_code=None, body=None))
+    if stored is None:
+        return None
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    if stored.in_progress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"},
+        )
+    return JSONResponse(status_code=stored.status_code, content=stored.body)
+
+
+def store_response(scope: str, key: Optional[str], fingerprint: str, status_code: int, body: Any) -> None:
+    """Guarda la respuesta (serializable a JSON) de una petición completada sobre la marca en curso"""
+    if not key:
+        return
+    store_key = _store_key(scope, key)
+    stored = StoredResponse(fingerprint=fingerprint, status_code=status_code, body=body)
+
+    redis = get_redis()
+    if redis is not None:
+        redis.set(store_key, stored.to_json(), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+        return
+
+    with _local_lock:
+        _save_local(store_key, stored, settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+def release_key(scope: str, key: Optional[str], fingerprint: str) -> None:
+    """Libera la reserva de una petición fallida para que un reintento la ejecute de nuevo"""
+    if not key:
+        return
+    store_key = _store_key(scope, key)
+    marker = StoredResponse(fingerprint=fingerprint, status_code=None, body=None)
+
+    redis = get_redis()
+    if redis is not None:
+        redis.eval(_RELEASE_SCRIPT, 1, store_key, marker.to_json())
+        return
+
+    with _local_lock:
+        if _load_local(store_key) == marker:
+            del _local_store[store_key]
+
+
+def clear_local_store() -> None:
+    """Vacía la LRU en proceso (tests)"""
+    with _local_lock:
+        _local_store.clear()
@@ -0,0 +1,158 @@
+"""
+Limitación de intentos de login (ventana deslizante)
+Cada intento se registra con su instante en un sorted set por email y otro
+por IP; se rechaza si alguno supera su máximo dentro de la ventana. La
+comprobación ocurre antes de bcrypt, así que una ráfaga de credential
+stuffing no consume CPU de hashing. Un login correcto borra los intentos del
+email y retira el suyo de la IP: por IP solo cuentan los fallidos (muchos
+alumnos comparten la IP del centro). Sin Redis se usa un registro en proceso.
+"""
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import math
+import threading
+import time
+import uuid
+
+from .config import settings
+from .redis import get_redis
+
+EMAIL_KEY = "exam-scan:login:email:{email}"
+IP_KEY = "exam-scan:login:ip:{ip}"
+
+# Registro atómico de un intento en varias ventanas
+# KEYS = una clave por ventana; ARGV = now, window, member, límite de cada clave
+# Solo se registra si todas las ventanas admiten el intento
+_HIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local limit = tonumber(ARGV[3 + i])
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        local wait = tonumber(oldest[2]) + window - now
+        if wait > retry_after then retry_after = wait end
+    end
+end
+if retry_after > 0 then
+    return tostring(retry_after)
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, math.ceil(window * 1000))
+end
+return '0'
+"""
+
+
+@dataclass(frozen=True)
+class ThrottleResult:
+    """Resultado de registrar un intento de login"""
+    allowed: bool
+    # Segundos hasta que la ventana libere un intento (solo si se rechaza)
+    wait_seconds: float = 0.0
+    # Instante y miembro del intento registrado (para retirarlo si tiene éxito)
+    hit_at: float = 0.0
+    member: str = ""
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.wait_seconds))
+
+
+class LoginThrottle:
+
+    # Registro en proceso: clave -> instantes de los intentos (LRU por clave)
+    _local_hits: "OrderedDict[str, deque[float]]" = OrderedDict()
+    _local_lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS > 0
+
+    @staticmethod
+    def hit(email: str, ip: Optional[str], now: Optional[float] = None) -> ThrottleResult:
+        """Registra un intento de login para el email y la IP si ninguno ha agotado su cupo"""
+        if not LoginThrottle.is_enabled():
+            return ThrottleResult(allowed=True)
+        now = time.time() if now is None else now
+        window = settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+        limits = LoginThrottle._limits(email, ip)
+        if not limits:
+            return ThrottleResult(allowed=True)
+
+        member = f"{now}:{uuid.uuid4().hex}"
+        redis = get_redis()
+        if redis is not None:
+            wait = float(redis.eval(
+                _HIT_SCRIPT, len(limits), *[key for key, _ in limits],
+                now, window, member, *[limit for _, limit in limits],
+            ))
+        else:
+            wait = LoginThrottle._hit_local(limits, now, window)
+
+        if wait > 0:
+            return ThrottleResult(allowed=False, wait_seconds=wait)
+        return ThrottleResult(allowed=True, hit_at=now, member=member)
+
+    @staticmethod
+    def record_success(email: str, ip: Optional[str], result: ThrottleResult) -> None:
+        """
+        Tras un login correcto olvida los intentos del email y retira de la
+        ventana de la IP el intento que acaba de tener éxito
+        """
+        email_key = EMAIL_KEY.format(email=email.strip().lower())
+        ip_key = IP_KEY.format(ip=ip) if ip else None
+        redis = get_redis()
+        if redis is not None:
+            pipe = redis.pipeline(transaction=False)
+            pipe.delete(email_key)
+            if ip_key and result.member:
+                pipe.zrem(ip_key, result.member)
+            pipe.execute()
+        with LoginThrottle._local_lock:
+            LoginThrottle._local_hits.pop(email_key, None)
+            hits = LoginThrottle._local_hits.get(ip_key) if ip_key else None
+            if hits is not None and result.hit_at in hits:
+                hits.remove(result.hit_at)
+
+    @staticmethod
+    def _limits(email: str, ip: Optional[str]) -> List[Tuple[str, int]]:
+        limits = []
+        if settings.LOGIN_MAX_ATTEMPTS_PER_EMAIL > 0:
+            limits.append((EMAIL_KEY.format(email=email.strip().lower()), settings.LOGIN_MAX_ATTEMPTS_PER_EMAIL))
+        if ip and settings.LOGIN_MAX_ATTEMPTS_PER_IP > 0:
+            limits.append((IP_KEY.format(ip=ip), settings.LOGIN_MAX_ATTEMPTS_PER_IP))
+        return limits
+
+    @staticmethod
+    def _hit_local(limits: List[Tuple[str, int]], now: float, window: float) -> float:
+        with LoginThrottle._local_lock:
+            wait = 0.0
+            for key, limit in limits:
+                hits = LoginThrottle._local_hits.get(key)
+                if hits is None:
+                    continue
+                while hits and hits[0] <= now - window:
+                    hits.popleft()
+                if len(hits) >= limit:
+                    wait = max(wait, hits[0] + window - now)
+            if wait > 0:
+                return wait
+
+            for key, _ in limits:
+                hits = LoginThrottle._local_hits.setdefault(key, deque())
+                hits.append(now)
+                LoginThrottle._local_hits.move_to_end(key)
+            while len(LoginThrottle._local_hits) > settings.LOGIN_THROTTLE_CACHE_SIZE:
+                LoginThrottle._local_hits.popitem(last=False)
+            return 0.0
+
+    @staticmethod
+    def reset() -> None:
+        """Vacía el registro en proceso (tests)"""
+        with LoginThrottle._local_lock:
+            LoginThrottle._local_hits.clear()
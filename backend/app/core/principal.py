@@ -0,0 +1,134 @@
+"""
+Caché del usuario autenticado (principal)
+Guarda lo que necesita la autorización de cada petición (activo, rol y versión
+del token) para no consultar la tabla user en cada endpoint protegido.
+Dos niveles: LRU en proceso con TTL corto y Redis con TTL largo.
+Cada invalidación sube una generación por usuario; quien carga el principal de la
+base de datos lo guarda solo si la generación no cambió desde antes de leerlo, así
+una lectura lenta no vuelve a cachear un usuario desactivado o una versión antigua.
+"""
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+import json
+import threading
+import time
+
+from .config import settings
+from .redis import get_redis
+
+PRINCIPAL_KEY = "exam-scan:principal:{user_id}"
+GENERATION_KEY = "exam-scan:principal-generation:{user_id}"
+# Más que cualquier lectura en curso: la generación no puede volver a un valor ya visto
+GENERATION_TTL_SECONDS = 24 * 60 * 60
+
+# Guarda el principal solo si la generación sigue siendo la leída antes de la consulta
+# KEYS[1] = generación, KEYS[2] = principal; ARGV = generación esperada, principal, ttl
+_STORE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado tal como lo necesita la autorización"""
+    user_id: int
+    role: str
+    is_active: bool
+    token_version: int
+
+
+# Generación (Redis o None sin Redis, local) leída antes de consultar la base de datos
+Generation = Tuple[Optional[str], int]
+
+# LRU en proceso: user_id -> (expiración monotónica, principal)
+_local_cache: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+# Generaciones locales: solo usuarios invalidados en este proceso
+_local_generations: Dict[int, int] = {}
+_local_lock = threading.Lock()
+
+
+class PrincipalCache:
+
+    @staticmethod
+    def get(user_id: int) -> Optional[Principal]:
+        with _local_lock:
+            entry = _local_cache.get(user_id)
+            if entry is not None:
+                expires_at, principal = entry
+                if expires_at > time.monotonic():
+                    _local_cache.move_to_end(user_id)
+                    return principal
+                del _local_cache[user_id]
+            local_generation = _local_generations.get(user_id, 0)
+
+        redis = get_redis()
+        if redis is None:
+            return None
+        raw = redis.get(PRINCIPAL_KEY.format(user_id=user_id))
+        if not raw:
+            return None
+        principal = Principal(**json.loads(raw))
+        PrincipalCache._store_local(principal, local_generation)
+        return principal
+
+    @staticmethod
+    def generation(user_id: int) -> Generation:
+        """Generación actual del usuario; leerla antes de consultar la base de datos"""
+        redis = get_redis()
+        shared = (redis.get(GENERATION_KEY.format(user_id=user_id)) or "0") if redis is not None else None
+        with _local_lock:
+            return shared, _local_generations.get(user_id, 0)
+
+    @staticmethod
+    def store(principal: Principal, generation: Generation) -> None:
+        """Guarda el principal salvo que se haya invalidado después de leer generation"""
+        shared, local = generation
+        redis = get_redis()
+        if redis is not None:
+            stored = redis.eval(
+                _STORE_SCRIPT, 2,
+                GENERATION_KEY.format(user_id=principal.user_id), PRINCIPAL_KEY.format(user_id=principal.user_id),
+                shared or "0", json.dumps(asdict(principal)), settings.PRINCIPAL_CACHE_TTL_SECONDS,
+            )
+            if not int(stored):
+                return
+        PrincipalCache._store_local(principal, local)
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """
+        Olvida el principal de un usuario (cambios de rol, estado o contraseña, borrado)
+        Otros workers sin Redis compartido lo verán como mucho tras PRINCIPAL_LOCAL_TTL_SECONDS
+        """
+        redis = get_redis()
+        if redis is not None:
+            pipe = redis.pipeline(transaction=True)
+            pipe.incr(GENERATION_KEY.format(user_id=user_id))
+            pipe.expire(GENERATION_KEY.format(user_id=user_id), GENERATION_TTL_SECONDS)
+            pipe.delete(PRINCIPAL_KEY.format(user_id=user_id))
+            pipe.execute()
+        with _local_lock:
+            _local_generations[user_id] = _local_generations.get(user_id, 0) + 1
+            _local_cache.pop(user_id, None)
+
+    @staticmethod
+    def _store_local(principal: Principal, generation: int) -> None:
+        with _local_lock:
+            if _local_generations.get(principal.user_id, 0) != generation:
+                return
+            _local_cache[principal.user_id] = (time.monotonic() + settings.PRINCIPAL_LOCAL_TTL_SECONDS, principal)
+            _local_cache.move_to_end(principal.user_id)
+            while len(_local_cache) > settings.PRINCIPAL_CACHE_SIZE:
+                _local_cache.popitem(last=False)
+
+    @staticmethod
+    def clear_local_cache() -> None:
+        """Vacía la LRU en proceso (tests)"""
+        with _local_lock:
+            _local_cache.clear()
+            _local_generations.clear()
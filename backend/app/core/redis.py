@@ -0,0 +1,24 @@
+from typing import Optional, TYPE_CHECKING
+from .config import settings
+
+if TYPE_CHECKING:
+    from redis import Redis
+
+# Cliente Redis compartido por el proceso (se crea bajo demanda)
+_client: Optional["Redis"] = None
+
+def get_redis() -> Optional["Redis"]:
+    """
+    Devuelve el cliente Redis configurado o None si REDIS_URL está vacío
+    Los servicios que usan Redis deben tener un comportamiento alternativo sin él
+    """
+    global _client
+    if _client is None and settings.REDIS_URL:
+        import redis
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+def set_redis(client: Optional["Redis"]) -> None:
+    """Sustituye el cliente Redis (tests o configuración manual)"""
+    global _client
+    _client = client
@@ -0,0 +1,130 @@
+"""
+Lista de revocación de tokens (jti)
+La fuente de verdad está en Redis (una clave por jti con caducidad y un
+sorted set por fecha de expiración). Cada worker mantiene un filtro de Bloom
+sincronizado periódicamente: el caso habitual, un token no revocado, se
+resuelve sin E/S de red. Solo los positivos del filtro se confirman en Redis.
+"""
+from typing import Dict, Optional
+import threading
+import time
+
+from .bloom import BloomFilter
+from .config import settings
+from .redis import get_redis
+
+REVOKED_KEY = "exam-scan:revoked:{jti}"
+REVOKED_INDEX_KEY = "exam-scan:revoked"
+
+_lock = threading.Lock()
+_bloom = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY)
+# Sin Redis, las revocaciones se guardan aquí: jti -> expiración (epoch)
+_local_revoked: Dict[str, float] = {}
+# Revocaciones de este worker aún no cubiertas por una sincronización: jti -> instante
+_recent: Dict[str, float] = {}
+
+
+class TokenRevocationList:
+
+    @staticmethod
+    def revoke(jti: str, expires_at: float) -> None:
+        """Revoca un token hasta su expiración natural"""
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+
+        redis = get_redis()
+        if redis is not None:
+            pipe = redis.pipeline(transaction=True)
+            pipe.set(REVOKED_KEY.format(jti=jti), "1", ex=ttl)
+            pipe.zadd(REVOKED_INDEX_KEY, {jti: expires_at})
+            pipe.execute()
+
+        with _lock:
+            if redis is None:
+                _local_revoked[jti] = expires_at
+            _recent[jti] = time.monotonic()
+            _bloom.add(jti)
+
+    @staticmethod
+    def claim(jti: str, expires_at: float) -> bool:
+        """
+        Revoca el token solo si nadie lo había revocado antes (un único uso)
+        Retorna False si ya estaba revocado: dos peticiones concurrentes con el
+        mismo refresh token no pueden rotarlo las dos (SET NX en Redis o
+        comprobación y alta bajo el lock sin Redis)
+        """
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return False
+
+        redis = get_redis()
+        if redis is not None:
+            if not redis.set(REVOKED_KEY.format(jti=jti), "1", ex=ttl, nx=True):
+                return False
+            redis.zadd(REVOKED_INDEX_KEY, {jti: expires_at})
+
+        with _lock:
+            if redis is None:
+                if _local_revoked.get(jti, 0) > time.time():
+                    return False
+                _local_revoked[jti] = expires_at
+            _recent[jti] = time.monotonic()
+            _bloom.add(jti)
+        return True
+
+    @staticmethod
+    def is_revoked(jti: Optional[str]) -> bool:
+        if not jti:
+            return False
+        with _lock:
+            if jti not in _bloom:
+                return False
+
+        # Positivo del filtro (revocado o falso positivo): confirmar
+        redis = get_redis()
+        if redis is None:
+            with _lock:
+                return _local_revoked.get(jti, 0) > time.time()
+        return bool(redis.exists(REVOKED_KEY.format(jti=jti)))
+
+    @staticmethod
+    def sync() -> int:
+        """
+        Reconstruye el filtro con las revocaciones vigentes en Redis
+        Tarea periódica: una revocación hecha en otro worker se ve aquí como
+        mucho tras REVOCATION_SYNC_INTERVAL_SECONDS
+        """
+        global _bloom
+        now = time.time()
+        started = time.monotonic()
+        redis = get_redis()
+        if redis is not None:
+            redis.zremrangebyscore(REVOKED_INDEX_KEY, "-inf", now)
+            revoked = redis.zrange(REVOKED_INDEX_KEY, 0, -1)
+        else:
+            with _lock:
+                for jti in [jti for jti, exp in _local_revoked.items() if exp <= now]:
+                    del _local_revoked[jti]
+                revoked = list(_local_revoked)
+
+        bloom = BloomFilter(max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(revoked)))
+        for jti in revoked:
+            bloom.add(jti)
+        with _lock:
+            # Las revocaciones propias hechas durante la lectura no pueden perderse
+            for jti, revoked_at in list(_recent.items()):
+                bloom.add(jti)
+                if revoked_at < started:
+                    del _recent[jti]
+            _bloom = bloom
+        return len(revoked)
+
+    @staticmethod
+    def clear_local_state() -> None:
+        """Vacía el filtro y las revocaciones locales (tests)"""
+        global _bloom
+        with _lock:
+            _bloom = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY)
+            _local_revoked.clear()
+            _recent.clear()
@@ -1,18 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union, Optional
+from typing import Any, Callable, Union, Optional
+import asyncio
+import multiprocessing
+import threading
+import uuid
 import jwt
 from jwt import ExpiredSignatureError, InvalidTokenError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from prometheus_client import Gauge
 from .config import settings
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
 def create_access_token(
-    user_id: int, username: str, role: str, expires_delta: Optional[timedelta] = None
+    user_id: int, username: str, role: str, expires_delta: Optional[timedelta] = None,
+    token_version: int = 0
 ) -> str:
-    """Create JWT access token with user info"""
+    """Create JWT access token with user info and the user's token version"""
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -24,11 +34,25 @@ def create_access_token(
         "exp": expire,
         "sub": str(user_id),
         "username": username,
-        "role": role
+        "role": role,
+        "ver": token_version,
+        "type": ACCESS_TOKEN,
+        "jti": uuid.uuid4().hex
     }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(user_id: int, token_version: int = 0) -> str:
+    """Create long-lived JWT refresh token (only valid at /auth/refresh)"""
+    to_encode = {
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+        "sub": str(user_id),
+        "ver": token_version,
+        "type": REFRESH_TOKEN,
+        "jti": uuid.uuid4().hex
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -37,8 +61,78 @@ def get_password_hash(password: str) -> str:
     """Get password hash"""
     return pwd_context.hash(password)
 
-def verify_token(token: str) -> Union[str, None]:
-    """Verify JWT token and return subject (user_id)"""
+# =============================================================================
+# Pool de procesos para bcrypt
+# bcrypt consume CPU a propósito; fuera del threadpool de peticiones no bloquea
+# al resto de endpoints y el tamaño del pool limita el CPU que puede ocupar
+# =============================================================================
+
+password_hash_queue_depth = Gauge(
+    "password_hash_queue_depth",
+    "Operaciones de hash/verificación de contraseñas pendientes en el pool"
+)
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_lock = threading.Lock()
+_hash_pending = 0
+
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    with _hash_lock:
+        if _hash_executor is None:
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    """Detiene el pool de hashing (apagado de la aplicación)"""
+    global _hash_executor
+    with _hash_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_hashing(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Ejecuta una operación bcrypt en el pool de procesos
+    Si la cola supera PASSWORD_HASH_MAX_QUEUE se responde 503 en lugar de encolar más
+    """
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= settings.PASSWORD_HASH_MAX_QUEUE:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        _hash_pending += 1
+        password_hash_queue_depth.set(_hash_pending)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+            password_hash_queue_depth.set(_hash_pending)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in the hashing pool"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Get password hash in the hashing pool"""
+    return await _run_hashing(get_password_hash, password)
+
+
+def _decode_token(token: str, token_type: str) -> Union[dict, None]:
+    """Decode a JWT of the given type; tokens without type are access tokens"""
     try:
         payload = jwt.decode(
             token,
@@ -46,23 +140,27 @@ def verify_token(token: str) -> Union[str, None]:
             algorithms=[settings.ALGORITHM],
             options={"require": ["exp", "sub"]},
         )
-        return payload.get("sub")
     except (ExpiredSignatureError, InvalidTokenError):
         return None
+    if payload.get("type", ACCESS_TOKEN) != token_type:
+        return None
+    return payload
+
+def verify_token(token: str) -> Union[str, None]:
+    """Verify JWT access token and return subject (user_id)"""
+    payload = _decode_token(token, ACCESS_TOKEN)
+    return payload.get("sub") if payload else None
 
-def get_token_data(token: str) -> Union[dict, None]:
+def get_token_data(token: str, token_type: str = ACCESS_TOKEN) -> Union[dict, None]:
     """Verify JWT token and return complete token data"""
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-            options={"require": ["exp", "sub"]},
-        )
-        return {
-            "user_id": int(payload.get("sub")),
-            "username": payload.get("username"),
-            "role": payload.get("role")
-        }
-    except (ExpiredSignatureError, InvalidTokenError):
+    payload = _decode_token(token, token_type)
+    if payload is None:
         return None
+    return {
+        "user_id": int(payload.get("sub")),
+        "username": payload.get("username"),
+        "role": payload.get("role"),
+        "token_version": int(payload.get("ver", 0)),
+        "jti": payload.get("jti"),
+        "expires_at": float(payload["exp"])
+    }
@@ -0,0 +1,217 @@
+"""
+t-digest para cuantiles aproximados de un flujo de valores
+Resume los valores en unos pocos centroides (media, peso); la función de
+escala k1 (arcoseno) hace los centroides pequeños cerca de los extremos, así
+las colas (p1, p99) son casi exactas con tamaño acotado por la compresión.
+Los valores nuevos se acumulan en un buffer y se fusionan en bloque.
+Los valores repetidos se agrupan siempre en un solo centroide (las medias son
+estrictamente crecientes) y, si hay pocos valores distintos (p.ej. notas en
+pasos de 20), se guarda el peso exacto de cada uno: la CDF en un empate es exacta.
+Se serializa en binario: ~16 bytes por centroide.
+"""
+from array import array
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+import math
+import struct
+import sys
+
+# compresión (uint16), centroides (uint32), mínimo y máximo (float64)
+_HEADER = struct.Struct("<HIdd")
+
+
+class TDigest:
+    """Resumen mergeable de una distribución con cuantiles y CDF aproximados"""
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.min = math.inf
+        self.max = -math.inf
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+        self._total = 0.0
+
+    @property
+    def count(self) -> float:
+        """Peso total añadido"""
+        return self._total
+
+    def __len__(self) -> int:
+        """Número de centroides tras fusionar el buffer"""
+        self._compress()
+        return len(self._means)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        value = float(value)
+        self._buffer.append((value, weight))
+        self._total += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        """Incorpora los centroides de otro digest"""
+        other._compress()
+        for mean, weight in zip(other._means, other._weights):
+            self._buffer.append((mean, weight))
+        self._total += other._total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k_limit(self, q: float) -> float:
+        """Cuantil máximo que puede abarcar un centroide que empieza en q"""
+        scale = self.compression / (2 * math.pi)
+        k = scale * math.asin(2 * q - 1) + 1
+        if k >= scale * math.pi / 2:
+            return 1.0
+        return (math.sin(k / scale) + 1) / 2
+
+    @staticmethod
+    def _coalesce(points: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        """Suma los pesos de puntos ordenados con la misma media"""
+        coalesced: List[Tuple[float, float]] = []
+        for mean, weight in points:
+            if coalesced and coalesced[-1][0] == mean:
+                coalesced[-1] = (mean, coalesced[-1][1] + weight)
+            else:
+                coalesced.append((mean, weight))
+        return coalesced
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = self._coalesce(sorted(list(zip(self._means, self._weights)) + self._buffer))
+        self._buffer = []
+        if len(points) <= self.compression:
+            # Pocos valores distintos: un centroide exacto por valor
+            self._means = [mean for mean, _ in points]
+            self._weights = [weight for _, weight in points]
+            return
+        total = self._total
+        means: List[float] = []
+        weights: List[float] = []
+        mean, weight = points[0]
+        merged = 0.0
+        q_limit = self._k_limit(0.0)
+        for next_mean, next_weight in points[1:]:
+            if (merged + weight + next_weight) / total <= q_limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                merged += weight
+                q_limit = self._k_limit(merged / total)
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valor aproximado del cuantil q (0-1); None si está vacío"""
+        self._compress()
+        if not self._means:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        means, weights = self._means, self._weights
+        index = q * self._total
+        if len(means) == 1:
+            return self.min + q * (self.max - self.min)
+
+        # Cola izquierda: entre el mínimo y el centro del primer centroide
+        if index < weights[0] / 2:
+            return self.min + index / (weights[0] / 2) * (means[0] - self.min)
+
+        center = weights[0] / 2
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if index < center + step:
+                return means[i] + (index - center) / step * (means[i + 1] - means[i])
+            center += step
+
+        # Cola derecha: entre el centro del último centroide y el máximo
+        last = weights[-1] / 2
+        return means[-1] + (index - center) / last * (self.max - means[-1])
+
+    def cdf(self, value: float) -> Optional[float]:
+        """
+        Fracción aproximada del peso por debajo de value (0-1); None si está vacío
+        Los empates cuentan la mitad (rango medio)
+        """
+        self._compress()
+        if not self._means:
+            return None
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        means, weights, total = self._means, self._weights, self._total
+        if len(means) == 1:
+            span = self.max - self.min
+            return 0.5 if span == 0 else (value - self.min) / span
+
+        if value < means[0]:
+            span = means[0] - self.min
+            return (value - self.min) / span * weights[0] / 2 / total if span > 0 else 0.0
+
+        # Primer centroide con media mayor que value (los iguales quedan a la izquierda)
+        i = bisect_right(means, value)
+        if i == len(means):
+            center = total - weights[-1] / 2
+            span = self.max - means[-1]
+            fraction = (value - means[-1]) / span if span > 0 else 0.0
+            return (center + fraction * weights[-1] / 2) / total
+
+        left = i - 1
+        center = sum(weights[:left]) + weights[left] / 2
+        step = (weights[left] + weights[i]) / 2
+        return (center + (value - means[left]) / (means[i] - means[left]) * step) / total
+
+    def histogram(self, edges: Sequence[float]) -> List[float]:
+        """
+        Peso entre cada par de bordes consecutivos, en intervalos [inferior, superior)
+        salvo el último, que incluye el borde superior (mismo criterio que las cubetas
+        del histograma de estadísticas). Cada centroide cuenta entero en el intervalo de
+        su media: con centroides exactos (pocos valores distintos) el recuento es exacto.
+        """
+        bins = max(len(edges) - 1, 0)
+        counts = [0.0] * bins
+        if not bins:
+            return counts
+        self._compress()
+        for mean, weight in zip(self._means, self._weights):
+            if edges[0] <= mean <= edges[-1]:
+                counts[min(bisect_right(edges, mean) - 1, bins - 1)] += weight
+        return counts
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        means = array("d", self._means)
+        weights = array("d", self._weights)
+        if sys.byteorder != "little":
+            means.byteswap()
+            weights.byteswap()
+        return _HEADER.pack(self.compression, len(means), self.min, self.max) + means.tobytes() + weights.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        compression, size, minimum, maximum = _HEADER.unpack_from(data)
+        digest = cls(compression)
+        offset = _HEADER.size
+        means = array("d", data[offset:offset + 8 * size])
+        weights = array("d", data[offset + 8 * size:offset + 16 * size])
+        if sys.byteorder != "little":
+            means.byteswap()
+            weights.byteswap()
+        points = TDigest._coalesce(list(zip(means.tolist(), weights.tolist())))
+        digest._means = [mean for mean, _ in points]
+        digest._weights = [weight for _, weight in points]
+        digest._total = sum(digest._weights)
+        digest.min, digest.max = minimum, maximum
+        return digest
@@ -1,11 +1,23 @@
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from sqlmodel import Session
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 import multipart
 
 from app.core.config import settings
-from app.core.database import create_db_and_tables
+from app.core.background import run_periodically
+from app.core.database import create_db_and_tables, engine
+from app.core.revocation import TokenRevocationList
+from app.core.security import shutdown_hash_executor
+from app.services.answer_buffer import AnswerBuffer
+from app.services.autocomplete_service import AutocompleteService
+from app.services.search_index import InMemorySearchBackend
+from app.services.search_service import SearchService
+from app.services.session_service import SessionService
+from app.services.similarity_service import SimilarityService
+from app.services.timer_hub import timer_hub
 from app.api.v1.api import api_router
 
 
@@ -14,8 +26,50 @@ async def lifespan(app: FastAPI):
     # Startup
     create_db_and_tables()
     print("✅ Database tables created successfully!")
+
+    background_tasks = [asyncio.create_task(run_periodically(
+        "session-expiry",
+        settings.SESSION_EXPIRY_INTERVAL_SECONDS,
+        lambda: SessionService.expire_overdue_sessions_job(lambda: Session(engine)),
+    ))]
+    # Revocaciones hechas en otros workers (con Redis) y poda de las ya caducadas
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "revocation-sync",
+        settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+        TokenRevocationList.sync,
+    )))
+    # Cierres de sesión publicados por otros workers para los temporizadores SSE (solo con Redis)
+    timer_hub.start_listener()
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "autocomplete-rebuild",
+        settings.AUTOCOMPLETE_REBUILD_SECONDS,
+        lambda: AutocompleteService.rebuild_job(lambda: Session(engine)),
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "similarity-report",
+        settings.SIMILARITY_JOB_INTERVAL_SECONDS,
+        lambda: SimilarityService.generate_pending_job(lambda: Session(engine)),
+    )))
+    if SearchService.backend_name(engine.dialect.name) == "memory":
+        background_tasks.append(asyncio.create_task(run_periodically(
+            "search-index-rebuild",
+            settings.SEARCH_INDEX_REBUILD_SECONDS,
+            lambda: InMemorySearchBackend.rebuild_job(lambda: Session(engine)),
+        )))
+    if AnswerBuffer.is_enabled():
+        background_tasks.append(asyncio.create_task(run_periodically(
+            "answer-flush",
+            settings.ANSWER_FLUSH_INTERVAL_SECONDS,
+            lambda: SessionService.flush_pending_answers(lambda: Session(engine)),
+        )))
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await timer_hub.stop()
+    shutdown_hash_executor()
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
 
 
 app = FastAPI(
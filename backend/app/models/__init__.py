@@ -3,13 +3,20 @@
 # Importar todos los modelos para que SQLModel los registre
 from .base import BaseModel, TimestampMixin
 from .user import User, UserCreate, UserRead, UserUpdate, UserRole
-from .auth import LoginResponse
+from .auth import LoginResponse, RefreshTokenRequest, LogoutRequest, TokenRefreshResponse
 from .exam import Exam, ExamCreate, ExamRead, ExamReadWithCreator, ExamReadWithQuestions, ExamUpdate, ExamStatus, ExamType
 from .question import Question, QuestionCreate, QuestionRead, QuestionReadWithOptions, QuestionUpdate, QuestionType, QuestionDifficulty
 from .question import Option, OptionCreate, OptionRead, OptionUpdate
 from .session import ExamSession, ExamSessionCreate, ExamSessionRead, ExamSessionReadWithExam, ExamSessionReadWithAnswers, ExamSessionUpdate, SessionStatus
-from .session import StudentAnswer, StudentAnswerCreate, StudentAnswerRead, StudentAnswerReadWithDetails, StudentAnswerUpdate
-from .tag import Tag, TagCreate, TagRead, TagUpdate
+from .session import StudentAnswer, StudentAnswerCreate, BufferedAnswer, StudentAnswerRead, StudentAnswerReadWithDetails, StudentAnswerUpdate
+from .tag import Tag, TagCreate, TagRead, TagUpdate, TagAssignment, ExamTagLink, QuestionTagLink
+from .statistics import ExamStatistics, ItemAnalysis, ItemAnalysisReport, OptionAnalysis
+from .statistics import ScoreDistribution, ScoreHistogramBin, ScorePercentile, ScorePercentileRank
+from .snapshot import ExamSnapshot, StudentExamRead
+from .integrity import SimilarPair, SimilarityReport, SimilarityReportRead
+from .search import SearchHit, SearchResults, SearchScope, Suggestion, SuggestionField, SuggestionResults
+from .export import ExportFormat, ExportCompression, ColumnarFormat
+from .search import FacetEntity, FacetResults, TagFacet, ValueFacet
 
 # Exportar todos los modelos
 __all__ = [
@@ -18,7 +25,7 @@ __all__ = [
     # User
     "User", "UserCreate", "UserRead", "UserUpdate", "UserRole",
     # Auth
-    "LoginResponse",
+    "LoginResponse", "RefreshTokenRequest", "LogoutRequest", "TokenRefreshResponse",
     # Exam  
     "Exam", "ExamCreate", "ExamRead", "ExamReadWithCreator", "ExamReadWithQuestions", "ExamUpdate", "ExamStatus", "ExamType",
     # Question & Option
@@ -26,7 +33,19 @@ __all__ = [
     "Option", "OptionCreate", "OptionRead", "OptionUpdate",
     # Session & StudentAnswer
     "ExamSession", "ExamSessionCreate", "ExamSessionRead", "ExamSessionReadWithExam", "ExamSessionReadWithAnswers", "ExamSessionUpdate", "SessionStatus",
-    "StudentAnswer", "StudentAnswerCreate", "StudentAnswerRead", "StudentAnswerReadWithDetails", "StudentAnswerUpdate",
+    "StudentAnswer", "StudentAnswerCreate", "BufferedAnswer", "StudentAnswerRead", "StudentAnswerReadWithDetails", "StudentAnswerUpdate",
     # Tag
-    "Tag", "TagCreate", "TagRead", "TagUpdate",
+    "Tag", "TagCreate", "TagRead", "TagUpdate", "TagAssignment", "ExamTagLink", "QuestionTagLink",
+    # Statistics
+    "ExamStatistics", "ItemAnalysis", "ItemAnalysisReport", "OptionAnalysis",
+    "ScoreDistribution", "ScoreHistogramBin", "ScorePercentile", "ScorePercentileRank",
+    # Snapshot
+    "ExamSnapshot", "StudentExamRead",
+    # Integrity
+    "SimilarPair", "SimilarityReport", "SimilarityReportRead",
+    # Export
+    "ExportFormat", "ExportCompression", "ColumnarFormat",
+    # Search
+    "SearchHit", "SearchResults", "SearchScope", "Suggestion", "SuggestionField", "SuggestionResults",
+    "FacetEntity", "FacetResults", "TagFacet", "ValueFacet",
 ]
@@ -1,3 +1,4 @@
+from typing import Optional
 from sqlmodel import SQLModel
 from .user import UserRead
 
@@ -6,5 +7,20 @@ class LoginResponse(SQLModel):
     access_token: str
     token_type: str
     current_user: UserRead
+    refresh_token: Optional[str] = None
 
-# Futuros modelos de auth como RefreshToken, PasswordReset, etc. irían aquí...
+class RefreshTokenRequest(SQLModel):
+    """Modelo de petición con refresh token"""
+    refresh_token: str
+
+class LogoutRequest(SQLModel):
+    """Modelo de petición para logout (el refresh token es opcional)"""
+    refresh_token: Optional[str] = None
+
+class TokenRefreshResponse(SQLModel):
+    """Modelo de respuesta para refrescar tokens"""
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+# Futuros modelos de auth como PasswordReset, etc. irían aquí...
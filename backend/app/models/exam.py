@@ -3,11 +3,13 @@ from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime
 from enum import Enum
 from .base import BaseModel, TimestampMixin
+from .tag import ExamTagLink
 
 if TYPE_CHECKING:
     from .user import User, UserRead
     from .question import Question, QuestionRead
     from .session import ExamSession
+    from .tag import Tag
 
 class ExamStatus(str, Enum):
     """Estados de un examen"""
@@ -45,6 +47,7 @@ class Exam(ExamBase, BaseModel, table=True):
     creator: "User" = Relationship(back_populates="created_exams")
     questions: List["Question"] = Relationship(back_populates="exam")
     sessions: List["ExamSession"] = Relationship(back_populates="exam")
+    tags: List["Tag"] = Relationship(back_populates="exams", link_model=ExamTagLink)
 
 class ExamCreate(ExamBase):
     """Modelo para crear examen"""
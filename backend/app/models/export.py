@@ -0,0 +1,20 @@
+from enum import Enum
+
+# =====================================================
+# Exportación de datos
+# =====================================================
+
+class ExportFormat(str, Enum):
+    """Formatos de exportación"""
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class ExportCompression(str, Enum):
+    """Compresión opcional del fichero exportado"""
+    NONE = "none"
+    GZIP = "gzip"
+
+class ColumnarFormat(str, Enum):
+    """Formatos columnares para análisis (requieren pyarrow)"""
+    PARQUET = "parquet"
+    ARROW = "arrow"
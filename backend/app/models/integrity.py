@@ -0,0 +1,39 @@
+from typing import List
+from datetime import datetime
+from sqlalchemy import Column, JSON
+from sqlmodel import Field, SQLModel
+from .base import BaseModel, TimestampMixin
+
+# =====================================================
+# Revisión de integridad: sesiones con respuestas similares
+# =====================================================
+
+class SimilarPair(SQLModel):
+    """Par de sesiones de un examen con patrones de respuesta parecidos"""
+    session_a: int
+    session_b: int
+    student_a: int
+    student_b: int
+    similarity: float        # Jaccard ponderado (los fallos compartidos pesan más)
+    shared_wrong: int        # preguntas con la misma respuesta incorrecta
+    shared_correct: int      # preguntas con la misma respuesta correcta
+
+class SimilarityReportBase(SQLModel):
+    """Modelo base para SimilarityReport - campos compartidos"""
+    generated_at: datetime = Field(default_factory=datetime.utcnow)
+    sessions_analyzed: int = Field(default=0, ge=0)
+    candidate_pairs: int = Field(default=0, ge=0)
+    completed_count: int = Field(default=0, ge=0)  # Sesiones finalizadas del examen al generarlo
+    regrade_count: int = Field(default=0, ge=0)     # Recorrecciones del examen al generarlo
+    pairs: List[SimilarPair] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+
+class SimilarityReport(SimilarityReportBase, BaseModel, table=True):
+    """
+    Modelo de tabla para SimilarityReport
+    Una fila por examen con el último informe generado por la tarea periódica
+    """
+    exam_id: int = Field(foreign_key="exam.id", primary_key=True)
+
+class SimilarityReportRead(SimilarityReportBase, TimestampMixin):
+    """Modelo para leer el informe de similitud de un examen"""
+    exam_id: int
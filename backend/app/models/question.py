@@ -3,10 +3,12 @@ from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime
 from enum import Enum
 from .base import BaseModel, TimestampMixin
+from .tag import QuestionTagLink
 
 if TYPE_CHECKING:
     from .exam import Exam
     from .session import StudentAnswer
+    from .tag import Tag
 
 
 class QuestionType(str, Enum):
@@ -40,6 +42,7 @@ class Question(QuestionBase, BaseModel, table=True):
     exam: "Exam" = Relationship(back_populates="questions")
     options: List["Option"] = Relationship(back_populates="question", cascade_delete=True)
     student_answers: List["StudentAnswer"] = Relationship(back_populates="question")
+    tags: List["Tag"] = Relationship(back_populates="questions", link_model=QuestionTagLink)
 
 class QuestionCreate(QuestionBase):
     """Modelo para crear pregunta"""
@@ -0,0 +1,121 @@
+from typing import List, Optional
+from enum import Enum
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel
+from app.core.config import settings
+from .exam import Exam
+from .question import Question
+from .tag import Tag
+
+# =====================================================
+# Búsqueda de texto completo
+# =====================================================
+
+# Campos indexados por tabla con su peso en el ranking (A > B > C)
+SEARCH_FIELDS = {
+    "exam": [("title", "A"), ("description", "B"), ("instructions", "C")],
+    "question": [("text", "A"), ("explanation", "B")],
+}
+
+def search_vector_expression(table: str, config: str) -> str:
+    """Expresión SQL del tsvector ponderado de una tabla (PostgreSQL)"""
+    return " || ".join(
+        f"setweight(to_tsvector('{config}'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in SEARCH_FIELDS[table]
+    )
+
+def _add_search_vector(table: str) -> DDL:
+    # Columna generada + índice GIN; solo en PostgreSQL (en otras bases de datos busca
+    # el índice invertido en memoria de cada worker, InMemorySearchBackend)
+    return DDL(
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"({search_vector_expression(table, settings.SEARCH_TEXT_CONFIG)}) STORED; "
+        f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)"
+    ).execute_if(dialect="postgresql")
+
+# Columnas con índice de trigramas (búsqueda aproximada y autocompletado)
+TRIGRAM_COLUMNS = {"exam": ["title", "subject"], "tag": ["name"]}
+
+def _add_trigram_indexes(table: str) -> DDL:
+    return DDL("; ".join(
+        ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+            f"CREATE INDEX ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)"
+            for column in TRIGRAM_COLUMNS[table]
+        ]
+    )).execute_if(dialect="postgresql")
+
+# Con create_all (desarrollo) las columnas se crean igual que en la migración
+event.listen(Exam.__table__, "after_create", _add_search_vector("exam"))
+event.listen(Question.__table__, "after_create", _add_search_vector("question"))
+event.listen(Exam.__table__, "after_create", _add_trigram_indexes("exam"))
+event.listen(Tag.__table__, "after_create", _add_trigram_indexes("tag"))
+
+
+class SearchScope(str, Enum):
+    """Qué se busca"""
+    ALL = "all"
+    EXAMS = "exams"
+    QUESTIONS = "questions"
+
+class SearchHitType(str, Enum):
+    """Tipo de resultado"""
+    EXAM = "exam"
+    QUESTION = "question"
+
+class SearchHit(SQLModel):
+    """Resultado de búsqueda ordenado por relevancia"""
+    type: SearchHitType
+    id: int
+    exam_id: int
+    title: str
+    rank: float
+
+class SearchResults(SQLModel):
+    """Página de resultados de búsqueda"""
+    query: str
+    results: List[SearchHit] = []
+
+class SuggestionField(str, Enum):
+    """Campo sobre el que se sugiere"""
+    TITLE = "title"
+    SUBJECT = "subject"
+    TAG = "tag"
+
+class Suggestion(SQLModel):
+    """Sugerencia de autocompletado o coincidencia aproximada"""
+    field: SuggestionField
+    value: str
+    # Número de exámenes (o etiquetas) con ese valor
+    weight: int
+    # Similitud de trigramas (solo búsqueda aproximada)
+    similarity: Optional[float] = None
+
+class SuggestionResults(SQLModel):
+    """Sugerencias para una consulta"""
+    query: str
+    suggestions: List[Suggestion] = []
+
+class FacetEntity(str, Enum):
+    """Entidad filtrada por facetas"""
+    QUESTION = "question"
+    EXAM = "exam"
+
+class TagFacet(SQLModel):
+    """Número de resultados con una etiqueta"""
+    tag_id: int
+    name: str
+    count: int
+
+class ValueFacet(SQLModel):
+    """Número de resultados con un valor (asignatura o dificultad)"""
+    value: str
+    count: int
+
+class FacetResults(SQLModel):
+    """Página de ids filtrados y recuentos por faceta dentro del resultado"""
+    entity: FacetEntity
+    total: int
+    ids: List[int] = []
+    tags: List[TagFacet] = []
+    subjects: List[ValueFacet] = []
+    difficulties: List[ValueFacet] = []
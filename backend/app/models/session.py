@@ -1,4 +1,5 @@
 from typing import Optional, List, TYPE_CHECKING
+from sqlalchemy import Column, Index, JSON, UniqueConstraint
 from sqlmodel import Field, SQLModel, Relationship
 from enum import Enum
 from datetime import datetime
@@ -29,9 +30,18 @@ class ExamSessionBase(SQLModel):
 
 class ExamSession(ExamSessionBase, BaseModel, table=True):
     """Modelo de tabla para ExamSession"""
+    __table_args__ = (
+        # Barrido de sesiones con tiempo agotado
+        Index("ix_examsession_status_end_time", "status", "end_time"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     exam_id: int = Field(foreign_key="exam.id")
     student_id: int = Field(foreign_key="user.id")
+    # Semilla del orden aleatorio de preguntas/opciones de esta sesión
+    shuffle_seed: Optional[int] = Field(default=None)
+    # Huella de la clave de respuestas con la que se lleva earned_points; None si el
+    # acumulado mezcla claves (el examen cambió durante la sesión): se corrige completa al sellar
+    answer_key_hash: Optional[str] = Field(default=None, max_length=64)
     
     # Relationships
     exam: "Exam" = Relationship(back_populates="sessions")
@@ -78,11 +88,20 @@ class StudentAnswerBase(SQLModel):
     points_earned: Optional[float] = Field(default=None, ge=0.0)
 
 class StudentAnswer(StudentAnswerBase, BaseModel, table=True):
-    """Modelo de tabla para StudentAnswer"""
+    """
+    Modelo de tabla para StudentAnswer
+    Una respuesta por pregunta y sesión; en opción múltiple las opciones
+    marcadas se guardan en selected_option_ids
+    """
+    __table_args__ = (
+        UniqueConstraint("session_id", "question_id", name="uq_studentanswer_session_question"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: int = Field(foreign_key="examsession.id")
     question_id: int = Field(foreign_key="question.id")
     selected_option_id: Optional[int] = Field(default=None, foreign_key="option.id")
+    selected_option_ids: Optional[List[int]] = Field(default=None, sa_column=Column(JSON))
     
     # Relationships
     session: ExamSession = Relationship(back_populates="student_answers")
@@ -93,6 +112,11 @@ class StudentAnswerCreate(SQLModel):
     """Modelo para crear respuesta de estudiante"""
     question_id: int
     selected_option_id: Optional[int] = None
+    selected_option_ids: Optional[List[int]] = None  # Opción múltiple
+
+class BufferedAnswer(StudentAnswerCreate):
+    """Respuesta del buffer de autoguardado con el instante en que se recibió"""
+    answered_at: datetime = Field(default_factory=datetime.utcnow)
 
 class StudentAnswerRead(StudentAnswerBase, TimestampMixin):
     """Modelo para leer respuesta de estudiante"""
@@ -100,6 +124,7 @@ class StudentAnswerRead(StudentAnswerBase, TimestampMixin):
     session_id: int
     question_id: int
     selected_option_id: Optional[int] = None
+    selected_option_ids: Optional[List[int]] = None
 
 class StudentAnswerReadWithDetails(StudentAnswerRead):
     """Modelo para leer respuesta con detalles"""
@@ -109,6 +134,7 @@ class StudentAnswerReadWithDetails(StudentAnswerRead):
 class StudentAnswerUpdate(SQLModel):
     """Modelo para actualizar respuesta de estudiante"""
     selected_option_id: Optional[int] = None
+    selected_option_ids: Optional[List[int]] = None
     is_correct: Optional[bool] = None
     points_earned: Optional[float] = Field(default=None, ge=0.0)
 
@@ -124,7 +150,14 @@ class SessionFinishResponse(SQLModel):
     score: Optional[float]
     earned_points: Optional[float]
     total_points: Optional[float]
+    percentile_rank: Optional[float] = None  # % de sesiones del examen con menor puntuación
 
 class TimeRemainingResponse(SQLModel):
     """Respuesta para tiempo restante"""
     time_remaining: Optional[int]
+
+class AnswerAutosaveResponse(SQLModel):
+    """Respuesta para el autoguardado de respuestas"""
+    session_id: int
+    buffered: bool
+    answers_count: int
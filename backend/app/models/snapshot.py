@@ -0,0 +1,75 @@
+from typing import Optional, List
+from sqlmodel import Field, SQLModel
+from .exam import ExamStatus
+from .question import QuestionType, QuestionDifficulty
+
+# =====================================================
+# Snapshot serializado de un examen (caché)
+# =====================================================
+
+class SnapshotOption(SQLModel):
+    """Opción dentro del snapshot de un examen"""
+    id: int
+    text: str
+    order_index: int = 0
+    is_correct: bool = False
+
+class SnapshotQuestion(SQLModel):
+    """Pregunta activa dentro del snapshot de un examen"""
+    id: int
+    text: str
+    question_type: QuestionType
+    points: float
+    difficulty: QuestionDifficulty
+    explanation: Optional[str] = None
+    order_index: int = 0
+    options: List[SnapshotOption] = []
+
+class ExamSnapshot(SQLModel):
+    """
+    Examen completo (preguntas activas y opciones) tal como está en una versión
+    Se trata como inmutable: cualquier cambio genera una versión nueva
+    """
+    exam_id: int
+    version: int
+    title: str
+    description: Optional[str] = None
+    subject: str
+    instructions: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    passing_score: float
+    status: ExamStatus
+    randomize_questions: bool = False
+    randomize_options: bool = False
+    questions: List[SnapshotQuestion] = []
+    answer_key_hash: str
+
+# =====================================================
+# Vista del alumno (sin respuestas correctas)
+# =====================================================
+
+class StudentOptionRead(SQLModel):
+    """Opción visible para el alumno"""
+    id: int
+    text: str
+    order_index: int = 0
+
+class StudentQuestionRead(SQLModel):
+    """Pregunta visible para el alumno"""
+    id: int
+    text: str
+    question_type: QuestionType
+    points: float
+    order_index: int = 0
+    options: List[StudentOptionRead] = []
+
+class StudentExamRead(SQLModel):
+    """Examen tal como lo ve el alumno"""
+    exam_id: int
+    version: int
+    title: str
+    description: Optional[str] = None
+    subject: str
+    instructions: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    questions: List[StudentQuestionRead] = Field(default_factory=list)
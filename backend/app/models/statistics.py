@@ -0,0 +1,95 @@
+from typing import List, Optional
+from sqlalchemy import Column, JSON, LargeBinary
+from sqlmodel import Field, SQLModel
+from .base import BaseModel
+from .question import QuestionType
+
+# Número de cubetas del histograma de puntuaciones (cada una cubre 10 puntos)
+SCORE_HISTOGRAM_BUCKETS = 10
+
+def empty_score_histogram() -> List[int]:
+    """Histograma de puntuaciones vacío"""
+    return [0] * SCORE_HISTOGRAM_BUCKETS
+
+class ExamStatisticsBase(SQLModel):
+    """Modelo base para ExamStatistics - agregados materializados de un examen"""
+    attempt_count: int = Field(default=0, ge=0)
+    completed_count: int = Field(default=0, ge=0)
+    score_sum: float = Field(default=0.0)
+    score_sum_squares: float = Field(default=0.0)
+    score_histogram: List[int] = Field(
+        default_factory=empty_score_histogram, sa_column=Column(JSON, nullable=False)
+    )
+
+class ExamStatistics(ExamStatisticsBase, BaseModel, table=True):
+    """
+    Modelo de tabla para ExamStatistics
+    Una fila por examen, actualizada incrementalmente al iniciar y finalizar sesiones
+    """
+    exam_id: int = Field(foreign_key="exam.id", primary_key=True)
+    # Recorrecciones del examen: cambian is_correct sin cambiar completed_count
+    regrade_count: int = Field(default=0, ge=0)
+    # t-digest serializado de las puntuaciones (percentiles sin recorrer las sesiones)
+    score_digest: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+
+# =====================================================
+# Distribución de puntuaciones (t-digest)
+# =====================================================
+
+class ScorePercentile(SQLModel):
+    """Puntuación aproximada en un cuantil"""
+    quantile: float
+    score: float
+
+class ScoreHistogramBin(SQLModel):
+    """Número aproximado de sesiones con puntuación en [lower, upper)"""
+    lower: float
+    upper: float
+    count: float
+
+class ScoreDistribution(SQLModel):
+    """Percentiles e histograma de las puntuaciones de un examen"""
+    exam_id: int
+    count: int
+    median: Optional[float] = None
+    p90: Optional[float] = None
+    percentiles: List[ScorePercentile] = []
+    histogram: List[ScoreHistogramBin] = []
+
+class ScorePercentileRank(SQLModel):
+    """Porcentaje de sesiones con menor puntuación (los empates cuentan la mitad)"""
+    exam_id: int
+    score: float
+    count: int
+    percentile_rank: Optional[float] = None
+
+# =====================================================
+# Análisis de ítems (psicometría clásica)
+# =====================================================
+
+class OptionAnalysis(SQLModel):
+    """Tasa de selección de una opción en total y en los grupos superior e inferior"""
+    option_id: int
+    is_correct: bool
+    selection_rate: float
+    upper_rate: float
+    lower_rate: float
+
+class ItemAnalysis(SQLModel):
+    """Índices de una pregunta calculados sobre las sesiones corregidas"""
+    question_id: int
+    question_type: QuestionType
+    points: float
+    p_value: float                          # tasa de acierto (puntuación media / puntos)
+    discrimination: Optional[float] = None  # grupo superior 27% - grupo inferior 27%
+    point_biserial: Optional[float] = None  # correlación con el resto de la puntuación
+    omit_rate: float
+    options: List[OptionAnalysis] = []
+
+class ItemAnalysisReport(SQLModel):
+    """Análisis de ítems de un examen en una versión dada"""
+    exam_id: int
+    version: int
+    sessions_analyzed: int
+    cronbach_alpha: Optional[float] = None
+    items: List[ItemAnalysis] = []
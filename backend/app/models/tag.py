@@ -1,9 +1,20 @@
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import Field, SQLModel, Relationship
-from .base import BaseModel
+from .base import BaseModel, TimestampMixin
 
 if TYPE_CHECKING:
     from .exam import Exam
+    from .question import Question
+
+class ExamTagLink(SQLModel, table=True):
+    """Relación muchos a muchos entre exámenes y etiquetas"""
+    exam_id: int = Field(foreign_key="exam.id", primary_key=True)
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True, index=True)
+
+class QuestionTagLink(SQLModel, table=True):
+    """Relación muchos a muchos entre preguntas y etiquetas"""
+    question_id: int = Field(foreign_key="question.id", primary_key=True)
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True, index=True)
 
 class TagBase(SQLModel):
     """Modelo base para Tag - campos compartidos"""
@@ -15,18 +26,24 @@ class Tag(TagBase, BaseModel, table=True):
     """Modelo de tabla para Tag"""
     id: Optional[int] = Field(default=None, primary_key=True)
 
+    # Relationships
+    exams: List["Exam"] = Relationship(back_populates="tags", link_model=ExamTagLink)
+    questions: List["Question"] = Relationship(back_populates="tags", link_model=QuestionTagLink)
+
 class TagCreate(TagBase):
     """Modelo para crear etiqueta"""
     pass
 
-class TagRead(TagBase):
+class TagRead(TagBase, TimestampMixin):
     """Modelo para leer etiqueta"""
     id: int
-    created_at: str
-    updated_at: Optional[str] = None
 
 class TagUpdate(SQLModel):
     """Modelo para actualizar etiqueta"""
     name: Optional[str] = Field(default=None, max_length=50)
     description: Optional[str] = Field(default=None, max_length=200)
     color: Optional[str] = Field(default=None, max_length=7)
+
+class TagAssignment(SQLModel):
+    """Etiquetas asignadas a un examen o una pregunta (reemplaza las actuales)"""
+    tag_ids: List[int] = []
@@ -26,6 +26,8 @@ class User(UserBase, BaseModel, table=True):
     """Modelo de tabla para User"""
     id: Optional[int] = Field(default=None, primary_key=True)
     hashed_password: str = Field(max_length=255)
+    # Se incrementa al cambiar rol, estado o contraseña: invalida los tokens emitidos
+    token_version: int = Field(default=0)
     
     # Relationships
     created_exams: List["Exam"] = Relationship(back_populates="creator")
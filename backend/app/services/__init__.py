@@ -4,9 +4,29 @@
 from .exam_service import ExamService
 from .session_service import SessionService
 from .question_service import QuestionService
+from .statistics_service import StatisticsService
+from .scoring_service import ScoringService
+from .answer_buffer import AnswerBuffer
+from .snapshot_service import SnapshotService
+from .search_service import SearchService
+from .autocomplete_service import AutocompleteService
+from .facet_service import FacetService
+from .tag_service import TagService
+from .item_analysis_service import ItemAnalysisService
+from .similarity_service import SimilarityService
 
 __all__ = [
     "ExamService",
     "SessionService",
-    "QuestionService"
+    "QuestionService",
+    "StatisticsService",
+    "ScoringService",
+    "AnswerBuffer",
+    "SnapshotService",
+    "SearchService",
+    "AutocompleteService",
+    "FacetService",
+    "TagService",
+    "ItemAnalysisService",
+    "SimilarityService"
 ]
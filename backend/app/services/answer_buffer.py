@@ -0,0 +1,97 @@
+"""
+Buffer de escritura diferida (write-behind) de respuestas en Redis
+Durante un examen los autoguardados se acumulan en un hash por sesión;
+SessionService los vuelca a la tabla studentanswer en lotes. Cada respuesta
+guarda el instante en que se recibió para que el volcado no pise una
+respuesta más reciente escrita directamente en la base de datos.
+"""
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.session import BufferedAnswer, StudentAnswerCreate
+from datetime import datetime
+from typing import List
+
+ANSWERS_KEY = "exam-scan:answers:{session_id}"
+DIRTY_SESSIONS_KEY = "exam-scan:answers:dirty"
+# Caducidad de seguridad de un buffer que nunca llega a volcarse
+BUFFER_TTL_SECONDS = 24 * 60 * 60
+
+
+class AnswerBuffer:
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """El modo buffered requiere Redis configurado"""
+        return settings.ANSWER_INGEST_MODE == "buffered" and get_redis() is not None
+
+    @staticmethod
+    def buffer_answers(session_id: int, answers: List[StudentAnswerCreate]) -> int:
+        """
+        Guarda respuestas en el hash de la sesión (una entrada por pregunta)
+        y marca la sesión como pendiente de volcar. Retorna las preguntas guardadas.
+        """
+        redis = get_redis()
+        if redis is None:
+            raise RuntimeError("Redis is not configured")
+
+        latest = {answer.question_id: answer for answer in answers}
+        if not latest:
+            return 0
+
+        now = datetime.utcnow()
+        key = ANSWERS_KEY.format(session_id=session_id)
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={
+            str(question_id): BufferedAnswer(**answer.model_dump(), answered_at=now).model_dump_json()
+            for question_id, answer in latest.items()
+        })
+        pipe.expire(key, BUFFER_TTL_SECONDS)
+        pipe.sadd(DIRTY_SESSIONS_KEY, session_id)
+        pipe.execute()
+        return len(latest)
+
+    @staticmethod
+    def drain(session_id: int) -> List[BufferedAnswer]:
+        """Lee y borra de forma atómica el hash de respuestas de una sesión"""
+        redis = get_redis()
+        if redis is None:
+            return []
+
+        key = ANSWERS_KEY.format(session_id=session_id)
+        pipe = redis.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.delete(key)
+        buffered, _ = pipe.execute()
+        return [BufferedAnswer.model_validate_json(value) for value in buffered.values()]
+
+    @staticmethod
+    def restore(session_id: int, answers: List[BufferedAnswer]) -> None:
+        """Devuelve respuestas al buffer sin pisar otras más recientes (HSETNX)"""
+        redis = get_redis()
+        if redis is None or not answers:
+            return
+
+        key = ANSWERS_KEY.format(session_id=session_id)
+        pipe = redis.pipeline(transaction=True)
+        for answer in answers:
+            pipe.hsetnx(key, str(answer.question_id), answer.model_dump_json())
+        pipe.expire(key, BUFFER_TTL_SECONDS)
+        pipe.sadd(DIRTY_SESSIONS_KEY, session_id)
+        pipe.execute()
+
+    @staticmethod
+    def mark_pending(session_ids: List[int]) -> None:
+        """Vuelve a marcar sesiones como pendientes (p.ej. extraídas y no procesadas)"""
+        redis = get_redis()
+        if redis is None or not session_ids:
+            return
+        redis.sadd(DIRTY_SESSIONS_KEY, *session_ids)
+
+    @staticmethod
+    def pop_pending_sessions(limit: int) -> List[int]:
+        """Extrae hasta `limit` sesiones marcadas como pendientes de volcar"""
+        redis = get_redis()
+        if redis is None:
+            return []
+        return [int(session_id) for session_id in redis.spop(DIRTY_SESSIONS_KEY, limit) or []]
@@ -0,0 +1,196 @@
+"""
+Autocompletado y búsqueda aproximada de títulos, asignaturas y etiquetas
+El autocompletado se sirve desde un trie en memoria con las mejores
+sugerencias precalculadas en cada nodo: responder es recorrer el prefijo, sin
+consultar la base de datos. El trie se reconstruye periódicamente
+(AUTOCOMPLETE_REBUILD_SECONDS) y se sustituye de forma atómica.
+La búsqueda aproximada usa pg_trgm (índices GIN de trigramas) en PostgreSQL y,
+en otros motores, la misma similitud de trigramas calculada sobre el vocabulario
+del trie.
+"""
+
+from sqlalchemy import desc, func
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models.exam import Exam
+from app.models.search import Suggestion, SuggestionField
+from app.models.tag import Tag
+from app.services.search_index import tokenize
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import heapq
+import threading
+
+# Similitud mínima para considerar una coincidencia (pg_trgm.similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+# Profundidad máxima del trie: prefijos más largos se resuelven filtrando
+MAX_PREFIX_LENGTH = 32
+
+# Columna de origen de cada campo
+_COLUMNS = {
+    SuggestionField.TITLE: Exam.title,
+    SuggestionField.SUBJECT: Exam.subject,
+    SuggestionField.TAG: Tag.name,
+}
+
+# Sugerencia precalculada: (-peso, valor) ordena por peso y después alfabéticamente
+Entry = Tuple[int, str]
+
+
+def normalize(value: str) -> str:
+    """Clave de búsqueda: minúsculas, sin acentos, palabras separadas por un espacio"""
+    return " ".join(tokenize(value))
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigramas de pg_trgm: cada palabra con dos espacios delante y uno detrás"""
+    result = set()
+    for word in tokenize(value):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def trigram_similarity(left: str, right: str) -> float:
+    """Equivalente a similarity() de pg_trgm: trigramas comunes / trigramas totales"""
+    left_trigrams, right_trigrams = trigrams(left), trigrams(right)
+    if not left_trigrams or not right_trigrams:
+        return 0.0
+    return len(left_trigrams & right_trigrams) / len(left_trigrams | right_trigrams)
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.top: List[Entry] = []
+
+
+class AutocompleteTrie:
+    """Trie de solo lectura con las top-k sugerencias de cada prefijo"""
+
+    def __init__(self, values: Dict[str, int], top_k: int):
+        """values: valor a mostrar -> peso (p.ej. número de exámenes)"""
+        self.values = values
+        self._root = _TrieNode()
+        # Sugerencias que terminan en cada nodo (antes de propagar hacia arriba)
+        own: Dict[int, List[Entry]] = {}
+        for value, weight in values.items():
+            words = normalize(value).split(" ")
+            # Se indexa desde el inicio de cada palabra: "lineal" sugiere "Álgebra lineal"
+            for start in range(len(words)):
+                node = self._root
+                for char in " ".join(words[start:])[:MAX_PREFIX_LENGTH]:
+                    node = node.children.setdefault(char, _TrieNode())
+                own.setdefault(id(node), []).append((-weight, value))
+        self._fill_top(self._root, own, top_k)
+
+    @staticmethod
+    def _fill_top(root: _TrieNode, own: Dict[int, List[Entry]], top_k: int) -> None:
+        # Post-orden iterativo: cada nodo combina lo suyo con las listas de sus hijos
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            candidates = list(own.get(id(node), []))
+            for child in node.children.values():
+                candidates.extend(child.top)
+            # Un valor puede llegar por varias palabras: se queda una vez
+            node.top = heapq.nsmallest(top_k, set(candidates))
+
+    def suggest(self, prefix: str, limit: int) -> List[Entry]:
+        key = normalize(prefix)
+        node = self._root
+        for char in key[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if len(key) > MAX_PREFIX_LENGTH:
+            return [entry for entry in node.top if key in normalize(entry[1])][:limit]
+        return node.top[:limit]
+
+
+# Tries vigentes por campo; None hasta la primera petición
+_tries: Optional[Dict[SuggestionField, AutocompleteTrie]] = None
+_rebuild_lock = threading.Lock()
+
+
+class AutocompleteService:
+
+    @staticmethod
+    def suggest(prefix: str, field: SuggestionField, session: Session, limit: int = 10) -> List[Suggestion]:
+        """Sugerencias para un prefijo (por peso y orden alfabético)"""
+        tries = _tries if _tries is not None else AutocompleteService.rebuild(session)
+        return [
+            Suggestion(field=field, value=value, weight=-weight)
+            for weight, value in tries[field].suggest(prefix, limit)
+        ]
+
+    @staticmethod
+    def fuzzy(query: str, field: SuggestionField, session: Session, limit: int = 10) -> List[Suggestion]:
+        """Valores parecidos a la consulta (errores de escritura), por similitud de trigramas"""
+        if not trigrams(query):
+            return []
+        if session.get_bind().dialect.name == "postgresql":
+            return AutocompleteService._fuzzy_pg_trgm(query, field, session, limit)
+
+        tries = _tries if _tries is not None else AutocompleteService.rebuild(session)
+        scored = []
+        for value, weight in tries[field].values.items():
+            similarity = trigram_similarity(query, value)
+            if similarity >= SIMILARITY_THRESHOLD:
+                scored.append((similarity, weight, value))
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [
+            Suggestion(field=field, value=value, weight=weight, similarity=similarity)
+            for similarity, weight, value in scored[:limit]
+        ]
+
+    @staticmethod
+    def _fuzzy_pg_trgm(query: str, field: SuggestionField, session: Session, limit: int) -> List[Suggestion]:
+        column = _COLUMNS[field]
+        similarity = func.similarity(column, query).label("similarity")
+        weight = func.count().label("weight")
+        rows = session.exec(
+            select(column, similarity, weight)
+            # El operador % usa el índice GIN de trigramas
+            .where(column.op("%")(query))
+            .group_by(column)
+            .order_by(desc("similarity"), desc("weight"), column)
+            .limit(limit)
+        ).all()
+        return [
+            Suggestion(field=field, value=value, weight=count, similarity=score)
+            for value, score, count in rows
+        ]
+
+    @staticmethod
+    def rebuild(session: Session) -> Dict[SuggestionField, AutocompleteTrie]:
+        """Construye los tries desde la base de datos y los publica"""
+        global _tries
+        with _rebuild_lock:
+            tries = {}
+            for field, column in _COLUMNS.items():
+                rows = session.exec(select(column, func.count()).group_by(column)).all()
+                tries[field] = AutocompleteTrie(
+                    {value: count for value, count in rows if value}, settings.AUTOCOMPLETE_MAX_SUGGESTIONS
+                )
+            # Asignación atómica: las lecturas en curso siguen con los tries anteriores
+            _tries = tries
+            return tries
+
+    @staticmethod
+    def rebuild_job(session_factory: Callable[[], Session]) -> int:
+        """Tarea periódica de reconstrucción; retorna el número de valores indexados"""
+        with session_factory() as session:
+            tries = AutocompleteService.rebuild(session)
+        return sum(len(trie.values) for trie in tries.values())
+
+    @staticmethod
+    def reset() -> None:
+        """Descarta los tries (tests)"""
+        global _tries
+        _tries = None
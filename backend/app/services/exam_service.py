@@ -3,9 +3,11 @@ Servicio de lógica de negocio para exámenes
 Maneja operaciones complejas que van más allá del CRUD básico
 """
 
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
 from app.models.exam import Exam, ExamStatus
 from app.models.question import Question
+from app.services.snapshot_service import SnapshotService
+from app.services.statistics_service import StatisticsService
 from fastapi import HTTPException
 
 
@@ -55,6 +57,9 @@ class ExamService:
         session.commit()
         session.refresh(exam)
         
+        # Pre-calentar el snapshot para la avalancha de inicios de examen
+        SnapshotService.warm(exam_id, session)
+        
         return exam
     
     @staticmethod
@@ -70,6 +75,7 @@ class ExamService:
         session.add(exam)
         session.commit()
         session.refresh(exam)
+        SnapshotService.invalidate(exam_id)
         
         return exam
     
@@ -78,25 +84,23 @@ class ExamService:
         """
         Obtiene estadísticas de un examen
         - Número de preguntas
-        - Número de sesiones completadas
-        - Promedio de puntuación
+        - Intentos y sesiones completadas
+        - Promedio, desviación típica e histograma de puntuaciones
+        Los agregados de sesiones se leen de la tabla materializada ExamStatistics
         """
         exam = session.get(Exam, exam_id)
         if not exam:
             raise HTTPException(status_code=404, detail="Exam not found")
         
-        questions_count = len(session.exec(
-            select(Question).where(Question.exam_id == exam_id)
-        ).all())
-        
-        # TODO: Implementar estadísticas de sesiones cuando tengamos el modelo Session
+        questions_count = session.exec(
+            select(func.count()).select_from(Question).where(Question.exam_id == exam_id)
+        ).one()
         
         return {
             "exam_id": exam_id,
             "title": exam.title,
             "questions_count": questions_count,
-            "sessions_completed": 0,  # TODO: calcular cuando tengamos sessions
-            "average_score": 0.0,     # TODO: calcular cuando tengamos sessions
+            **StatisticsService.get_summary(exam_id, session),
             "status": exam.status,
             "is_public": exam.is_public
         }
@@ -0,0 +1,289 @@
+"""
+Exportación de preguntas y resultados de sesiones en CSV o NDJSON
+Las filas se leen con un cursor de servidor (yield_per) y se serializan por
+bloques a medida que se envían: la memoria usada no depende del número de
+filas. La compresión gzip opcional también es incremental.
+La matriz de respuestas se exporta además en Parquet o Arrow IPC, construida
+por record batches; pyarrow es una dependencia opcional (extra "analytics").
+"""
+
+from datetime import datetime
+from enum import Enum
+from itertools import groupby
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.core.exceptions import not_implemented_error
+from app.models.exam import Exam
+from app.models.question import Question, Option
+from app.models.export import ColumnarFormat
+from app.models.session import ExamSession, SessionStatus, StudentAnswer
+from app.models.user import User
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+import csv
+import io
+import json
+import zlib
+
+# Tamaño aproximado de cada bloque enviado al cliente
+CHUNK_SIZE = 64 * 1024
+# Separador de listas en celdas CSV
+LIST_SEPARATOR = " | "
+
+Bind = Union[Engine, Connection]
+
+QUESTION_COLUMNS = [
+    "id", "exam_id", "text", "question_type", "difficulty", "points",
+    "explanation", "order_index", "is_active", "options", "correct_options",
+]
+
+SESSION_COLUMNS = [
+    "id", "exam_id", "exam_title", "student_id", "student_email", "student_username",
+    "attempt_number", "status", "start_time", "end_time", "score",
+    "earned_points", "total_points", "time_spent_minutes",
+]
+
+# Matriz de respuestas en formato largo: una fila por sesión y pregunta
+ANSWER_MATRIX_COLUMNS = [
+    "session_id", "exam_id", "student_id", "attempt_number", "question_id",
+    "selected_option_id", "selected_option_ids", "is_correct", "points_earned", "answered_at",
+]
+
+# Celdas CSV que no son un campo directo de la fila
+QUESTION_CSV_FORMATTERS: Dict[str, Callable[[dict], object]] = {
+    "options": lambda row: LIST_SEPARATOR.join(option["text"] for option in row["options"]),
+    "correct_options": lambda row: LIST_SEPARATOR.join(
+        option["text"] for option in row["options"] if option["is_correct"]
+    ),
+}
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _load_pyarrow():
+    """Importa pyarrow solo cuando se pide una exportación columnar"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise not_implemented_error("Columnar exports require pyarrow (install the 'analytics' extra)")
+    return pyarrow
+
+
+def _answer_matrix_schema(pa):
+    return pa.schema([
+        ("session_id", pa.int64()),
+        ("exam_id", pa.int64()),
+        ("student_id", pa.int64()),
+        ("attempt_number", pa.int32()),
+        ("question_id", pa.int64()),
+        ("selected_option_id", pa.int64()),
+        ("selected_option_ids", pa.list_(pa.int64())),
+        ("is_correct", pa.bool_()),
+        ("points_earned", pa.float64()),
+        ("answered_at", pa.timestamp("us")),
+    ])
+
+
+class _ChunkSink:
+    """Fichero de solo escritura que retiene los bytes hasta que se envían"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+
+    @staticmethod
+    def question_rows(bind: Bind, exam_id: Optional[int] = None) -> Iterator[dict]:
+        """Preguntas con sus opciones, una fila por pregunta, en orden de examen"""
+        question_columns = [
+            Question.id, Question.exam_id, Question.text, Question.question_type, Question.difficulty,
+            Question.points, Question.explanation, Question.order_index, Question.is_active,
+        ]
+        statement = (
+            select(*question_columns, Option.text.label("option_text"), Option.is_correct.label("option_is_correct"))
+            .join(Option, Option.question_id == Question.id, isouter=True)
+            .order_by(Question.exam_id, Question.order_index, Question.id, Option.order_index, Option.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        if exam_id is not None:
+            statement = statement.where(Question.exam_id == exam_id)
+
+        # Sesión propia: la de la petición se cierra antes de que empiece el stream
+        with Session(bind) as session:
+            rows = (row._asdict() for row in session.exec(statement))
+            # Las opciones de una pregunta llegan consecutivas
+            for _, group in groupby(rows, key=lambda row: row["id"]):
+                group = list(group)
+                question = {column.key: _plain(group[0][column.key]) for column in question_columns}
+                question["options"] = [
+                    {"text": row["option_text"], "is_correct": row["option_is_correct"]}
+                    for row in group if row["option_text"] is not None
+                ]
+                yield question
+
+    @staticmethod
+    def session_rows(
+        bind: Bind,
+        exam_id: Optional[int] = None,
+        status: Optional[SessionStatus] = None,
+    ) -> Iterator[dict]:
+        """Resultados de las sesiones con el examen y el estudiante"""
+        statement = (
+            select(
+                ExamSession.id, ExamSession.exam_id, Exam.title.label("exam_title"),
+                ExamSession.student_id, User.email.label("student_email"),
+                User.username.label("student_username"), ExamSession.attempt_number,
+                ExamSession.status, ExamSession.start_time, ExamSession.end_time, ExamSession.score,
+                ExamSession.earned_points, ExamSession.total_points, ExamSession.time_spent_minutes,
+            )
+            .join(Exam, Exam.id == ExamSession.exam_id)
+            .join(User, User.id == ExamSession.student_id)
+            .order_by(ExamSession.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        if exam_id is not None:
+            statement = statement.where(ExamSession.exam_id == exam_id)
+        if status is not None:
+            statement = statement.where(ExamSession.status == status)
+
+        with Session(bind) as session:
+            for row in session.exec(statement):
+                yield {key: _plain(value) for key, value in row._asdict().items()}
+
+    @staticmethod
+    def answer_matrix(
+        bind: Bind,
+        columnar_format: ColumnarFormat,
+        exam_id: Optional[int] = None,
+        status: Optional[SessionStatus] = None,
+    ) -> Iterator[bytes]:
+        """
+        Respuestas de los estudiantes (estudiante × pregunta) en Parquet o Arrow IPC
+        Comprueba pyarrow antes de empezar para poder responder 501 si falta
+        """
+        pa = _load_pyarrow()
+        batches = ExportService._answer_batches(pa, bind, exam_id, status)
+        return ExportService._write_columnar(pa, batches, columnar_format)
+
+    @staticmethod
+    def _answer_batches(pa, bind: Bind, exam_id: Optional[int], status: Optional[SessionStatus]):
+        """Un record batch por cada lote del cursor de servidor"""
+        schema = _answer_matrix_schema(pa)
+        statement = (
+            select(
+                StudentAnswer.session_id, ExamSession.exam_id, ExamSession.student_id,
+                ExamSession.attempt_number, StudentAnswer.question_id, StudentAnswer.selected_option_id,
+                StudentAnswer.selected_option_ids, StudentAnswer.is_correct, StudentAnswer.points_earned,
+                StudentAnswer.answered_at,
+            )
+            .join(ExamSession, ExamSession.id == StudentAnswer.session_id)
+            .order_by(StudentAnswer.session_id, StudentAnswer.question_id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        if exam_id is not None:
+            statement = statement.where(ExamSession.exam_id == exam_id)
+        if status is not None:
+            statement = statement.where(ExamSession.status == status)
+
+        with Session(bind) as session:
+            for partition in session.exec(statement).partitions():
+                columns = zip(*partition)
+                yield pa.RecordBatch.from_arrays(
+                    [pa.array(values, type=column.type) for values, column in zip(columns, schema)],
+                    schema=schema,
+                )
+
+    @staticmethod
+    def _write_columnar(pa, batches, columnar_format: ColumnarFormat) -> Iterator[bytes]:
+        """Escribe los batches (un row group por batch en Parquet) y envía lo escrito tras cada uno"""
+        schema = _answer_matrix_schema(pa)
+        sink = _ChunkSink()
+        if columnar_format == ColumnarFormat.PARQUET:
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+        else:
+            writer = pa.ipc.new_file(pa.PythonFile(sink, mode="w"), schema)
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def to_csv(
+        rows: Iterable[dict],
+        columns: List[str],
+        formatters: Optional[Dict[str, Callable[[dict], object]]] = None,
+    ) -> Iterator[bytes]:
+        """Serializa filas a CSV (UTF-8, con cabecera) en bloques de ~CHUNK_SIZE"""
+        formatters = formatters or {}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([
+                formatters[column](row) if column in formatters else row.get(column)
+                for column in columns
+            ])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue().encode()
+
+    @staticmethod
+    def to_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+        """Serializa filas a JSON por líneas en bloques de ~CHUNK_SIZE"""
+        chunk: List[str] = []
+        size = 0
+        for row in rows:
+            line = json.dumps(row, ensure_ascii=False) + "\n"
+            chunk.append(line)
+            size += len(line)
+            if size >= CHUNK_SIZE:
+                yield "".join(chunk).encode()
+                chunk, size = [], 0
+        if chunk:
+            yield "".join(chunk).encode()
+
+    @staticmethod
+    def gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Comprime un flujo de bloques en formato gzip sin acumularlo"""
+        # wbits=31: cabecera y checksum gzip en lugar de zlib
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
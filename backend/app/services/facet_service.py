@@ -0,0 +1,187 @@
+"""
+Filtrado por facetas (etiquetas, asignatura y dificultad) con bitmaps
+Para cada valor de faceta se guarda en memoria el bitmap comprimido de los ids
+que lo tienen; un filtro combinado es la intersección de sus bitmaps y los
+recuentos de cada faceta son cardinalidades de intersección, sin consultas.
+El índice se descarta tras cualquier escritura confirmada sobre exámenes,
+preguntas o etiquetas de este worker y, como mucho, cada FACET_INDEX_TTL_SECONDS
+para recoger las de otros workers; se reconstruye en la siguiente petición.
+"""
+
+from dataclasses import dataclass, field
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+from app.core.bitmap import RoaringBitmap
+from app.core.config import settings
+from app.models.exam import Exam
+from app.models.question import Question
+from app.models.search import FacetEntity, FacetResults, TagFacet, ValueFacet
+from app.models.tag import Tag, ExamTagLink, QuestionTagLink
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+# Entidades cuyos cambios invalidan el índice
+_INDEXED_MODELS = (Exam, Question, Tag, ExamTagLink, QuestionTagLink)
+
+
+@dataclass
+class FacetIndex:
+    """Bitmaps de una entidad por valor de faceta"""
+    all: RoaringBitmap
+    tags: Dict[int, RoaringBitmap]
+    subjects: Dict[str, RoaringBitmap]
+    difficulties: Dict[str, RoaringBitmap] = field(default_factory=dict)
+
+
+def _group(rows) -> Dict:
+    groups: Dict = {}
+    for key, entity_id in rows:
+        groups.setdefault(key, []).append(entity_id)
+    return {key: RoaringBitmap(ids) for key, ids in groups.items()}
+
+
+# Índices vigentes: entidad -> índice; nombres de etiquetas; instante de construcción
+_indexes: Optional[Dict[FacetEntity, FacetIndex]] = None
+_tag_names: Dict[int, str] = {}
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+class FacetService:
+
+    @staticmethod
+    def filter(
+        session: Session,
+        entity: FacetEntity = FacetEntity.QUESTION,
+        tag_ids: Optional[List[int]] = None,
+        subject: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> FacetResults:
+        """
+        Ids que tienen todas las etiquetas y la asignatura/dificultad pedidas,
+        con el recuento de cada valor de faceta dentro del resultado
+        """
+        if difficulty is not None and entity == FacetEntity.EXAM:
+            raise HTTPException(status_code=400, detail="Difficulty filter only applies to questions")
+
+        index, tag_names = FacetService._get_index(session, entity)
+        empty = RoaringBitmap()
+        result = index.all
+        for tag_id in tag_ids or []:
+            result = result & index.tags.get(tag_id, empty)
+        if subject is not None:
+            result = result & index.subjects.get(subject, empty)
+        if difficulty is not None:
+            result = result & index.difficulties.get(difficulty, empty)
+
+        ids = []
+        for position, entity_id in enumerate(result):
+            if position >= offset + limit:
+                break
+            if position >= offset:
+                ids.append(entity_id)
+
+        return FacetResults(
+            entity=entity,
+            total=len(result),
+            ids=ids,
+            tags=sorted(
+                (TagFacet(tag_id=tag_id, name=tag_names.get(tag_id, ""), count=count)
+                 for tag_id, count in FacetService._counts(result, index.tags)),
+                key=lambda facet: (-facet.count, facet.name)
+            ),
+            subjects=FacetService._value_facets(result, index.subjects),
+            difficulties=FacetService._value_facets(result, index.difficulties),
+        )
+
+    @staticmethod
+    def _counts(result: RoaringBitmap, bitmaps: Dict) -> List[Tuple]:
+        counts = []
+        for key, bitmap in bitmaps.items():
+            count = result.intersection_len(bitmap)
+            if count:
+                counts.append((key, count))
+        return counts
+
+    @staticmethod
+    def _value_facets(result: RoaringBitmap, bitmaps: Dict[str, RoaringBitmap]) -> List[ValueFacet]:
+        return sorted(
+            (ValueFacet(value=value, count=count) for value, count in FacetService._counts(result, bitmaps)),
+            key=lambda facet: (-facet.count, facet.value)
+        )
+
+    @staticmethod
+    def _get_index(session: Session, entity: FacetEntity) -> Tuple[FacetIndex, Dict[int, str]]:
+        with _lock:
+            indexes, tag_names = _indexes, _tag_names
+            stale = indexes is None or time.monotonic() - _built_at > settings.FACET_INDEX_TTL_SECONDS
+        if stale:
+            indexes, tag_names = FacetService.rebuild(session)
+        return indexes[entity], tag_names
+
+    @staticmethod
+    def rebuild(session: Session) -> Tuple[Dict[FacetEntity, FacetIndex], Dict[int, str]]:
+        """Construye los bitmaps de exámenes y preguntas desde la base de datos"""
+        global _indexes, _tag_names, _built_at
+        started = time.monotonic()
+        question_subjects = select(Exam.subject, Question.id).join(Exam, Exam.id == Question.exam_id)
+        indexes = {
+            FacetEntity.EXAM: FacetIndex(
+                all=RoaringBitmap(session.exec(select(Exam.id)).all()),
+                tags=_group(session.exec(select(ExamTagLink.tag_id, ExamTagLink.exam_id)).all()),
+                subjects=_group(session.exec(select(Exam.subject, Exam.id)).all()),
+            ),
+            FacetEntity.QUESTION: FacetIndex(
+                all=RoaringBitmap(session.exec(select(Question.id)).all()),
+                tags=_group(session.exec(select(QuestionTagLink.tag_id, QuestionTagLink.question_id)).all()),
+                subjects=_group(session.exec(question_subjects).all()),
+                difficulties=_group(
+                    (difficulty.value, question_id)
+                    for difficulty, question_id in session.exec(select(Question.difficulty, Question.id)).all()
+                ),
+            ),
+        }
+        tag_names = dict(session.exec(select(Tag.id, Tag.name)).all())
+        with _lock:
+            # Una invalidación durante la lectura gana: el índice se usa pero no se guarda
+            if _built_at <= started:
+                _indexes, _tag_names, _built_at = indexes, tag_names, started
+        return indexes, tag_names
+
+    @staticmethod
+    def invalidate() -> None:
+        """Descarta el índice; se reconstruye en la siguiente consulta"""
+        global _indexes, _built_at
+        with _lock:
+            _indexes = None
+            _built_at = time.monotonic()
+
+
+# =============================================================================
+# EVENTOS DE ESCRITURA
+# =============================================================================
+
+@event.listens_for(OrmSession, "after_flush")
+def _mark_changes(session, flush_context) -> None:
+    if session.info.get("facets_changed"):
+        return
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, _INDEXED_MODELS):
+            session.info["facets_changed"] = True
+            return
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    if session.info.pop("facets_changed", False):
+        FacetService.invalidate()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changes(session) -> None:
+    session.info.pop("facets_changed", None)
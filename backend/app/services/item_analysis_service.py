@@ -0,0 +1,250 @@
+"""
+Análisis de ítems de un examen (teoría clásica de tests)
+Las respuestas de las sesiones corregidas se cargan en una matriz
+estudiantes × preguntas y todos los índices se calculan con numpy sobre ella:
+tasa de acierto (p), índice de discriminación 27% superior/inferior,
+correlación biserial puntual, selección de distractores y alfa de Cronbach.
+El resultado se cachea por (examen, versión del snapshot, sesiones corregidas).
+"""
+
+from dataclasses import dataclass
+from sqlmodel import Session, select
+from app.core.exceptions import not_found_error
+from app.models.session import ExamSession, StudentAnswer, SessionStatus
+from app.models.snapshot import ExamSnapshot
+from app.models.statistics import ExamStatistics, ItemAnalysis, ItemAnalysisReport, OptionAnalysis
+from app.services.scoring_service import AnswerKey, ScoringService
+from app.services.snapshot_service import SnapshotService
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+import threading
+import numpy as np
+
+# Fracción de estudiantes en los grupos superior e inferior (Kelley)
+GROUP_FRACTION = 0.27
+GRADED_STATUSES = [SessionStatus.COMPLETED, SessionStatus.EXPIRED]
+
+# Caché LRU de informes por (examen, versión, completadas, última actualización)
+ITEM_ANALYSIS_CACHE_SIZE = 128
+_report_cache: "OrderedDict[tuple, ItemAnalysisReport]" = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ResponseMatrix:
+    """
+    Respuestas de las sesiones corregidas en forma de arrays
+    Columnas en el orden de la clave de respuestas (pregunta por id)
+    """
+    item_points: np.ndarray         # float64 (estudiantes × preguntas), puntos obtenidos
+    answered: np.ndarray            # bool (estudiantes × preguntas)
+    selection_groups: np.ndarray    # int64, estudiante de cada selección (única por opción)
+    selection_options: np.ndarray   # int64, posición de la opción en la clave
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+class ItemAnalysisService:
+
+    @staticmethod
+    def get_report(exam_id: int, session: Session) -> ItemAnalysisReport:
+        """
+        Informe de análisis de ítems del examen
+        Se recalcula solo si cambia la versión del examen o se corrige otra sesión
+        """
+        snapshot = SnapshotService.get_snapshot(exam_id, session)
+        if snapshot is None:
+            raise not_found_error("Exam not found")
+
+        # Las estadísticas materializadas cambian con cada sesión finalizada o recorrección
+        stats = session.get(ExamStatistics, exam_id)
+        cache_key = (
+            exam_id, snapshot.version,
+            stats.completed_count if stats else 0, stats.updated_at if stats else None,
+        )
+        with _lock:
+            report = _report_cache.get(cache_key)
+            if report is not None:
+                _report_cache.move_to_end(cache_key)
+                return report
+
+        report = ItemAnalysisService.build_report(snapshot, session)
+        with _lock:
+            _report_cache[cache_key] = report
+            _report_cache.move_to_end(cache_key)
+            while len(_report_cache) > ITEM_ANALYSIS_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+        return report
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Vacía la caché de informes"""
+        with _lock:
+            _report_cache.clear()
+
+    @staticmethod
+    def build_report(snapshot: ExamSnapshot, session: Session) -> ItemAnalysisReport:
+        """Carga la matriz de respuestas de la versión del snapshot y calcula el informe"""
+        key = ScoringService.answer_key_from_snapshot(snapshot)
+        # Sesiones y respuestas en una sola consulta (un único snapshot de la BD): una sesión
+        # que termina durante la lectura entra con todas sus respuestas o no entra.
+        # Las sesiones sin respuestas salen con question_id NULL (cuentan como omisiones)
+        rows = session.exec(
+            select(
+                ExamSession.id, StudentAnswer.question_id, StudentAnswer.selected_option_id,
+                StudentAnswer.selected_option_ids, StudentAnswer.points_earned
+            )
+            .join(StudentAnswer, StudentAnswer.session_id == ExamSession.id, isouter=True)
+            .where(
+                ExamSession.exam_id == snapshot.exam_id,
+                ExamSession.status.in_(GRADED_STATUSES)  # type: ignore[attr-defined]
+            )
+            .order_by(ExamSession.id, StudentAnswer.id)
+        ).all()
+        session_ids = np.unique(np.asarray([row[0] for row in rows], dtype=np.int64))
+        answers = [row for row in rows if row[1] is not None]
+
+        matrix = ItemAnalysisService.response_matrix(key, session_ids, answers)
+        return ItemAnalysisService.analyze(snapshot, key, matrix)
+
+    @staticmethod
+    def response_matrix(key: AnswerKey, session_ids: np.ndarray, answers: Sequence[tuple]) -> ResponseMatrix:
+        """
+        Convierte filas (session_id, question_id, selected_option_id, selected_option_ids,
+        points_earned) en la matriz de puntos y la lista de selecciones por opción
+        Se ignoran respuestas a preguntas u opciones que ya no están en la clave y
+        respuestas de sesiones que no están en session_ids
+        """
+        n_students, n_questions, n_options = len(session_ids), len(key.question_ids), len(key.option_ids)
+        item_points = np.zeros((n_students, n_questions), dtype=np.float64)
+        answered = np.zeros((n_students, n_questions), dtype=bool)
+        if not answers or not n_students or not n_questions:
+            empty = np.zeros(0, dtype=np.int64)
+            return ResponseMatrix(item_points, answered, empty, empty)
+
+        answer_sessions = np.asarray([row[0] for row in answers], dtype=np.int64)
+        groups = np.minimum(np.searchsorted(session_ids, answer_sessions), n_students - 1)
+        question_ids = np.asarray([row[1] for row in answers], dtype=np.int64)
+        points = np.asarray([row[4] or 0.0 for row in answers], dtype=np.float64)
+        q_pos = np.minimum(np.searchsorted(key.question_ids, question_ids), n_questions - 1)
+        # Respuestas de sesiones fuera de session_ids no se atribuyen a otro estudiante
+        valid_q = (key.question_ids[q_pos] == question_ids) & (session_ids[groups] == answer_sessions)
+        np.add.at(item_points, (groups[valid_q], q_pos[valid_q]), points[valid_q])
+        answered[groups[valid_q], q_pos[valid_q]] = True
+
+        # Una selección por opción marcada (la opción múltiple aporta varias)
+        selection_rows: list = []
+        selection_option_ids: list = []
+        for index, (_, _, option_id, option_ids, _) in enumerate(answers):
+            for selected in (option_ids or ([option_id] if option_id is not None else [])):
+                selection_rows.append(index)
+                selection_option_ids.append(selected)
+        rows = np.asarray(selection_rows, dtype=np.int64)
+        option_ids = np.asarray(selection_option_ids, dtype=np.int64)
+        if not n_options or not len(rows):
+            empty = np.zeros(0, dtype=np.int64)
+            return ResponseMatrix(item_points, answered, empty, empty)
+
+        o_pos = np.minimum(np.searchsorted(key.option_ids, option_ids), n_options - 1)
+        valid_o = (
+            valid_q[rows]
+            & (key.option_ids[o_pos] == option_ids)
+            & (key.option_question_idx[o_pos] == q_pos[rows])
+        )
+        pairs = np.unique(groups[rows[valid_o]] * n_options + o_pos[valid_o])
+        return ResponseMatrix(item_points, answered, pairs // n_options, pairs % n_options)
+
+    @staticmethod
+    def upper_lower_groups(totals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices del 27% con mayor y con menor puntuación total"""
+        size = max(1, int(round(GROUP_FRACTION * len(totals))))
+        order = np.argsort(totals, kind="stable")
+        return order[-size:], order[:size]
+
+    @staticmethod
+    def analyze(snapshot: ExamSnapshot, key: AnswerKey, matrix: ResponseMatrix) -> ItemAnalysisReport:
+        """Calcula todos los índices sobre la matriz de respuestas"""
+        item_points = matrix.item_points
+        n_students, n_questions = item_points.shape
+        n_options = len(key.option_ids)
+        # Puntuación de cada ítem como fracción de sus puntos (crédito parcial incluido)
+        scores = np.divide(
+            item_points, key.points, out=np.zeros_like(item_points), where=key.points > 0
+        )
+        totals = item_points.sum(axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p_values = scores.mean(axis=0) if n_students else np.zeros(n_questions)
+            omit_rates = 1.0 - matrix.answered.mean(axis=0) if n_students else np.zeros(n_questions)
+
+            discrimination = np.full(n_questions, np.nan)
+            upper_rates = np.zeros(n_options)
+            lower_rates = np.zeros(n_options)
+            if n_students >= 2:
+                upper, lower = ItemAnalysisService.upper_lower_groups(totals)
+                discrimination = scores[upper].mean(axis=0) - scores[lower].mean(axis=0)
+                in_upper = np.zeros(n_students, dtype=bool)
+                in_upper[upper] = True
+                in_lower = np.zeros(n_students, dtype=bool)
+                in_lower[lower] = True
+                upper_rates = np.bincount(
+                    matrix.selection_options[in_upper[matrix.selection_groups]], minlength=n_options
+                ) / len(upper)
+                lower_rates = np.bincount(
+                    matrix.selection_options[in_lower[matrix.selection_groups]], minlength=n_options
+                ) / len(lower)
+
+            # Biserial puntual corregida: cada ítem frente al total sin ese ítem
+            rest = totals[:, None] - item_points
+            centered_scores = scores - scores.mean(axis=0) if n_students else scores
+            centered_rest = rest - rest.mean(axis=0) if n_students else rest
+            denominator = np.sqrt((centered_scores ** 2).sum(axis=0) * (centered_rest ** 2).sum(axis=0))
+            point_biserial = np.where(
+                denominator > 0, (centered_scores * centered_rest).sum(axis=0) / denominator, np.nan
+            )
+
+            cronbach_alpha = np.nan
+            if n_questions >= 2 and n_students >= 2:
+                total_variance = totals.var(ddof=1)
+                if total_variance > 0:
+                    item_variance = item_points.var(axis=0, ddof=1).sum()
+                    cronbach_alpha = n_questions / (n_questions - 1) * (1.0 - item_variance / total_variance)
+
+        selection_rates = (
+            np.bincount(matrix.selection_options, minlength=n_options) / n_students
+            if n_students else np.zeros(n_options)
+        )
+
+        items = []
+        for question in sorted(snapshot.questions, key=lambda q: (q.order_index, q.id)):
+            column = int(np.searchsorted(key.question_ids, question.id))
+            options = []
+            for option in sorted(question.options, key=lambda o: (o.order_index, o.id)):
+                position = int(np.searchsorted(key.option_ids, option.id))
+                options.append(OptionAnalysis(
+                    option_id=option.id,
+                    is_correct=option.is_correct,
+                    selection_rate=round(float(selection_rates[position]), 4),
+                    upper_rate=round(float(upper_rates[position]), 4),
+                    lower_rate=round(float(lower_rates[position]), 4),
+                ))
+            items.append(ItemAnalysis(
+                question_id=question.id,
+                question_type=question.question_type,
+                points=question.points,
+                p_value=round(float(p_values[column]), 4),
+                discrimination=_optional(discrimination[column]),
+                point_biserial=_optional(point_biserial[column]),
+                omit_rate=round(float(omit_rates[column]), 4),
+                options=options,
+            ))
+
+        return ItemAnalysisReport(
+            exam_id=snapshot.exam_id,
+            version=snapshot.version,
+            sessions_analyzed=n_students,
+            cronbach_alpha=_optional(cronbach_alpha),
+            items=items,
+        )
@@ -6,6 +6,7 @@ Maneja validaciones complejas y operaciones de negocio
 from sqlmodel import Session, select
 from app.models.question import Question, Option, QuestionType
 from app.models.exam import Exam
+from app.services.snapshot_service import SnapshotService
 from fastapi import HTTPException
 from typing import List, Dict, Any, Sequence
 
@@ -154,6 +155,8 @@ class QuestionService:
                 fixes_applied.append("Added missing True/False option")
         
         session.commit()
+        if fixes_applied:
+            SnapshotService.invalidate(question.exam_id)
         
         return {
             "question_id": question_id,
@@ -231,6 +234,7 @@ class QuestionService:
             session.add(questions[question_id])
         
         session.commit()
+        SnapshotService.invalidate(exam_id)
         
         return {
             "exam_id": exam_id,
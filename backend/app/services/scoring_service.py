@@ -0,0 +1,507 @@
+"""
+Motor de corrección de sesiones de examen
+Carga respuestas y clave de respuestas como arrays y puntúa de forma vectorizada
+"""
+
+from dataclasses import dataclass, replace
+from sqlmodel import Session, select
+from sqlalchemy import Float, Numeric, case, cast, func, update
+from app.models.question import Question, Option, QuestionType
+from app.models.session import ExamSession, StudentAnswer, SessionStatus
+from app.models.snapshot import ExamSnapshot
+from app.services.snapshot_service import SnapshotService
+from app.services.statistics_service import StatisticsService
+from collections import OrderedDict
+from typing import Sequence, Optional, Dict, Any
+import threading
+import numpy as np
+
+# Caché LRU de claves de respuestas por (examen, versión del snapshot) (por proceso)
+ANSWER_KEY_CACHE_SIZE = 256
+_answer_key_cache: "OrderedDict[tuple[int, int], AnswerKey]" = OrderedDict()
+_answer_key_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    Clave de respuestas de un examen en forma de arrays
+    Las preguntas y las opciones están ordenadas por id para buscarlas con searchsorted
+    """
+    exam_id: int
+    question_ids: np.ndarray        # int64, ordenado
+    points: np.ndarray              # float64, puntos por pregunta
+    is_multiple: np.ndarray         # bool, pregunta de opción múltiple (crédito parcial)
+    correct_counts: np.ndarray      # int64, opciones correctas por pregunta
+    option_ids: np.ndarray          # int64, ordenado
+    option_question_idx: np.ndarray  # int64, posición de la pregunta de cada opción
+    option_is_correct: np.ndarray   # bool
+    key_hash: Optional[str] = None  # answer_key_hash del snapshot del que se derivó
+
+    @property
+    def total_points(self) -> float:
+        """Puntuación máxima del examen"""
+        return float(self.points.sum())
+
+
+@dataclass(frozen=True)
+class GradingResult:
+    """Resultado de corregir un lote de respuestas agrupadas por sesión"""
+    answer_is_correct: np.ndarray   # bool, por respuesta
+    answer_points: np.ndarray       # float64, por respuesta
+    earned_points: np.ndarray       # float64, por grupo (sesión)
+    total_points: float
+
+
+class ScoringService:
+
+    @staticmethod
+    def build_answer_key(exam_id: int, session: Session) -> AnswerKey:
+        """
+        Construye la clave de respuestas de un examen con una única consulta
+        Solo se consideran las preguntas activas
+        """
+        rows = session.exec(
+            select(Question.id, Question.points, Question.question_type, Option.id, Option.is_correct)
+            .join(Option, Option.question_id == Question.id, isouter=True)
+            .where(Question.exam_id == exam_id, Question.is_active == True)  # noqa: E712
+            .order_by(Question.id, Option.id)
+        ).all()
+        return ScoringService._answer_key_from_rows(exam_id, rows)
+
+    @staticmethod
+    def get_answer_key(exam_id: int, session: Session) -> AnswerKey:
+        """
+        Obtiene la clave de respuestas derivada del snapshot vigente del examen
+        Se cachea por (examen, versión): SnapshotService.invalidate la deja obsoleta
+        """
+        snapshot = SnapshotService.get_snapshot(exam_id, session)
+        if snapshot is None:
+            return ScoringService._answer_key_from_rows(exam_id, [])
+
+        cache_key = (exam_id, snapshot.version)
+        with _answer_key_lock:
+            key = _answer_key_cache.get(cache_key)
+            if key is not None:
+                _answer_key_cache.move_to_end(cache_key)
+                return key
+
+        key = ScoringService.answer_key_from_snapshot(snapshot)
+        with _answer_key_lock:
+            _answer_key_cache[cache_key] = key
+            _answer_key_cache.move_to_end(cache_key)
+            while len(_answer_key_cache) > ANSWER_KEY_CACHE_SIZE:
+                _answer_key_cache.popitem(last=False)
+        return key
+
+    @staticmethod
+    def answer_key_from_snapshot(snapshot: ExamSnapshot) -> AnswerKey:
+        """Convierte el snapshot del examen en arrays sin consultar la base de datos"""
+        # Mismo orden que build_answer_key: pregunta y opción por id
+        rows: list = []
+        for question in sorted(snapshot.questions, key=lambda q: q.id):
+            if not question.options:
+                rows.append((question.id, question.points, question.question_type, None, False))
+            for option in sorted(question.options, key=lambda o: o.id):
+                rows.append((question.id, question.points, question.question_type, option.id, option.is_correct))
+        return replace(ScoringService._answer_key_from_rows(snapshot.exam_id, rows), key_hash=snapshot.answer_key_hash)
+
+    @staticmethod
+    def clear_answer_key_cache() -> None:
+        """Vacía la caché de claves de respuestas"""
+        with _answer_key_lock:
+            _answer_key_cache.clear()
+
+    @staticmethod
+    def _answer_key_from_rows(exam_id: int, rows: Sequence[tuple]) -> AnswerKey:
+        """Convierte filas (pregunta, puntos, tipo, opción, correcta) en arrays"""
+        question_ids: list = []
+        points: list = []
+        is_multiple: list = []
+        option_ids: list = []
+        option_question_idx: list = []
+        option_is_correct: list = []
+
+        for question_id, question_points, question_type, option_id, is_correct in rows:
+            if not question_ids or question_ids[-1] != question_id:
+                question_ids.append(question_id)
+                points.append(question_points)
+                is_multiple.append(question_type == QuestionType.MULTIPLE_CHOICE)
+            if option_id is not None:
+                option_ids.append(option_id)
+                option_question_idx.append(len(question_ids) - 1)
+                option_is_correct.append(bool(is_correct))
+
+        option_ids_arr = np.asarray(option_ids, dtype=np.int64)
+        option_question_idx_arr = np.asarray(option_question_idx, dtype=np.int64)
+        option_is_correct_arr = np.asarray(option_is_correct, dtype=bool)
+
+        # Las opciones llegan ordenadas por pregunta; se reordenan por id de opción
+        order = np.argsort(option_ids_arr, kind="stable")
+
+        return AnswerKey(
+            exam_id=exam_id,
+            question_ids=np.asarray(question_ids, dtype=np.int64),
+            points=np.asarray(points, dtype=np.float64),
+            is_multiple=np.asarray(is_multiple, dtype=bool),
+            correct_counts=np.bincount(
+                option_question_idx_arr[option_is_correct_arr], minlength=len(question_ids)
+            ).astype(np.int64),
+            option_ids=option_ids_arr[order],
+            option_question_idx=option_question_idx_arr[order],
+            option_is_correct=option_is_correct_arr[order],
+        )
+
+    @staticmethod
+    def grade(
+        key: AnswerKey,
+        groups: np.ndarray,
+        question_ids: np.ndarray,
+        option_ids: np.ndarray,
+        n_groups: int,
+    ) -> GradingResult:
+        """
+        Corrige respuestas de forma vectorizada
+        - groups: índice de sesión (0..n_groups-1) de cada respuesta
+        - question_ids / option_ids: pregunta y opción elegida (-1 si no hay opción)
+        Cada elemento es una selección; una respuesta de opción múltiple aporta
+        una selección por opción marcada. Deben venir en orden de escritura
+        (la última prevalece en preguntas de opción única y verdadero/falso).
+
+        Opción única y verdadero/falso: todos los puntos si la opción es correcta.
+        Opción múltiple: crédito parcial puntos * max(0, aciertos - fallos) / correctas.
+        """
+        groups = np.asarray(groups, dtype=np.int64)
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        option_ids = np.asarray(option_ids, dtype=np.int64)
+        n_answers = len(question_ids)
+        n_questions = len(key.question_ids)
+        n_options = len(key.option_ids)
+        n_cells = n_groups * n_questions
+
+        # Localizar pregunta y opción de cada respuesta en la clave
+        q_pos = np.searchsorted(key.question_ids, question_ids)
+        q_pos_safe = np.minimum(q_pos, max(n_questions - 1, 0))
+        if n_questions:
+            valid_q = (q_pos < n_questions) & (key.question_ids[q_pos_safe] == question_ids)
+        else:
+            valid_q = np.zeros(n_answers, dtype=bool)
+
+        o_pos = np.searchsorted(key.option_ids, option_ids)
+        o_pos_safe = np.minimum(o_pos, max(n_options - 1, 0))
+        if n_options:
+            valid_o = (
+                valid_q
+                & (o_pos < n_options)
+                & (key.option_ids[o_pos_safe] == option_ids)
+                & (key.option_question_idx[o_pos_safe] == q_pos_safe)
+            )
+            option_correct = valid_o & key.option_is_correct[o_pos_safe]
+        else:
+            valid_o = np.zeros(n_answers, dtype=bool)
+            option_correct = valid_o
+
+        cells = groups * n_questions + q_pos_safe
+        multiple = valid_q & key.is_multiple[q_pos_safe] if n_questions else valid_q
+        single = valid_q & ~multiple
+
+        # Respuestas efectivas: la última por celda en opción única, una por opción en múltiple
+        effective = np.zeros(n_answers, dtype=bool)
+        single_idx = np.flatnonzero(single)
+        if len(single_idx):
+            _, last_from_end = np.unique(cells[single_idx][::-1], return_index=True)
+            effective[single_idx[len(single_idx) - 1 - last_from_end]] = True
+        multiple_idx = np.flatnonzero(multiple & valid_o)
+        if len(multiple_idx):
+            pair = cells[multiple_idx] * (n_options + 1) + o_pos_safe[multiple_idx]
+            _, first = np.unique(pair, return_index=True)
+            effective[multiple_idx[first]] = True
+
+        q_points = key.points[q_pos_safe] if n_questions else np.zeros(n_answers)
+
+        # Opción única / verdadero-falso
+        single_hit = effective & single & option_correct
+        cell_points = np.bincount(
+            cells[single_hit], weights=q_points[single_hit], minlength=n_cells
+        ).astype(np.float64)
+
+        # Opción múltiple con crédito parcial
+        mc_hit = effective & multiple & option_correct
+        mc_miss = effective & multiple & valid_o & ~option_correct
+        hits = np.bincount(cells[mc_hit], minlength=n_cells)
+        misses = np.bincount(cells[mc_miss], minlength=n_cells)
+        if n_questions:
+            cell_question = np.tile(np.arange(n_questions), n_groups)
+            correct_counts = key.correct_counts[cell_question]
+            ratio = np.divide(
+                hits - misses, correct_counts,
+                out=np.zeros(n_cells, dtype=np.float64), where=correct_counts > 0,
+            )
+            cell_points += key.points[cell_question] * np.clip(ratio, 0.0, 1.0)
+
+        # Reparto de los puntos de cada celda entre sus respuestas correctas
+        answer_points = np.zeros(n_answers, dtype=np.float64)
+        answer_points[single_hit] = q_points[single_hit]
+        if mc_hit.any():
+            answer_points[mc_hit] = cell_points[cells[mc_hit]] / hits[cells[mc_hit]]
+
+        earned = cell_points.reshape(n_groups, n_questions).sum(axis=1) if n_questions else np.zeros(n_groups)
+
+        return GradingResult(
+            answer_is_correct=option_correct,
+            answer_points=answer_points,
+            earned_points=earned,
+            total_points=key.total_points,
+        )
+
+    @staticmethod
+    def grade_answers(
+        key: AnswerKey,
+        groups: np.ndarray,
+        answers: Sequence[tuple],
+        n_groups: int,
+    ) -> GradingResult:
+        """
+        Corrige filas de StudentAnswer (question_id, selected_option_id, selected_option_ids)
+        Cada fila se expande en sus selecciones, se corrige con grade() y se
+        agrega de nuevo por fila. Una fila es correcta si obtiene todos los puntos.
+        """
+        pair_rows: list = []
+        pair_questions: list = []
+        pair_options: list = []
+        for index, (question_id, option_id, option_ids) in enumerate(answers):
+            selections = option_ids if option_ids else [-1 if option_id is None else option_id]
+            for selected in selections:
+                pair_rows.append(index)
+                pair_questions.append(question_id)
+                pair_options.append(selected)
+
+        n_rows = len(answers)
+        pair_rows_arr = np.asarray(pair_rows, dtype=np.int64)
+        groups = np.asarray(groups, dtype=np.int64)
+        result = ScoringService.grade(
+            key,
+            groups[pair_rows_arr],
+            np.asarray(pair_questions, dtype=np.int64),
+            np.asarray(pair_options, dtype=np.int64),
+            n_groups,
+        )
+
+        row_points = np.bincount(pair_rows_arr, weights=result.answer_points, minlength=n_rows).astype(np.float64)
+        question_ids = np.asarray([row[0] for row in answers], dtype=np.int64)
+        n_questions = len(key.question_ids)
+        q_pos = np.minimum(np.searchsorted(key.question_ids, question_ids), max(n_questions - 1, 0))
+        if n_questions:
+            valid_q = key.question_ids[q_pos] == question_ids
+            full_points = key.points[q_pos]
+        else:
+            valid_q = np.zeros(n_rows, dtype=bool)
+            full_points = np.zeros(n_rows)
+
+        return GradingResult(
+            answer_is_correct=valid_q & (row_points >= full_points - 1e-9) & (row_points > 0),
+            answer_points=row_points,
+            earned_points=result.earned_points,
+            total_points=result.total_points,
+        )
+
+    @staticmethod
+    def _write_answer_grades(session: Session, answer_ids: Sequence[int], result: GradingResult) -> None:
+        """Guarda is_correct y points_earned con un UPDATE masivo por clave primaria"""
+        if not answer_ids:
+            return
+        session.execute(update(StudentAnswer), [
+            {"id": answer_id, "is_correct": is_correct, "points_earned": points}
+            for answer_id, is_correct, points in zip(
+                answer_ids, result.answer_is_correct.tolist(), result.answer_points.tolist()
+            )
+        ])
+
+    @staticmethod
+    def compute_score(earned_points: float, total_points: float) -> float:
+        """Porcentaje (0-100) redondeado a 2 decimales"""
+        if total_points <= 0:
+            return 0.0
+        return round(min(earned_points / total_points, 1.0) * 100, 2)
+
+    @staticmethod
+    def update_running_score(
+        exam_session: ExamSession, question_ids: Sequence[int], session: Session, removed_points: float = 0.0
+    ) -> None:
+        """
+        Corrige las respuestas de las preguntas indicadas al escribirlas y ajusta el
+        acumulado earned_points de la sesión con la diferencia respecto a lo anterior.
+        removed_points son los puntos de respuestas ya borradas de esas preguntas.
+        Así al finalizar solo hay que sellar los totales. Si la clave no es con la que
+        empezó el acumulado, la sesión queda marcada para corregirse completa. No hace commit.
+        """
+        key = ScoringService.get_answer_key(exam_session.exam_id, session)
+        answers = session.exec(
+            select(
+                StudentAnswer.id, StudentAnswer.question_id, StudentAnswer.selected_option_id,
+                StudentAnswer.selected_option_ids, StudentAnswer.points_earned
+            )
+            .where(
+                StudentAnswer.session_id == exam_session.id,
+                StudentAnswer.question_id.in_(list(question_ids))  # type: ignore[attr-defined]
+            )
+            .order_by(StudentAnswer.id)
+        ).all()
+
+        result = ScoringService.grade_answers(
+            key, np.zeros(len(answers), dtype=np.int64), [row[1:4] for row in answers], n_groups=1
+        )
+        ScoringService._write_answer_grades(session, [row[0] for row in answers], result)
+
+        # El delta se aplica en la propia UPDATE: dos escrituras concurrentes de la
+        # misma sesión no se pisan el acumulado (sin leer-modificar-escribir)
+        previous = removed_points + sum(row[4] or 0.0 for row in answers)
+        delta = float(result.earned_points[0]) - previous
+        running = ExamSession.earned_points + delta
+        session.execute(
+            update(ExamSession)
+            .where(
+                ExamSession.id == exam_session.id,
+                ExamSession.earned_points != None  # noqa: E711
+            )
+            .values(
+                earned_points=case(
+                    (running < 0, 0.0),
+                    else_=cast(func.round(cast(running, Numeric), 2), Float)
+                ),
+                answer_key_hash=case(
+                    (ExamSession.answer_key_hash == key.key_hash, key.key_hash),
+                    else_=None
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # seal_session debe leer los valores de la base de datos
+        session.expire(exam_session, ["earned_points", "answer_key_hash"])
+
+    @staticmethod
+    def seal_session(exam_session: ExamSession, session: Session) -> ExamSession:
+        """
+        Fija los totales de una sesión al finalizarla
+        Si la sesión lleva acumulado en vivo con la clave vigente solo se calcula el
+        porcentaje; si no (sesiones anteriores al acumulado o clave cambiada durante
+        el examen) se corrige completa. No hace commit.
+        """
+        key = ScoringService.get_answer_key(exam_session.exam_id, session)
+        if (
+            exam_session.earned_points is None
+            or exam_session.answer_key_hash is None
+            or exam_session.answer_key_hash != key.key_hash
+        ):
+            return ScoringService.score_session(exam_session, session, key)
+
+        exam_session.total_points = key.total_points
+        exam_session.score = ScoringService.compute_score(exam_session.earned_points, key.total_points)
+        return exam_session
+
+    @staticmethod
+    def score_session(
+        exam_session: ExamSession, session: Session, key: Optional[AnswerKey] = None
+    ) -> ExamSession:
+        """
+        Corrige todas las respuestas de una sesión y actualiza sus totales
+        Las respuestas se actualizan con un UPDATE masivo por clave primaria.
+        No hace commit.
+        """
+        if key is None:
+            key = ScoringService.build_answer_key(exam_session.exam_id, session)
+
+        answers = session.exec(
+            select(
+                StudentAnswer.id, StudentAnswer.question_id,
+                StudentAnswer.selected_option_id, StudentAnswer.selected_option_ids
+            )
+            .where(StudentAnswer.session_id == exam_session.id)
+            .order_by(StudentAnswer.id)
+        ).all()
+
+        result = ScoringService.grade_answers(
+            key, np.zeros(len(answers), dtype=np.int64), [row[1:] for row in answers], n_groups=1
+        )
+        ScoringService._write_answer_grades(session, [row[0] for row in answers], result)
+
+        earned = float(result.earned_points[0])
+        exam_session.earned_points = round(earned, 2)
+        exam_session.answer_key_hash = key.key_hash
+        exam_session.total_points = result.total_points
+        exam_session.score = ScoringService.compute_score(earned, result.total_points)
+        return exam_session
+
+    @staticmethod
+    def regrade_exam(exam_id: int, session: Session, batch_size: int = 500) -> Dict[str, Any]:
+        """
+        Vuelve a corregir todas las sesiones finalizadas de un examen
+        Pensado para cuando se corrige la clave (Option.is_correct) tras el examen.
+        Procesa lotes de sesiones: una consulta de respuestas, corrección vectorizada
+        y UPDATE masivo por clave primaria, con commit por lote para no bloquear tablas.
+        Las sesiones en curso llevan el acumulado con la clave anterior: se marcan
+        (sin huella de clave) para que seal_session las corrija completas al finalizar.
+        """
+        SnapshotService.invalidate(exam_id)
+        key = ScoringService.get_answer_key(exam_id, session)
+
+        pending_rescore = session.execute(
+            update(ExamSession)
+            .where(ExamSession.exam_id == exam_id, ExamSession.status == SessionStatus.IN_PROGRESS)
+            .values(answer_key_hash=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+
+        session_ids = np.asarray(session.exec(
+            select(ExamSession.id)
+            .where(
+                ExamSession.exam_id == exam_id,
+                ExamSession.status.in_([SessionStatus.COMPLETED, SessionStatus.EXPIRED])  # type: ignore[attr-defined]
+            )
+            .order_by(ExamSession.id)
+        ).all(), dtype=np.int64)
+
+        answers_regraded = 0
+        for start in range(0, len(session_ids), batch_size):
+            batch_ids = session_ids[start:start + batch_size]
+            answers = session.exec(
+                select(
+                    StudentAnswer.session_id, StudentAnswer.id, StudentAnswer.question_id,
+                    StudentAnswer.selected_option_id, StudentAnswer.selected_option_ids
+                )
+                .where(StudentAnswer.session_id.in_(batch_ids.tolist()))  # type: ignore[attr-defined]
+                .order_by(StudentAnswer.session_id, StudentAnswer.id)
+            ).all()
+
+            groups = np.searchsorted(batch_ids, np.asarray([row[0] for row in answers], dtype=np.int64))
+            result = ScoringService.grade_answers(
+                key, groups, [row[2:] for row in answers], n_groups=len(batch_ids)
+            )
+
+            ScoringService._write_answer_grades(session, [row[1] for row in answers], result)
+            session.execute(update(ExamSession), [
+                {
+                    "id": session_id,
+                    "earned_points": round(earned, 2),
+                    "total_points": result.total_points,
+                    "score": ScoringService.compute_score(earned, result.total_points),
+                }
+                for session_id, earned in zip(batch_ids.tolist(), result.earned_points.tolist())
+            ])
+            session.commit()
+            answers_regraded += len(answers)
+
+        stats = StatisticsService.rebuild(exam_id, session)
+        # Los informes derivados de is_correct (similitud) comparan con este contador
+        stats.regrade_count += 1
+        session.add(stats)
+        session.commit()
+
+        return {
+            "exam_id": exam_id,
+            "sessions_regraded": len(session_ids),
+            "answers_regraded": answers_regraded,
+            "sessions_pending_rescore": pending_rescore,
+            "total_points": key.total_points,
+        }
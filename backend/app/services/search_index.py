@@ -0,0 +1,364 @@
+"""
+Índice invertido en memoria para la búsqueda sin PostgreSQL
+Pensado para SQLite (tests) e instalaciones pequeñas de un nodo. Las listas de
+postings se guardan comprimidas (deltas de id de documento y frecuencias en
+varint) y solo crecen por el final: actualizar un documento lo marca como
+borrado y lo vuelve a añadir con un id nuevo; los huecos se compactan cuando
+superan a los documentos vivos. El ranking es BM25 sobre frecuencias ponderadas
+por campo (mismos pesos A/B/C que las columnas tsvector).
+
+El índice se construye desde la base de datos en la primera búsqueda y después
+se mantiene con los eventos de escritura de la sesión (after_flush/after_commit).
+Un worker no ve los cambios hechos en otros procesos hasta la siguiente
+reconstrucción periódica (SEARCH_INDEX_REBUILD_SECONDS).
+"""
+
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+from app.models.exam import Exam
+from app.models.question import Question
+from app.models.search import SEARCH_FIELDS, SearchHit, SearchHitType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+# Peso entero de cada clase de campo (proporción 1 : 0.4 : 0.2)
+_WEIGHT_UNITS = {"A": 5, "B": 2, "C": 1}
+_UNITS_PER_TERM = _WEIGHT_UNITS["A"]
+# Parámetros BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Compactar cuando los documentos borrados superan a los vivos (y a este mínimo)
+COMPACT_MIN_DEAD = 1000
+# Longitud máxima del título de un resultado de pregunta
+TITLE_LENGTH = 200
+
+DocKey = Tuple[SearchHitType, int]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Minúsculas, sin acentos, palabras alfanuméricas"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return re.findall(r"\w+", "".join(char for char in normalized if not unicodedata.combining(char)))
+
+
+def _append_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(data: bytearray) -> Iterator[Tuple[int, int]]:
+    """Recorre una lista de postings: pares (id de documento, frecuencia ponderada)"""
+    doc_id = 0
+    value = shift = 0
+    expecting_delta = True
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if expecting_delta:
+            doc_id += value
+        else:
+            yield doc_id, value
+        expecting_delta = not expecting_delta
+        value = shift = 0
+
+
+@dataclass
+class IndexedDocument:
+    """Documento vivo del índice"""
+    key: DocKey
+    exam_id: int
+    title: str
+    # Longitud ponderada (en términos de peso A)
+    length: float
+    # Frecuencia ponderada de cada término (en unidades de peso)
+    terms: Dict[str, int]
+
+
+@dataclass(frozen=True)
+class DocumentChange:
+    """Cambio a aplicar al índice; se captura en el flush para no depender de objetos expirados"""
+    key: DocKey
+    exam_id: int = 0
+    title: str = ""
+    fields: Tuple[Tuple[Optional[str], str], ...] = ()
+    deleted: bool = False
+
+
+class InvertedIndex:
+    """Índice invertido con postings comprimidas y ranking BM25 (no es thread-safe)"""
+
+    def __init__(self):
+        self._postings: Dict[str, bytearray] = {}
+        self._last_doc: Dict[str, int] = {}
+        self._df: Dict[str, int] = {}
+        self._docs: Dict[int, IndexedDocument] = {}
+        self._doc_ids: Dict[DocKey, int] = {}
+        self._next_doc = 1
+        self._dead = 0
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def apply(self, change: DocumentChange) -> None:
+        if change.deleted:
+            self.remove(change.key)
+            if change.key[0] == SearchHitType.EXAM:
+                self.remove_exam_questions(change.key[1])
+        else:
+            self.add(change.key, change.exam_id, change.title, change.fields)
+
+    def add(self, key: DocKey, exam_id: int, title: str, fields) -> None:
+        """Añade o reemplaza un documento; fields = [(texto, peso A/B/C)]"""
+        self.remove(key)
+        terms: Dict[str, int] = {}
+        units = 0
+        for text, weight in fields:
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + _WEIGHT_UNITS[weight]
+                units += _WEIGHT_UNITS[weight]
+
+        doc_id = self._next_doc
+        self._next_doc += 1
+        # Los ids crecen siempre: cada posting nueva va al final de su lista
+        for term, frequency in terms.items():
+            postings = self._postings.setdefault(term, bytearray())
+            _append_varint(postings, doc_id - self._last_doc.get(term, 0))
+            _append_varint(postings, frequency)
+            self._last_doc[term] = doc_id
+            self._df[term] = self._df.get(term, 0) + 1
+
+        document = IndexedDocument(key, exam_id, title, units / _UNITS_PER_TERM, terms)
+        self._docs[doc_id] = document
+        self._doc_ids[key] = doc_id
+        self._total_length += document.length
+
+    def remove(self, key: DocKey) -> None:
+        doc_id = self._doc_ids.pop(key, None)
+        if doc_id is None:
+            return
+        document = self._docs.pop(doc_id)
+        for term in document.terms:
+            self._df[term] -= 1
+        self._total_length -= document.length
+        self._dead += 1
+        if self._dead > max(COMPACT_MIN_DEAD, len(self._docs)):
+            self.compact()
+
+    def remove_exam_questions(self, exam_id: int) -> None:
+        for key in [doc.key for doc in self._docs.values()
+                    if doc.key[0] == SearchHitType.QUESTION and doc.exam_id == exam_id]:
+            self.remove(key)
+
+    def compact(self) -> None:
+        """Reescribe las postings sin los documentos borrados"""
+        for term, postings in list(self._postings.items()):
+            live = [(doc_id, frequency) for doc_id, frequency in _decode_postings(postings) if doc_id in self._docs]
+            if not live:
+                del self._postings[term], self._last_doc[term], self._df[term]
+                continue
+            compacted = bytearray()
+            previous = 0
+            for doc_id, frequency in live:
+                _append_varint(compacted, doc_id - previous)
+                _append_varint(compacted, frequency)
+                previous = doc_id
+            self._postings[term] = compacted
+            self._last_doc[term] = previous
+        self._dead = 0
+
+    def search(
+        self,
+        query: str,
+        doc_type: SearchHitType,
+        limit: int,
+        exam_id: Optional[int] = None,
+    ) -> List[Tuple[float, IndexedDocument]]:
+        """Documentos que contienen todos los términos, por puntuación BM25 descendente"""
+        terms = sorted(set(tokenize(query)), key=lambda term: self._df.get(term, 0))
+        if not terms or not self._docs or any(not self._df.get(term) for term in terms):
+            return []
+
+        def accepts(document: IndexedDocument) -> bool:
+            return document.key[0] == doc_type and (exam_id is None or document.exam_id == exam_id)
+
+        # Intersección empezando por el término más raro
+        candidates: Optional[Dict[int, IndexedDocument]] = None
+        for term in terms:
+            matches: Dict[int, IndexedDocument] = {}
+            for doc_id, _ in _decode_postings(self._postings[term]):
+                if candidates is not None:
+                    if doc_id in candidates:
+                        matches[doc_id] = candidates[doc_id]
+                    continue
+                document = self._docs.get(doc_id)
+                if document is not None and accepts(document):
+                    matches[doc_id] = document
+            candidates = matches
+            if not candidates:
+                return []
+
+        total = len(self._docs)
+        average_length = self._total_length / total or 1.0
+        idf = {term: math.log(1 + (total - self._df[term] + 0.5) / (self._df[term] + 0.5)) for term in terms}
+
+        def score(document: IndexedDocument) -> float:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * document.length / average_length)
+            result = 0.0
+            for term in terms:
+                frequency = document.terms[term] / _UNITS_PER_TERM
+                result += idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+            return result
+
+        scored = ((score(document), document) for document in candidates.values())
+        return heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1].key[1]))
+
+
+# Índice del worker: None hasta la primera búsqueda
+_index: Optional[InvertedIndex] = None
+# Cambios confirmados mientras se reconstruye el índice (se reaplican antes del cambio)
+_pending: Optional[List[DocumentChange]] = None
+_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+# Por tipo de documento: modelo, tabla (campos indexados) y columna con el examen
+_SOURCES = {
+    SearchHitType.EXAM: (Exam, "exam", Exam.id),
+    SearchHitType.QUESTION: (Question, "question", Question.exam_id),
+}
+
+
+def _change_from_values(doc_type: SearchHitType, doc_id: int, exam_id: int, values) -> DocumentChange:
+    # El primer campo indexado (título o enunciado) es el título del resultado
+    weights = [weight for _, weight in SEARCH_FIELDS[_SOURCES[doc_type][1]]]
+    return DocumentChange(
+        key=(doc_type, doc_id), exam_id=exam_id, title=(values[0] or "")[:TITLE_LENGTH],
+        fields=tuple(zip(values, weights))
+    )
+
+
+def _document_change(record) -> Optional[DocumentChange]:
+    for doc_type, (model, table, exam_column) in _SOURCES.items():
+        if isinstance(record, model):
+            values = [getattr(record, column) for column, _ in SEARCH_FIELDS[table]]
+            return _change_from_values(doc_type, record.id, getattr(record, exam_column.key), values)
+    return None
+
+
+class InMemorySearchBackend:
+
+    @staticmethod
+    def search_exams(query: str, session: Session, limit: int) -> List[SearchHit]:
+        return InMemorySearchBackend._search(query, session, SearchHitType.EXAM, limit, None)
+
+    @staticmethod
+    def search_questions(query: str, session: Session, limit: int, exam_id: Optional[int]) -> List[SearchHit]:
+        return InMemorySearchBackend._search(query, session, SearchHitType.QUESTION, limit, exam_id)
+
+    @staticmethod
+    def _search(query: str, session: Session, doc_type: SearchHitType, limit: int,
+                exam_id: Optional[int]) -> List[SearchHit]:
+        if _index is None:
+            InMemorySearchBackend.rebuild(session)
+        with _lock:
+            results = _index.search(query, doc_type, limit, exam_id)
+        return [
+            SearchHit(type=doc_type, id=document.key[1], exam_id=document.exam_id, title=document.title, rank=rank)
+            for rank, document in results
+        ]
+
+    @staticmethod
+    def rebuild(session: Session) -> int:
+        """Construye un índice nuevo desde la base de datos y lo sustituye por el actual"""
+        global _index, _pending
+        with _rebuild_lock:
+            with _lock:
+                _pending = []
+            try:
+                index = InvertedIndex()
+                # Solo columnas: no se cargan entidades en la sesión
+                for doc_type, (model, table, exam_column) in _SOURCES.items():
+                    columns = [getattr(model, column) for column, _ in SEARCH_FIELDS[table]]
+                    rows = session.exec(select(model.id, exam_column, *columns).execution_options(yield_per=500))
+                    for doc_id, exam_id, *values in rows:
+                        change = _change_from_values(doc_type, doc_id, exam_id, values)
+                        index.add(change.key, change.exam_id, change.title, change.fields)
+            except Exception:
+                with _lock:
+                    _pending = None
+                raise
+            with _lock:
+                for change in _pending:
+                    index.apply(change)
+                _index, _pending = index, None
+            return len(index)
+
+    @staticmethod
+    def rebuild_job(session_factory: Callable[[], Session]) -> int:
+        """Tarea periódica: recoge los cambios hechos por otros workers"""
+        if _index is None:
+            return 0
+        with session_factory() as session:
+            return InMemorySearchBackend.rebuild(session)
+
+    @staticmethod
+    def apply(changes: List[DocumentChange]) -> None:
+        with _lock:
+            if _index is None:
+                return
+            for change in changes:
+                _index.apply(change)
+            if _pending is not None:
+                _pending.extend(changes)
+
+    @staticmethod
+    def reset() -> None:
+        """Descarta el índice (tests)"""
+        global _index, _pending
+        with _lock:
+            _index, _pending = None, None
+
+
+# =============================================================================
+# EVENTOS DE ESCRITURA
+# =============================================================================
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changes(session, flush_context) -> None:
+    # Sin índice construido no hay nada que mantener (p.ej. backend PostgreSQL)
+    if _index is None:
+        return
+    changes = session.info.setdefault("search_changes", [])
+    for record in list(session.new) + list(session.dirty):
+        change = _document_change(record)
+        if change is not None:
+            changes.append(change)
+    for record in session.deleted:
+        for doc_type, (model, _, _) in _SOURCES.items():
+            if isinstance(record, model):
+                changes.append(DocumentChange(key=(doc_type, record.id), deleted=True))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_changes(session) -> None:
+    changes = session.info.pop("search_changes", None)
+    if changes:
+        InMemorySearchBackend.apply(changes)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changes(session) -> None:
+    session.info.pop("search_changes", None)
@@ -0,0 +1,100 @@
+"""
+Servicio de búsqueda de texto completo sobre exámenes y preguntas
+El backend es intercambiable (SEARCH_BACKEND): en PostgreSQL se usan las
+columnas tsvector generadas (índice GIN) ordenadas por ts_rank_cd; sin
+PostgreSQL (SQLite en tests, instalaciones de un nodo) un índice invertido en
+memoria con ranking BM25.
+"""
+
+from sqlalchemy import desc, func, literal_column
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models.exam import Exam
+from app.models.question import Question
+from app.models.search import SearchHit, SearchHitType, SearchScope
+from app.services.search_index import InMemorySearchBackend, TITLE_LENGTH, tokenize
+from typing import List, Optional
+
+
+class PostgresSearchBackend:
+
+    @staticmethod
+    def _tsquery(query: str):
+        # websearch_to_tsquery acepta "frases", OR y -exclusión sin errores de sintaxis
+        return func.websearch_to_tsquery(literal_column(f"'{settings.SEARCH_TEXT_CONFIG}'::regconfig"), query)
+
+    @staticmethod
+    def search_exams(query: str, session: Session, limit: int) -> List[SearchHit]:
+        tsquery = PostgresSearchBackend._tsquery(query)
+        vector = literal_column("exam.search_vector")
+        rank = func.ts_rank_cd(vector, tsquery).label("rank")
+        rows = session.exec(
+            select(Exam.id, Exam.title, rank)
+            .where(vector.op("@@")(tsquery))
+            .order_by(desc("rank"), Exam.id)
+            .limit(limit)
+        ).all()
+        return [
+            SearchHit(type=SearchHitType.EXAM, id=exam_id, exam_id=exam_id, title=title, rank=score)
+            for exam_id, title, score in rows
+        ]
+
+    @staticmethod
+    def search_questions(query: str, session: Session, limit: int, exam_id: Optional[int]) -> List[SearchHit]:
+        tsquery = PostgresSearchBackend._tsquery(query)
+        vector = literal_column("question.search_vector")
+        rank = func.ts_rank_cd(vector, tsquery).label("rank")
+        statement = select(Question.id, Question.exam_id, Question.text, rank).where(vector.op("@@")(tsquery))
+        if exam_id is not None:
+            statement = statement.where(Question.exam_id == exam_id)
+        rows = session.exec(statement.order_by(desc("rank"), Question.id).limit(limit)).all()
+        return [
+            SearchHit(
+                type=SearchHitType.QUESTION, id=question_id, exam_id=question_exam_id,
+                title=text[:TITLE_LENGTH], rank=score
+            )
+            for question_id, question_exam_id, text, score in rows
+        ]
+
+
+class SearchService:
+
+    @staticmethod
+    def backend_name(dialect: str) -> str:
+        """Backend efectivo: "auto" elige PostgreSQL si la base de datos lo es"""
+        if settings.SEARCH_BACKEND != "auto":
+            return settings.SEARCH_BACKEND
+        return "postgres" if dialect == "postgresql" else "memory"
+
+    @staticmethod
+    def backend(session: Session):
+        if SearchService.backend_name(session.get_bind().dialect.name) == "postgres":
+            return PostgresSearchBackend
+        return InMemorySearchBackend
+
+    @staticmethod
+    def search(
+        query: str,
+        session: Session,
+        scope: SearchScope = SearchScope.ALL,
+        exam_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        """
+        Busca exámenes y/o preguntas y retorna los resultados por relevancia
+        Cada tipo aporta como mucho offset + limit candidatos antes de mezclar
+        """
+        if not tokenize(query):
+            return []
+
+        backend = SearchService.backend(session)
+        window = offset + limit
+        hits: List[SearchHit] = []
+        if scope in (SearchScope.ALL, SearchScope.EXAMS) and exam_id is None:
+            hits += backend.search_exams(query, session, window)
+        if scope in (SearchScope.ALL, SearchScope.QUESTIONS):
+            hits += backend.search_questions(query, session, window, exam_id)
+
+        hits.sort(key=lambda hit: (-hit.rank, hit.type.value, hit.id))
+        return hits[offset:window]
@@ -3,13 +3,26 @@ Servicio de lógica de negocio para sesiones de examen
 Maneja la ejecución de exámenes y el cálculo de puntuaciones
 """
 
-from sqlmodel import Session, select, desc
-from app.models.session import ExamSession, SessionStatus
+from sqlalchemy import case
+from sqlmodel import Session, select, desc, func
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.session import BufferedAnswer, ExamSession, SessionStatus, StudentAnswer, StudentAnswerCreate
 from app.models.exam import Exam, ExamStatus
+from app.models.snapshot import StudentExamRead
 from app.models.user import User
+from app.services.answer_buffer import AnswerBuffer
+from app.services.scoring_service import ScoringService
+from app.services.snapshot_service import SnapshotService
+from app.services.statistics_service import StatisticsService
+from app.services.timer_hub import notify_session_closed
 from fastapi import HTTPException
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Callable
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
 
 
 class SessionService:
@@ -24,61 +37,71 @@ class SessionService:
         if not exam:
             return False, "Exam not found"
         
+        can_start, reason, _ = SessionService._check_can_start(exam, user_id, session)
+        return can_start, reason
+    
+    @staticmethod
+    def _check_can_start(exam: Exam, user_id: int, session: Session) -> tuple[bool, str, int]:
+        """
+        Comprobaciones de inicio con una sola consulta agregada sobre las sesiones previas
+        Retorna (puede_iniciar, razón, intentos_previos)
+        """
         if exam.status != ExamStatus.PUBLISHED:
-            return False, "Exam is not published"
+            return False, "Exam is not published", 0
         
-        # Verificar intentos previos
-        previous_sessions = session.exec(
-            select(ExamSession).where(
+        attempts, active = session.exec(
+            select(
+                func.count(ExamSession.id),
+                func.coalesce(func.sum(case((ExamSession.status == SessionStatus.IN_PROGRESS, 1), else_=0)), 0)
+            ).where(
                 ExamSession.student_id == user_id,
-                ExamSession.exam_id == exam_id
+                ExamSession.exam_id == exam.id
             )
-        ).all()
-        
-        if len(previous_sessions) >= exam.max_attempts:
-            return False, f"Maximum attempts ({exam.max_attempts}) reached"
+        ).one()
         
-        # Verificar si hay una sesión activa
-        active_session = session.exec(
-            select(ExamSession).where(
-                ExamSession.student_id == user_id,
-                ExamSession.exam_id == exam_id,
-                ExamSession.status == SessionStatus.IN_PROGRESS
-            )
-        ).first()
+        if attempts >= exam.max_attempts:
+            return False, f"Maximum attempts ({exam.max_attempts}) reached", attempts
         
-        if active_session:
-            return False, "There is already an active session for this exam"
+        if active:
+            return False, "There is already an active session for this exam", attempts
         
-        return True, "Can start exam"
+        return True, "Can start exam", attempts
     
     @staticmethod
     def start_exam_session(user_id: int, exam_id: int, session: Session) -> ExamSession:
         """
         Inicia una nueva sesión de examen
         """
-        can_start, reason = SessionService.can_start_exam(user_id, exam_id, session)
-        if not can_start:
-            raise HTTPException(status_code=400, detail=reason)
-        
         exam = session.get(Exam, exam_id)
         if not exam:
             raise HTTPException(status_code=404, detail="Exam not found")
         
+        can_start, reason, attempts = SessionService._check_can_start(exam, user_id, session)
+        if not can_start:
+            raise HTTPException(status_code=400, detail=reason)
+        
         # Calcular tiempo de finalización si el examen tiene duración
         end_time = None
         if exam.duration_minutes:
             end_time = datetime.utcnow() + timedelta(minutes=float(exam.duration_minutes))
         
+        # Acumulado de puntuación que se actualiza con cada respuesta
+        key = ScoringService.get_answer_key(exam_id, session)
         exam_session = ExamSession(
             student_id=user_id,
             exam_id=exam_id,
             status=SessionStatus.IN_PROGRESS,
             start_time=datetime.utcnow(),
-            end_time=end_time
+            end_time=end_time,
+            attempt_number=attempts + 1,
+            shuffle_seed=secrets.randbits(31),
+            earned_points=0.0,
+            total_points=key.total_points,
+            answer_key_hash=key.key_hash
         )
         
         session.add(exam_session)
+        StatisticsService.record_attempt(exam_id, session)
         session.commit()
         session.refresh(exam_session)
         
@@ -88,6 +111,10 @@ class SessionService:
     def finish_exam_session(session_id: int, session: Session) -> ExamSession:
         """
         Finaliza una sesión de examen y calcula la puntuación
+        La fila se bloquea (FOR UPDATE) y el estado se vuelve a comprobar bajo el
+        bloqueo: dos finalizaciones simultáneas o el barrido de expiración no
+        pueden sellar la misma sesión dos veces. Si ya pasó la fecha límite la
+        sesión se cierra como EXPIRED en su end_time.
         """
         exam_session = session.get(ExamSession, session_id)
         if not exam_session:
@@ -96,19 +123,295 @@ class SessionService:
         if exam_session.status != SessionStatus.IN_PROGRESS:
             raise HTTPException(status_code=400, detail="Session is not in progress")
         
-        # TODO: Calcular puntuación basada en las respuestas
-        # Esto lo implementaremos cuando tengamos el modelo Answer
+        # Volcar respuestas pendientes del buffer antes de sellar (el volcado hace commit)
+        SessionService.flush_buffered_answers(exam_session, session)
         
-        exam_session.status = SessionStatus.COMPLETED
-        exam_session.end_time = datetime.utcnow()
-        exam_session.score = 0.0  # TODO: calcular puntuación real
+        exam_session = SessionService._lock_session(session_id, session)
+        if exam_session.status != SessionStatus.IN_PROGRESS:
+            session.rollback()
+            raise HTTPException(status_code=400, detail="Session is not in progress")
         
-        session.add(exam_session)
+        now = datetime.utcnow()
+        if SessionService.is_overdue(exam_session, now):
+            SessionService._close_session(exam_session, SessionStatus.EXPIRED, exam_session.end_time, session)
+        else:
+            SessionService._close_session(exam_session, SessionStatus.COMPLETED, now, session)
         session.commit()
         session.refresh(exam_session)
+        notify_session_closed(exam_session.id, exam_session.status.value)
+        
+        return exam_session
+    
+    @staticmethod
+    def get_writable_session(session_id: int, session: Session) -> ExamSession:
+        """
+        Sesión en curso a la que se pueden escribir respuestas, bloqueada hasta el
+        final de la transacción para no competir con su finalización
+        Pasada la fecha límite no se aceptan escrituras: la sesión se cierra como
+        EXPIRED sin esperar al barrido periódico
+        """
+        exam_session = SessionService._lock_session(session_id, session)
+        if not exam_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        if exam_session.status != SessionStatus.IN_PROGRESS:
+            raise HTTPException(status_code=400, detail="Session is not in progress")
+        
+        if SessionService.is_overdue(exam_session):
+            SessionService._close_session(exam_session, SessionStatus.EXPIRED, exam_session.end_time, session)
+            session.commit()
+            notify_session_closed(session_id, SessionStatus.EXPIRED.value)
+            raise HTTPException(status_code=400, detail="Session time has expired")
         
         return exam_session
     
+    @staticmethod
+    def is_overdue(exam_session: ExamSession, now: Optional[datetime] = None) -> bool:
+        """La sesión tiene fecha límite y ya ha pasado"""
+        return exam_session.end_time is not None and exam_session.end_time <= (now or datetime.utcnow())
+    
+    @staticmethod
+    def _lock_session(session_id: int, session: Session) -> Optional[ExamSession]:
+        """Relee la sesión con SELECT ... FOR UPDATE (valores frescos de la BD)"""
+        return session.exec(
+            select(ExamSession)
+            .where(ExamSession.id == session_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).first()
+    
+    @staticmethod
+    def _close_session(exam_session: ExamSession, status: SessionStatus, end_time: datetime, session: Session) -> None:
+        """
+        Sella la puntuación (acumulada al responder), cierra la sesión
+        y actualiza las estadísticas del examen en la misma transacción. No hace commit.
+        """
+        ScoringService.seal_session(exam_session, session)
+        exam_session.status = status
+        exam_session.end_time = end_time
+        session.add(exam_session)
+        StatisticsService.record_completion(exam_session, session)
+    
+    @staticmethod
+    def expire_overdue_sessions(session: Session, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Cierra como EXPIRED las sesiones en curso cuyo end_time ya pasó
+        Trabaja en lotes ordenados por end_time (índice (status, end_time)) con
+        FOR UPDATE SKIP LOCKED, así varios workers pueden barrer a la vez sin
+        procesar la misma sesión. Retorna el número de sesiones expiradas.
+        """
+        now = now or datetime.utcnow()
+        batch_size = batch_size or settings.SESSION_EXPIRY_BATCH_SIZE
+        overdue_filter = (
+            ExamSession.status == SessionStatus.IN_PROGRESS,
+            ExamSession.end_time.isnot(None),  # type: ignore[union-attr]
+            ExamSession.end_time <= now,  # type: ignore[operator]
+        )
+        
+        # Las respuestas pendientes en Redis se vuelcan antes de bloquear (el volcado hace commit)
+        # Una sesión cuyo volcado falla se deja para el siguiente barrido sin detener el resto
+        failed_ids: List[int] = []
+        if AnswerBuffer.is_enabled():
+            for session_id in session.exec(select(ExamSession.id).where(*overdue_filter)).all():
+                try:
+                    SessionService._flush_locked(session_id, session)
+                except Exception:
+                    logger.exception("Failed to flush buffered answers for overdue session %s", session_id)
+                    failed_ids.append(session_id)
+        if failed_ids:
+            overdue_filter += (ExamSession.id.notin_(failed_ids),)  # type: ignore[union-attr]
+        
+        expired = 0
+        while True:
+            overdue = session.exec(
+                select(ExamSession)
+                .where(*overdue_filter)
+                .order_by(ExamSession.end_time)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .execution_options(populate_existing=True)
+            ).all()
+            if not overdue:
+                break
+            
+            closed_ids = []
+            for exam_session in overdue:
+                # La sesión termina en su fecha límite, no cuando pasa el barrido
+                SessionService._close_session(exam_session, SessionStatus.EXPIRED, exam_session.end_time, session)
+                closed_ids.append(exam_session.id)
+            session.commit()
+            for session_id in closed_ids:
+                notify_session_closed(session_id, SessionStatus.EXPIRED.value)
+            expired += len(overdue)
+            
+            if len(overdue) < batch_size:
+                break
+        
+        if expired:
+            logger.info("Expired %d overdue exam sessions", expired)
+        return expired
+    
+    @staticmethod
+    def expire_overdue_sessions_job(session_factory: Callable[[], Session]) -> int:
+        """Tarea periódica de expiración con su propia sesión de base de datos"""
+        with session_factory() as session:
+            return SessionService.expire_overdue_sessions(session)
+    
+    @staticmethod
+    def upsert_answers(
+        exam_session: ExamSession, answers: List[StudentAnswerCreate], session: Session
+    ) -> List[StudentAnswer]:
+        """
+        Guarda varias respuestas de una sesión con un único INSERT ... ON CONFLICT
+        sobre (session_id, question_id); si una pregunta se repite prevalece la última.
+        Las respuestas del buffer (BufferedAnswer) conservan su answered_at y no
+        sustituyen a una respuesta guardada después.
+        Corrige las preguntas afectadas y actualiza el acumulado de la sesión.
+        """
+        latest = {answer.question_id: answer for answer in answers}
+        if not latest:
+            return []
+        
+        now = datetime.utcnow()
+        stmt = dialect_insert(session, StudentAnswer).values([
+            {
+                "session_id": exam_session.id,
+                "question_id": question_id,
+                "selected_option_id": answer.selected_option_id,
+                "selected_option_ids": answer.selected_option_ids,
+                "answered_at": answer.answered_at if isinstance(answer, BufferedAnswer) else now,
+                "created_at": now,
+            }
+            for question_id, answer in latest.items()
+        ])
+        # Una respuesta del buffer recibida antes que la guardada no la sustituye
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["session_id", "question_id"],
+            set_={
+                "selected_option_id": stmt.excluded.selected_option_id,
+                "selected_option_ids": stmt.excluded.selected_option_ids,
+                "answered_at": stmt.excluded.answered_at,
+                "updated_at": now,
+            },
+            where=StudentAnswer.answered_at <= stmt.excluded.answered_at,
+        )
+        session.execute(stmt)
+        
+        ScoringService.update_running_score(exam_session, list(latest), session)
+        session.commit()
+        
+        return list(session.exec(
+            select(StudentAnswer).where(
+                StudentAnswer.session_id == exam_session.id,
+                StudentAnswer.question_id.in_(list(latest))  # type: ignore[attr-defined]
+            ).order_by(StudentAnswer.question_id)
+        ).all())
+    
+    @staticmethod
+    def flush_buffered_answers(exam_session: ExamSession, session: Session) -> int:
+        """
+        Vuelca a la base de datos las respuestas pendientes en el buffer de Redis
+        Retorna el número de respuestas volcadas
+        """
+        if exam_session.id is None:
+            return 0
+        
+        answers = AnswerBuffer.drain(exam_session.id)
+        if not answers:
+            return 0
+        
+        try:
+            SessionService.upsert_answers(exam_session, answers, session)
+        except Exception:
+            session.rollback()
+            AnswerBuffer.restore(exam_session.id, answers)
+            raise
+        return len(answers)
+    
+    @staticmethod
+    def flush_pending_answers(session_factory: Callable[[], Session], limit: Optional[int] = None) -> int:
+        """
+        Vuelca las sesiones con respuestas pendientes (tarea en segundo plano)
+        Procesa como máximo `limit` sesiones por llamada; las extraídas que no
+        llegan a procesarse vuelven a marcarse como pendientes
+        """
+        session_ids = AnswerBuffer.pop_pending_sessions(limit or settings.ANSWER_FLUSH_BATCH_SIZE)
+        flushed = 0
+        processed = 0
+        try:
+            with session_factory() as session:
+                for session_id in session_ids:
+                    try:
+                        flushed += SessionService._flush_locked(session_id, session)
+                    except Exception:
+                        # Las respuestas vuelven al buffer; el resto de sesiones se vuelca igualmente
+                        logger.exception("Failed to flush buffered answers for session %s", session_id)
+                    processed += 1
+        finally:
+            AnswerBuffer.mark_pending(session_ids[processed:])
+        return flushed
+    
+    @staticmethod
+    def _flush_locked(session_id: int, session: Session) -> int:
+        """
+        Vuelca el buffer de una sesión con su fila bloqueada (FOR UPDATE) hasta el
+        commit del volcado: no puede finalizarse entre la comprobación del estado y
+        la escritura de respuestas y puntos. Si ya está cerrada se descartan los restos.
+        """
+        exam_session = SessionService._lock_session(session_id, session)
+        if not exam_session or exam_session.status != SessionStatus.IN_PROGRESS:
+            session.rollback()
+            # La sesión ya se cerró (el cierre fuerza el volcado): descartar restos
+            dropped = AnswerBuffer.drain(session_id)
+            if dropped:
+                logger.warning("Dropped %d buffered answers for closed session %s", len(dropped), session_id)
+            return 0
+        
+        flushed = SessionService.flush_buffered_answers(exam_session, session)
+        if not flushed:
+            session.rollback()  # Nada que volcar: liberar el bloqueo
+        return flushed
+    
+    @staticmethod
+    def known_answers(
+        exam_session: ExamSession, answers: List[StudentAnswerCreate], session: Session
+    ) -> List[StudentAnswerCreate]:
+        """
+        Respuestas cuya pregunta y opciones pertenecen al examen de la sesión (snapshot vigente)
+        Las demás se descartan antes de guardarlas en el buffer: un id desconocido haría
+        fallar el volcado por clave foránea en cada reintento
+        """
+        snapshot = SnapshotService.get_snapshot(exam_session.exam_id, session)
+        question_options = {
+            question.id: {option.id for option in question.options}
+            for question in (snapshot.questions if snapshot else [])
+        }
+        known = []
+        for answer in answers:
+            options = question_options.get(answer.question_id)
+            selected = set(answer.selected_option_ids or [])
+            if answer.selected_option_id is not None:
+                selected.add(answer.selected_option_id)
+            if options is not None and selected <= options:
+                known.append(answer)
+        if len(known) < len(answers):
+            logger.warning("Dropped %d unknown answers for session %s", len(answers) - len(known), exam_session.id)
+        return known
+    
+    @staticmethod
+    def get_session_exam(exam_session: ExamSession, session: Session) -> StudentExamRead:
+        """
+        Examen de la sesión en el orden que ve el alumno
+        Se genera desde el snapshot en caché aplicando la semilla de la sesión;
+        no se guarda ninguna copia del examen por alumno
+        """
+        snapshot = SnapshotService.get_snapshot(exam_session.exam_id, session)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        # Sesiones anteriores a la semilla: el id también es estable
+        seed = exam_session.shuffle_seed if exam_session.shuffle_seed is not None else exam_session.id
+        return SnapshotService.to_student_view(snapshot, shuffle_seed=seed)
+    
     @staticmethod
     def get_session_time_remaining(session_id: int, session: Session) -> Optional[int]:
         """
@@ -125,14 +428,9 @@ class SessionService:
         if not exam_session.end_time:
             return None  # Sin límite de tiempo
         
-        now = datetime.utcnow()
-        if now >= exam_session.end_time:
-            # Tiempo agotado, finalizar sesión automáticamente
-            SessionService.finish_exam_session(session_id, session)
-            return 0
-        
-        time_remaining = exam_session.end_time - now
-        return int(time_remaining.total_seconds() / 60)  # minutos restantes
+        # Tiempo agotado: el barrido periódico la cerrará como EXPIRED
+        time_remaining = exam_session.end_time - datetime.utcnow()
+        return max(0, int(time_remaining.total_seconds() / 60))  # minutos restantes
     
     @staticmethod
     def get_user_exam_history(user_id: int, exam_id: int, session: Session) -> List[ExamSession]:
@@ -0,0 +1,264 @@
+"""
+Detección de patrones de respuesta similares entre sesiones (revisión de integridad)
+Cada sesión finalizada se codifica como el conjunto de sus respuestas
+(pregunta, opciones marcadas). Los candidatos salen de MinHash + LSH por bandas
+sobre las respuestas incorrectas: solo se comparan los pares que comparten
+muchos fallos idénticos, no todos los pares O(n²). Cada candidato se puntúa con
+un Jaccard ponderado en el que una respuesta compartida pesa más cuanto más rara
+es, y un acierto compartido pesa CORRECT_MATCH_WEIGHT veces lo que un fallo.
+Una tarea periódica regenera el informe de los exámenes con sesiones nuevas.
+"""
+
+from dataclasses import dataclass
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models.exam import Exam
+from app.models.integrity import SimilarPair, SimilarityReport
+from app.models.session import ExamSession, StudentAnswer, SessionStatus
+from app.models.statistics import ExamStatistics
+from datetime import datetime
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRADED_STATUSES = [SessionStatus.COMPLETED, SessionStatus.EXPIRED]
+# Peso relativo de un acierto compartido frente a un fallo compartido
+CORRECT_MATCH_WEIGHT = 0.2
+# Semilla fija: las mismas respuestas dan siempre las mismas firmas
+MINHASH_SEED = 7919
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """Finalizador de splitmix64: biyección que dispersa enteros consecutivos"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+@dataclass(frozen=True)
+class EncodedSessions:
+    """Respuestas de las sesiones de un examen como conjuntos de tokens"""
+    session_ids: List[int]
+    student_ids: List[int]
+    tokens: List[np.ndarray]        # int64 ordenado, un token por pregunta respondida
+    token_is_correct: np.ndarray    # bool por token
+    token_weights: np.ndarray       # float64 por token
+
+
+class SimilarityService:
+
+    @staticmethod
+    def encode(rows: Sequence[tuple]) -> EncodedSessions:
+        """
+        Codifica filas (session_id, student_id, question_id, selected_option_id,
+        selected_option_ids, is_correct) ordenadas por sesión
+        Un token es (pregunta, opciones marcadas); las preguntas en blanco no generan token
+        """
+        vocabulary: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+        is_correct: List[bool] = []
+        session_ids: List[int] = []
+        student_ids: List[int] = []
+        session_tokens: List[List[int]] = []
+
+        for session_id, student_id, question_id, option_id, option_ids, correct in rows:
+            if not session_ids or session_ids[-1] != session_id:
+                session_ids.append(session_id)
+                student_ids.append(student_id)
+                session_tokens.append([])
+            selection = tuple(sorted(option_ids)) if option_ids else ((option_id,) if option_id is not None else ())
+            if not selection:
+                continue
+            token = vocabulary.setdefault((question_id, selection), len(vocabulary))
+            if token == len(is_correct):
+                is_correct.append(bool(correct))
+            session_tokens[-1].append(token)
+
+        tokens = [np.unique(np.asarray(values, dtype=np.int64)) for values in session_tokens]
+        token_is_correct = np.asarray(is_correct, dtype=bool)
+        # Respuestas raras (poco frecuentes en el examen) pesan más al coincidir
+        document_frequency = np.bincount(
+            np.concatenate(tokens) if tokens else np.zeros(0, dtype=np.int64), minlength=len(vocabulary)
+        )
+        weights = np.log1p(len(session_ids) / np.maximum(document_frequency, 1))
+        weights[token_is_correct] *= CORRECT_MATCH_WEIGHT
+
+        return EncodedSessions(session_ids, student_ids, tokens, token_is_correct, weights)
+
+    @staticmethod
+    def minhash_signatures(token_sets: Sequence[np.ndarray], num_perm: int, chunk_size: Optional[int] = None) -> np.ndarray:
+        """
+        Firma MinHash (conjuntos × num_perm) de conjuntos no vacíos de tokens
+        Hash multiplicativo h(x) = (a·x + b mod 2^64) >> 32 con a impar por permutación,
+        sobre los tokens ya dispersados (ids consecutivos sesgarían los mínimos)
+        Se calcula por bloques de chunk_size conjuntos: la matriz intermedia de hashes
+        (tokens del bloque × num_perm) no crece con el número de sesiones del examen
+        """
+        chunk_size = chunk_size or settings.SIMILARITY_MINHASH_CHUNK_SIZE
+        rng = np.random.default_rng(MINHASH_SEED)
+        a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        signatures = np.empty((len(token_sets), num_perm), dtype=np.uint64)
+        for offset in range(0, len(token_sets), chunk_size):
+            chunk = token_sets[offset:offset + chunk_size]
+            lengths = np.asarray([len(values) for values in chunk], dtype=np.int64)
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            values = _mix64(np.concatenate(chunk).astype(np.uint64))
+            hashes = (values[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+            signatures[offset:offset + len(chunk)] = np.minimum.reduceat(hashes, starts, axis=0)
+        return signatures
+
+    @staticmethod
+    def lsh_candidates(signatures: np.ndarray, bands: int, rows: int) -> Set[Tuple[int, int]]:
+        """
+        Pares (i, j) que coinciden en todas las filas de al menos una banda
+        Probabilidad de ser candidato con Jaccard s: 1 - (1 - s^rows)^bands
+        """
+        candidates: Set[Tuple[int, int]] = set()
+        for band in range(bands):
+            block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+            _, bucket = np.unique(block, axis=0, return_inverse=True)
+            bucket = bucket.ravel()
+            order = np.argsort(bucket, kind="stable")
+            for members in np.split(order, np.flatnonzero(np.diff(bucket[order])) + 1):
+                if len(members) > 1:
+                    candidates.update(combinations(sorted(members.tolist()), 2))
+        return candidates
+
+    @staticmethod
+    def find_similar_pairs(encoded: EncodedSessions) -> Tuple[List[SimilarPair], int]:
+        """Pares sospechosos ordenados por similitud y número de candidatos evaluados"""
+        bands, rows = settings.SIMILARITY_LSH_BANDS, settings.SIMILARITY_LSH_ROWS
+        min_shared_wrong = settings.SIMILARITY_MIN_SHARED_WRONG
+
+        # Solo pueden superar el filtro las sesiones con suficientes fallos
+        wrong = [tokens[~encoded.token_is_correct[tokens]] for tokens in encoded.tokens]
+        eligible = [index for index, tokens in enumerate(wrong) if len(tokens) >= max(min_shared_wrong, 1)]
+        if len(eligible) < 2:
+            return [], 0
+
+        signatures = SimilarityService.minhash_signatures([wrong[index] for index in eligible], bands * rows)
+        candidates = SimilarityService.lsh_candidates(signatures, bands, rows)
+
+        pairs = []
+        for left, right in candidates:
+            i, j = eligible[left], eligible[right]
+            if encoded.student_ids[i] == encoded.student_ids[j]:
+                continue  # Intentos del mismo estudiante
+            shared = np.intersect1d(encoded.tokens[i], encoded.tokens[j], assume_unique=True)
+            shared_wrong = int((~encoded.token_is_correct[shared]).sum())
+            if shared_wrong < min_shared_wrong:
+                continue
+            union = np.union1d(encoded.tokens[i], encoded.tokens[j])
+            similarity = float(encoded.token_weights[shared].sum() / encoded.token_weights[union].sum())
+            if similarity < settings.SIMILARITY_MIN_SCORE:
+                continue
+            pairs.append(SimilarPair(
+                session_a=encoded.session_ids[i],
+                session_b=encoded.session_ids[j],
+                student_a=encoded.student_ids[i],
+                student_b=encoded.student_ids[j],
+                similarity=round(similarity, 4),
+                shared_wrong=shared_wrong,
+                shared_correct=len(shared) - shared_wrong,
+            ))
+
+        pairs.sort(key=lambda pair: (-pair.similarity, -pair.shared_wrong, pair.session_a, pair.session_b))
+        return pairs[:settings.SIMILARITY_MAX_PAIRS], len(candidates)
+
+    @staticmethod
+    def generate_report(exam_id: int, session: Session) -> SimilarityReport:
+        """Analiza las sesiones finalizadas del examen y guarda el informe"""
+        if not session.get(Exam, exam_id):
+            raise HTTPException(status_code=404, detail="Exam not found")
+
+        # Marca de agua leída antes que las respuestas: una sesión que termine durante
+        # el análisis deja el informe pendiente en vez de perderse
+        statistics = session.get(ExamStatistics, exam_id)
+        completed_count = statistics.completed_count if statistics else 0
+        regrade_count = statistics.regrade_count if statistics else 0
+
+        rows = session.exec(
+            select(
+                ExamSession.id, ExamSession.student_id, StudentAnswer.question_id,
+                StudentAnswer.selected_option_id, StudentAnswer.selected_option_ids, StudentAnswer.is_correct
+            )
+            .join(StudentAnswer, StudentAnswer.session_id == ExamSession.id)
+            .where(
+                ExamSession.exam_id == exam_id,
+                ExamSession.status.in_(GRADED_STATUSES)  # type: ignore[attr-defined]
+            )
+            .order_by(ExamSession.id, StudentAnswer.id)
+        ).all()
+        encoded = SimilarityService.encode(rows)
+        pairs, candidate_pairs = SimilarityService.find_similar_pairs(encoded)
+
+        report = session.get(SimilarityReport, exam_id)
+        if report is None:
+            report = SimilarityReport(exam_id=exam_id)
+        else:
+            report.updated_at = datetime.utcnow()
+        report.generated_at = datetime.utcnow()
+        report.sessions_analyzed = len(encoded.session_ids)
+        report.candidate_pairs = candidate_pairs
+        report.completed_count = completed_count
+        report.regrade_count = regrade_count
+        report.pairs = [pair.model_dump() for pair in pairs]
+        session.add(report)
+        session.commit()
+        session.refresh(report)
+        return report
+
+    @staticmethod
+    def get_report(exam_id: int, session: Session) -> SimilarityReport:
+        """Último informe generado del examen"""
+        report = session.get(SimilarityReport, exam_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Similarity report not generated yet")
+        return report
+
+    @staticmethod
+    def pending_exam_ids(session: Session) -> List[int]:
+        """
+        Exámenes con sesiones finalizadas o recorregidos después de su último informe
+        Compara los contadores de sesiones finalizadas y de recorrecciones con los
+        guardados en el informe: updated_at también cambia con cada intento iniciado,
+        que no afecta al análisis
+        """
+        return list(session.exec(
+            select(ExamStatistics.exam_id)
+            .join(SimilarityReport, SimilarityReport.exam_id == ExamStatistics.exam_id, isouter=True)
+            .where(
+                ExamStatistics.completed_count >= 2,
+                or_(
+                    SimilarityReport.exam_id == None,  # noqa: E711
+                    SimilarityReport.completed_count < ExamStatistics.completed_count,
+                    SimilarityReport.regrade_count < ExamStatistics.regrade_count,
+                )
+            )
+            .order_by(ExamStatistics.exam_id)
+        ).all())
+
+    @staticmethod
+    def generate_pending_job(session_factory: Callable[[], Session]) -> int:
+        """
+        Tarea periódica; retorna el número de informes regenerados
+        Un examen que falla se registra y se reintenta en la siguiente pasada sin detener el resto
+        """
+        generated = 0
+        with session_factory() as session:
+            for exam_id in SimilarityService.pending_exam_ids(session):
+                try:
+                    SimilarityService.generate_report(exam_id, session)
+                except Exception:
+                    session.rollback()
+                    logger.exception("Failed to generate similarity report for exam %s", exam_id)
+                    continue
+                generated += 1
+        return generated
@@ -0,0 +1,266 @@
+"""
+Caché de snapshots de exámenes
+El examen completo se serializa una vez y se guarda en Redis y en una LRU
+por worker, con clave (examen, versión). Cualquier escritura sobre el examen,
+sus preguntas u opciones incrementa la versión, así que las entradas antiguas
+dejan de leerse sin necesidad de borrarlas en todos los workers.
+Sin Redis la versión es local de cada worker y no ve las escrituras hechas en
+otro: el snapshot local solo se da por bueno durante EXAM_SNAPSHOT_LOCAL_TTL_SECONDS
+y después se compara con la base de datos (si cambió, se sube la versión).
+"""
+
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.exam import Exam
+from app.models.question import Question, Option, QuestionType
+from app.models.snapshot import (
+    ExamSnapshot, SnapshotQuestion, SnapshotOption,
+    StudentExamRead, StudentQuestionRead, StudentOptionRead
+)
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+import hashlib
+import json
+import random
+import threading
+import time
+
+VERSION_KEY = "exam-scan:exam-version:{exam_id}"
+SNAPSHOT_KEY = "exam-scan:exam-snapshot:{exam_id}:{version}"
+
+T = TypeVar("T")
+
+# LRU por worker: (exam_id, versión) -> snapshot
+_snapshot_cache: "OrderedDict[Tuple[int, int], ExamSnapshot]" = OrderedDict()
+# Versiones locales cuando no hay Redis e instante de la última comprobación contra la BD
+_local_versions: Dict[int, int] = {}
+_local_checked: Dict[int, float] = {}
+_lock = threading.Lock()
+
+
+class SnapshotService:
+
+    @staticmethod
+    def current_version(exam_id: int) -> int:
+        """Versión vigente del examen (compartida entre workers si hay Redis)"""
+        redis = get_redis()
+        if redis is not None:
+            return int(redis.get(VERSION_KEY.format(exam_id=exam_id)) or 0)
+        with _lock:
+            return _local_versions.get(exam_id, 0)
+
+    @staticmethod
+    def invalidate(exam_id: int) -> int:
+        """
+        Invalida el snapshot (y la clave de respuestas derivada) de un examen
+        Llamar después del commit de cualquier cambio en el examen, sus preguntas u opciones
+        """
+        redis = get_redis()
+        if redis is not None:
+            version = int(redis.incr(VERSION_KEY.format(exam_id=exam_id)))
+        else:
+            with _lock:
+                version = _local_versions.get(exam_id, 0) + 1
+                _local_versions[exam_id] = version
+
+        with _lock:
+            for cached in [key for key in _snapshot_cache if key[0] == exam_id]:
+                del _snapshot_cache[cached]
+        return version
+
+    @staticmethod
+    def get_snapshot(exam_id: int, session: Session) -> Optional[ExamSnapshot]:
+        """
+        Obtiene el snapshot vigente: LRU local, después Redis y por último la base de datos
+        Retorna None si el examen no existe
+        """
+        version = SnapshotService.current_version(exam_id)
+        cache_key = (exam_id, version)
+        redis = get_redis()
+
+        with _lock:
+            snapshot = _snapshot_cache.get(cache_key)
+            if snapshot is not None:
+                _snapshot_cache.move_to_end(cache_key)
+                checked = _local_checked.get(exam_id, 0.0)
+                if redis is not None or time.monotonic() - checked < settings.EXAM_SNAPSHOT_LOCAL_TTL_SECONDS:
+                    return snapshot
+
+        if snapshot is not None:
+            return SnapshotService._revalidate_local(snapshot, session)
+
+        redis_key = SNAPSHOT_KEY.format(exam_id=exam_id, version=version)
+        raw = redis.get(redis_key) if redis is not None else None
+        if raw:
+            snapshot = ExamSnapshot.model_validate_json(raw)
+        else:
+            snapshot = SnapshotService.build_snapshot(exam_id, version, session)
+            if snapshot is None:
+                return None
+            if redis is not None:
+                redis.set(redis_key, snapshot.model_dump_json(), ex=settings.EXAM_SNAPSHOT_TTL_SECONDS)
+
+        SnapshotService._store_local(cache_key, snapshot)
+        return snapshot
+
+    @staticmethod
+    def _revalidate_local(snapshot: ExamSnapshot, session: Session) -> Optional[ExamSnapshot]:
+        """
+        Sin Redis: compara el snapshot local caducado con la base de datos
+        Si otro worker cambió el examen se sube la versión local, así las claves
+        de respuestas e informes derivados de la versión anterior dejan de usarse
+        """
+        fresh = SnapshotService.build_snapshot(snapshot.exam_id, snapshot.version, session)
+        if fresh is not None and fresh.model_dump() == snapshot.model_dump():
+            with _lock:
+                _local_checked[snapshot.exam_id] = time.monotonic()
+            return snapshot
+
+        version = SnapshotService.invalidate(snapshot.exam_id)
+        if fresh is None:
+            return None
+        fresh.version = version
+        SnapshotService._store_local((snapshot.exam_id, version), fresh)
+        return fresh
+
+    @staticmethod
+    def warm(exam_id: int, session: Session) -> Optional[ExamSnapshot]:
+        """Genera una versión nueva y la deja cargada (p.ej. al publicar)"""
+        SnapshotService.invalidate(exam_id)
+        return SnapshotService.get_snapshot(exam_id, session)
+
+    @staticmethod
+    def build_snapshot(exam_id: int, version: int, session: Session) -> Optional[ExamSnapshot]:
+        """Construye el snapshot desde la base de datos con una consulta de preguntas y opciones"""
+        exam = session.get(Exam, exam_id)
+        if not exam:
+            return None
+
+        rows = session.exec(
+            select(Question, Option)
+            .join(Option, Option.question_id == Question.id, isouter=True)
+            .where(Question.exam_id == exam_id, Question.is_active == True)  # noqa: E712
+            .order_by(Question.order_index, Question.id, Option.order_index, Option.id)
+        ).all()
+
+        questions: Dict[int, SnapshotQuestion] = {}
+        for question, option in rows:
+            snapshot_question = questions.get(question.id)
+            if snapshot_question is None:
+                snapshot_question = SnapshotQuestion(
+                    id=question.id,
+                    text=question.text,
+                    question_type=question.question_type,
+                    points=question.points,
+                    difficulty=question.difficulty,
+                    explanation=question.explanation,
+                    order_index=question.order_index,
+                )
+                questions[question.id] = snapshot_question
+            if option is not None:
+                snapshot_question.options.append(SnapshotOption(
+                    id=option.id,
+                    text=option.text,
+                    order_index=option.order_index,
+                    is_correct=option.is_correct,
+                ))
+
+        question_list = list(questions.values())
+        return ExamSnapshot(
+            exam_id=exam_id,
+            version=version,
+            title=exam.title,
+            description=exam.description,
+            subject=exam.subject,
+            instructions=exam.instructions,
+            duration_minutes=exam.duration_minutes,
+            passing_score=exam.passing_score,
+            status=exam.status,
+            randomize_questions=exam.randomize_questions,
+            randomize_options=exam.randomize_options,
+            questions=question_list,
+            answer_key_hash=SnapshotService.answer_key_hash(question_list),
+        )
+
+    @staticmethod
+    def answer_key_hash(questions: list) -> str:
+        """Huella de la clave de respuestas (puntos y opciones correctas por pregunta)"""
+        key = sorted(
+            (question.id, question.question_type.value, question.points,
+             sorted(option.id for option in question.options if option.is_correct))
+            for question in questions
+        )
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    @staticmethod
+    def to_student_view(snapshot: ExamSnapshot, shuffle_seed: Optional[int] = None) -> StudentExamRead:
+        """
+        Vista del examen sin respuestas correctas ni explicaciones
+        Con semilla se aplica el orden aleatorio de la sesión si el examen lo tiene activado
+        """
+        questions = snapshot.questions
+        if shuffle_seed is not None and snapshot.randomize_questions:
+            questions = SnapshotService.permute(questions, shuffle_seed)
+
+        return StudentExamRead(
+            exam_id=snapshot.exam_id,
+            version=snapshot.version,
+            title=snapshot.title,
+            description=snapshot.description,
+            subject=snapshot.subject,
+            instructions=snapshot.instructions,
+            duration_minutes=snapshot.duration_minutes,
+            questions=[
+                StudentQuestionRead(
+                    id=question.id,
+                    text=question.text,
+                    question_type=question.question_type,
+                    points=question.points,
+                    order_index=question.order_index,
+                    options=[
+                        StudentOptionRead(id=option.id, text=option.text, order_index=option.order_index)
+                        for option in SnapshotService._session_options(snapshot, question, shuffle_seed)
+                    ],
+                )
+                for question in questions
+            ],
+        )
+
+    @staticmethod
+    def permute(items: Sequence[T], seed: Union[int, str]) -> List[T]:
+        """
+        Permutación reproducible (Fisher-Yates, O(n)) a partir de una semilla
+        random.Random con semilla str o int da la misma secuencia en cualquier proceso
+        """
+        permuted = list(items)
+        random.Random(seed).shuffle(permuted)
+        return permuted
+
+    @staticmethod
+    def _session_options(snapshot: ExamSnapshot, question: SnapshotQuestion, shuffle_seed: Optional[int]) -> List[SnapshotOption]:
+        # Verdadero/falso mantiene su orden natural
+        if shuffle_seed is None or not snapshot.randomize_options or question.question_type == QuestionType.TRUE_FALSE:
+            return question.options
+        # Semilla por pregunta: el orden de sus opciones no cambia si se añaden otras preguntas
+        return SnapshotService.permute(question.options, f"{shuffle_seed}:{question.id}")
+
+    @staticmethod
+    def _store_local(cache_key: Tuple[int, int], snapshot: ExamSnapshot) -> None:
+        with _lock:
+            # Solo la versión vigente de cada examen ocupa sitio en la LRU
+            for stale in [key for key in _snapshot_cache if key[0] == cache_key[0] and key != cache_key]:
+                del _snapshot_cache[stale]
+            _snapshot_cache[cache_key] = snapshot
+            _snapshot_cache.move_to_end(cache_key)
+            _local_checked[cache_key[0]] = time.monotonic()
+            while len(_snapshot_cache) > settings.EXAM_SNAPSHOT_CACHE_SIZE:
+                _snapshot_cache.popitem(last=False)
+
+    @staticmethod
+    def clear_local_cache() -> None:
+        """Vacía la LRU y las versiones locales (tests)"""
+        with _lock:
+            _snapshot_cache.clear()
+            _local_versions.clear()
+            _local_checked.clear()
@@ -0,0 +1,235 @@
+"""
+Servicio de estadísticas materializadas de exámenes
+Mantiene una fila de agregados por examen que se actualiza de forma incremental
+Incluye un t-digest de las puntuaciones para percentiles e histogramas en O(1)
+"""
+
+from sqlmodel import Session, select, func
+from sqlalchemy import case, cast, Integer
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.core.tdigest import TDigest
+from app.models.session import ExamSession, SessionStatus
+from app.models.statistics import (
+    ExamStatistics, SCORE_HISTOGRAM_BUCKETS, empty_score_histogram,
+    ScoreDistribution, ScoreHistogramBin, ScorePercentile, ScorePercentileRank
+)
+from datetime import datetime
+from typing import Optional, Dict, Any, Sequence
+import math
+
+
+class StatisticsService:
+
+    @staticmethod
+    def _lock_statistics(exam_id: int, session: Session) -> ExamStatistics:
+        """
+        Obtiene la fila de estadísticas del examen bloqueada para actualización
+        La crea si no existe (INSERT ... ON CONFLICT DO NOTHING para evitar carreras)
+        """
+        stmt = dialect_insert(session, ExamStatistics).values(
+            exam_id=exam_id,
+            created_at=datetime.utcnow(),
+            attempt_count=0,
+            completed_count=0,
+            regrade_count=0,
+            score_sum=0.0,
+            score_sum_squares=0.0,
+            score_histogram=empty_score_histogram(),
+        ).on_conflict_do_nothing(index_elements=["exam_id"])
+        session.execute(stmt)
+
+        return session.exec(
+            select(ExamStatistics)
+            .where(ExamStatistics.exam_id == exam_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).one()
+
+    @staticmethod
+    def score_bucket(score: float) -> int:
+        """Índice de la cubeta del histograma para una puntuación (0-100)"""
+        bucket = int(score // (100 / SCORE_HISTOGRAM_BUCKETS))
+        return max(0, min(bucket, SCORE_HISTOGRAM_BUCKETS - 1))
+
+    @staticmethod
+    def record_attempt(exam_id: int, session: Session) -> None:
+        """
+        Registra un nuevo intento del examen
+        Un único upsert con incremento atómico, sin SELECT ... FOR UPDATE: los inicios
+        simultáneos del mismo examen no se serializan en la lectura de la fila
+        No hace commit: se ejecuta en la transacción de quien inicia la sesión
+        """
+        now = datetime.utcnow()
+        stmt = dialect_insert(session, ExamStatistics).values(
+            exam_id=exam_id,
+            created_at=now,
+            updated_at=now,
+            attempt_count=1,
+            completed_count=0,
+            regrade_count=0,
+            score_sum=0.0,
+            score_sum_squares=0.0,
+            score_histogram=empty_score_histogram(),
+        )
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=["exam_id"],
+            set_={"attempt_count": ExamStatistics.attempt_count + 1, "updated_at": now},
+        ))
+
+    @staticmethod
+    def record_completion(exam_session: ExamSession, session: Session) -> None:
+        """
+        Registra una sesión finalizada y su puntuación
+        No hace commit: se ejecuta en la transacción de quien finaliza la sesión
+        """
+        if exam_session.score is None:
+            return
+
+        stats = StatisticsService._lock_statistics(exam_session.exam_id, session)
+        score = exam_session.score
+        histogram = list(stats.score_histogram or empty_score_histogram())
+        histogram[StatisticsService.score_bucket(score)] += 1
+
+        stats.completed_count += 1
+        stats.score_sum += score
+        stats.score_sum_squares += score * score
+        stats.score_histogram = histogram
+        digest = StatisticsService._load_digest(stats)
+        digest.add(score)
+        stats.score_digest = digest.to_bytes()
+        stats.updated_at = datetime.utcnow()
+        session.add(stats)
+
+    @staticmethod
+    def rebuild(exam_id: int, session: Session) -> ExamStatistics:
+        """
+        Recalcula los agregados de un examen desde las sesiones (consultas agregadas)
+        Se usa tras una recorrección masiva. No hace commit.
+        """
+        stats = StatisticsService._lock_statistics(exam_id, session)
+        graded = (
+            ExamSession.exam_id == exam_id,
+            ExamSession.status.in_([SessionStatus.COMPLETED, SessionStatus.EXPIRED]),  # type: ignore[attr-defined]
+            ExamSession.score != None,  # noqa: E711
+        )
+
+        attempts = session.exec(
+            select(func.count()).select_from(ExamSession).where(ExamSession.exam_id == exam_id)
+        ).one()
+        completed, score_sum, score_sum_squares = session.exec(
+            select(
+                func.count(),
+                func.coalesce(func.sum(ExamSession.score), 0.0),
+                func.coalesce(func.sum(ExamSession.score * ExamSession.score), 0.0),
+            ).where(*graded)
+        ).one()
+
+        bucket = case(
+            (ExamSession.score >= 100, SCORE_HISTOGRAM_BUCKETS - 1),
+            # floor explícito: PostgreSQL redondea al convertir a entero (igual que score_bucket)
+            else_=cast(func.floor(ExamSession.score / (100 / SCORE_HISTOGRAM_BUCKETS)), Integer),
+        )
+        histogram = empty_score_histogram()
+        for index, count in session.exec(
+            select(bucket, func.count()).where(*graded).group_by(bucket)
+        ).all():
+            histogram[max(0, min(int(index), SCORE_HISTOGRAM_BUCKETS - 1))] += count
+
+        digest = TDigest(settings.SCORE_DIGEST_COMPRESSION)
+        for score in session.exec(select(ExamSession.score).where(*graded)):
+            digest.add(score)
+
+        stats.attempt_count = attempts
+        stats.completed_count = completed
+        stats.score_sum = float(score_sum)
+        stats.score_sum_squares = float(score_sum_squares)
+        stats.score_histogram = histogram
+        stats.score_digest = digest.to_bytes()
+        stats.updated_at = datetime.utcnow()
+        session.add(stats)
+        return stats
+
+    @staticmethod
+    def get_summary(exam_id: int, session: Session) -> Dict[str, Any]:
+        """
+        Lee los agregados de un examen (una sola fila, O(1))
+        Retorna intentos, completadas, media, desviación típica, mediana e histograma
+        """
+        stats: Optional[ExamStatistics] = session.get(ExamStatistics, exam_id)
+        if not stats or stats.completed_count == 0:
+            return {
+                "attempts_count": stats.attempt_count if stats else 0,
+                "sessions_completed": 0,
+                "average_score": 0.0,
+                "score_stddev": 0.0,
+                "median_score": None,
+                "score_histogram": stats.score_histogram if stats else empty_score_histogram(),
+            }
+
+        n = stats.completed_count
+        mean = stats.score_sum / n
+        variance = max(stats.score_sum_squares / n - mean * mean, 0.0)
+
+        return {
+            "attempts_count": stats.attempt_count,
+            "sessions_completed": n,
+            "average_score": round(mean, 2),
+            "score_stddev": round(math.sqrt(variance), 2),
+            "median_score": _round(StatisticsService._load_digest(stats).quantile(0.5)),
+            "score_histogram": stats.score_histogram,
+        }
+
+    @staticmethod
+    def _load_digest(stats: Optional[ExamStatistics]) -> TDigest:
+        if stats is None or stats.score_digest is None:
+            return TDigest(settings.SCORE_DIGEST_COMPRESSION)
+        return TDigest.from_bytes(stats.score_digest)
+
+    @staticmethod
+    def get_distribution(
+        exam_id: int,
+        session: Session,
+        quantiles: Sequence[float] = (),
+        bins: int = SCORE_HISTOGRAM_BUCKETS,
+    ) -> ScoreDistribution:
+        """
+        Mediana, p90, los cuantiles pedidos e histograma de bins cubetas en 0-100
+        Se calculan sobre el t-digest de la fila de estadísticas, sin leer las sesiones
+        """
+        digest = StatisticsService._load_digest(session.get(ExamStatistics, exam_id))
+        count = int(digest.count)
+        if not count:
+            return ScoreDistribution(exam_id=exam_id, count=0)
+
+        edges = [100 * index / bins for index in range(bins + 1)]
+        return ScoreDistribution(
+            exam_id=exam_id,
+            count=count,
+            median=_round(digest.quantile(0.5)),
+            p90=_round(digest.quantile(0.9)),
+            percentiles=[
+                ScorePercentile(quantile=quantile, score=_round(digest.quantile(quantile)))
+                for quantile in quantiles
+            ],
+            histogram=[
+                ScoreHistogramBin(lower=lower, upper=upper, count=round(weight, 2))
+                for lower, upper, weight in zip(edges, edges[1:], digest.histogram(edges))
+            ],
+        )
+
+    @staticmethod
+    def get_percentile_rank(exam_id: int, score: float, session: Session) -> ScorePercentileRank:
+        """Porcentaje de sesiones finalizadas del examen con puntuación inferior a score"""
+        digest = StatisticsService._load_digest(session.get(ExamStatistics, exam_id))
+        rank = digest.cdf(score)
+        return ScorePercentileRank(
+            exam_id=exam_id,
+            score=score,
+            count=int(digest.count),
+            percentile_rank=None if rank is None else round(rank * 100, 1),
+        )
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
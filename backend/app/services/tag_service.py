@@ -0,0 +1,46 @@
+"""
+Servicio de etiquetas y su asignación a exámenes y preguntas
+"""
+
+from sqlmodel import Session, select
+from app.models.exam import Exam
+from app.models.question import Question
+from app.models.tag import Tag
+from fastapi import HTTPException
+from typing import List
+
+
+class TagService:
+
+    @staticmethod
+    def get_tags(tag_ids: List[int], session: Session) -> List[Tag]:
+        """Carga las etiquetas pedidas en una consulta; 404 si falta alguna"""
+        unique_ids = list(dict.fromkeys(tag_ids))
+        if not unique_ids:
+            return []
+        tags = session.exec(select(Tag).where(Tag.id.in_(unique_ids))).all()
+        if len(tags) != len(unique_ids):
+            raise HTTPException(status_code=404, detail="Tag not found")
+        return tags
+
+    @staticmethod
+    def set_exam_tags(exam_id: int, tag_ids: List[int], session: Session) -> List[Tag]:
+        """Reemplaza las etiquetas de un examen"""
+        exam = session.get(Exam, exam_id)
+        if not exam:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        exam.tags = TagService.get_tags(tag_ids, session)
+        session.add(exam)
+        session.commit()
+        return sorted(exam.tags, key=lambda tag: tag.name)
+
+    @staticmethod
+    def set_question_tags(question_id: int, tag_ids: List[int], session: Session) -> List[Tag]:
+        """Reemplaza las etiquetas de una pregunta"""
+        question = session.get(Question, question_id)
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
+        question.tags = TagService.get_tags(tag_ids, session)
+        session.add(question)
+        session.commit()
+        return sorted(question.tags, key=lambda tag: tag.name)
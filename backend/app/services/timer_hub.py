@@ -0,0 +1,196 @@
+"""
+Temporizador push de sesiones de examen
+Una única tarea asyncio por worker mantiene un min-heap de fechas límite y
+reparte latidos y eventos de expiración a todos los clientes conectados.
+Los cierres de sesión (finalizar o expirar) se difunden por Redis pub/sub para
+que lleguen a los clientes conectados a cualquier worker.
+"""
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import json
+
+TIMER_CHANNEL = "exam-scan:session-timer"
+
+
+@dataclass
+class TimerEvent:
+    """Evento enviado a los clientes suscritos a una sesión"""
+    event: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def is_final(self) -> bool:
+        return self.event in ("expired", "closed")
+
+
+class TimerHub:
+
+    def __init__(self, heartbeat_seconds: Optional[float] = None):
+        self.heartbeat_seconds = heartbeat_seconds or settings.TIMER_HEARTBEAT_SECONDS
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._deadlines: Dict[int, datetime] = {}
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, session_id: int, deadline: Optional[datetime]) -> asyncio.Queue:
+        """
+        Registra un cliente y le envía la fecha límite autoritativa
+        Arranca la tarea del temporizador si no está en marcha
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        queue.put_nowait(TimerEvent("deadline", {
+            "session_id": session_id,
+            "end_time": deadline.isoformat() if deadline else None,
+            "server_time": datetime.utcnow().isoformat(),
+        }))
+
+        if deadline is not None and self._deadlines.get(session_id) != deadline:
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+        self._ensure_running()
+        return queue
+
+    def unsubscribe(self, session_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            # Las entradas del heap sin suscriptores se descartan al salir
+            del self._subscribers[session_id]
+            self._deadlines.pop(session_id, None)
+
+    def publish(self, session_id: int, event: TimerEvent) -> None:
+        """Envía un evento a los clientes de una sesión (p.ej. al finalizarla)"""
+        for queue in self._subscribers.get(session_id, ()):
+            queue.put_nowait(event)
+        if event.is_final:
+            self._deadlines.pop(session_id, None)
+
+    def publish_threadsafe(self, session_id: int, event: TimerEvent) -> None:
+        """Publica desde código síncrono (threadpool o tareas periódicas)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # Nadie suscrito en este worker todavía
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.publish(session_id, event)
+        else:
+            loop.call_soon_threadsafe(self.publish, session_id, event)
+
+    def broadcast(self, session_id: int, event: TimerEvent) -> None:
+        """
+        Envía un evento a los clientes de la sesión en todos los workers
+        Con Redis se publica en TIMER_CHANNEL y cada worker lo reparte desde su
+        listener (incluido este); sin Redis solo hay un worker y se entrega local
+        """
+        redis = get_redis()
+        if redis is None:
+            self.publish_threadsafe(session_id, event)
+            return
+        redis.publish(TIMER_CHANNEL, json.dumps({"session_id": session_id, "event": event.event, "data": event.data}))
+
+    def start_listener(self) -> None:
+        """Arranca la suscripción a TIMER_CHANNEL (solo con Redis configurado)"""
+        redis = get_redis()
+        if redis is None or (self._listener is not None and not self._listener.done()):
+            return
+        self._loop = asyncio.get_running_loop()
+        self._listener = self._loop.create_task(self._listen(redis))
+
+    async def _listen(self, redis) -> None:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(TIMER_CHANNEL)
+        try:
+            while True:
+                # Cliente síncrono: la espera bloqueante va a un hilo
+                message = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                payload = json.loads(message["data"])
+                self.publish(payload["session_id"], TimerEvent(payload["event"], payload["data"]))
+        finally:
+            pubsub.close()
+
+    def _ensure_running(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            # El evento se liga al bucle en curso, se recrea con cada tarea
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        for task in (self._task, self._listener):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._listener = None
+
+    def _expire_due(self, now: datetime) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            deadline, session_id = heapq.heappop(self._heap)
+            if self._deadlines.get(session_id) != deadline:
+                continue  # entrada obsoleta
+            self.publish(session_id, TimerEvent("expired", {"session_id": session_id}))
+
+    def _send_heartbeats(self, now: datetime) -> None:
+        for session_id, queues in self._subscribers.items():
+            deadline = self._deadlines.get(session_id)
+            remaining = max(0, int((deadline - now).total_seconds())) if deadline else None
+            event = TimerEvent("heartbeat", {"session_id": session_id, "seconds_remaining": remaining})
+            for queue in queues:
+                queue.put_nowait(event)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat_seconds
+        while self._subscribers:
+            assert self._wakeup is not None
+            self._wakeup.clear()
+            timeout = next_heartbeat - loop.time()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+            now = datetime.utcnow()
+            self._expire_due(now)
+            if loop.time() >= next_heartbeat:
+                self._send_heartbeats(now)
+                next_heartbeat = loop.time() + self.heartbeat_seconds
+        self._heap.clear()
+        self._task = None
+
+
+# Instancia compartida por el worker
+timer_hub = TimerHub()
+
+
+def notify_session_closed(session_id: int, status: str) -> None:
+    """Avisa a los temporizadores abiertos de que la sesión se ha cerrado"""
+    timer_hub.broadcast(session_id, TimerEvent("closed", {"session_id": session_id, "status": status}))
@@ -1,4 +1,5 @@
 import pytest
+import fakeredis
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
@@ -6,6 +7,18 @@ from sqlmodel.pool import StaticPool
 from app.main import app
 from app.api.deps import get_session
 from app.models.user import User
+from app.core.admission import AdmissionController
+from app.core.idempotency import clear_local_store
+from app.core.principal import PrincipalCache
+from app.core.revocation import TokenRevocationList
+from app.core.login_throttle import LoginThrottle
+from app.core.redis import set_redis
+from app.services.scoring_service import ScoringService
+from app.services.snapshot_service import SnapshotService
+from app.services.search_index import InMemorySearchBackend
+from app.services.autocomplete_service import AutocompleteService
+from app.services.facet_service import FacetService
+from app.services.item_analysis_service import ItemAnalysisService
 
 
 @pytest.fixture(name="session")
@@ -22,6 +35,32 @@ def session_fixture():
     session.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Vaciar las cachés en proceso entre tests (cada test usa una BD nueva)"""
+    ScoringService.clear_answer_key_cache()
+    SnapshotService.clear_local_cache()
+    clear_local_store()
+    AdmissionController.reset()
+    PrincipalCache.clear_local_cache()
+    TokenRevocationList.clear_local_state()
+    LoginThrottle.reset()
+    InMemorySearchBackend.reset()
+    AutocompleteService.reset()
+    FacetService.invalidate()
+    ItemAnalysisService.clear_cache()
+    yield
+    set_redis(None)
+
+
+@pytest.fixture(name="redis")
+def redis_fixture():
+    """Redis en memoria (fakeredis) como cliente compartido de la aplicación"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    set_redis(client)
+    return client
+
+
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
     """Create a test client with dependency override"""
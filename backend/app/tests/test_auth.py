@@ -1,7 +1,18 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, select
+from sqlmodel import Session, select, update
 
+from app.api.deps import load_principal
+from app.core.config import settings
+from app.core.bloom import BloomFilter
+from app.core.login_throttle import LoginThrottle
+from app.core.principal import Principal, PrincipalCache
+from app.core.revocation import TokenRevocationList
+from app.core.security import (
+    create_access_token, create_refresh_token, get_token_data, REFRESH_TOKEN,
+    get_password_hash_async, verify_password_async, verify_password, password_hash_queue_depth
+)
 from app.models.user import User
 
 
@@ -119,3 +130,292 @@ def test_get_current_user_no_token(client: TestClient):
     response = client.get("/api/v1/auth/me")
     
     assert response.status_code == 403  # Missing authorization header
+
+
+def _login(client: TestClient, test_user_data: dict) -> tuple[int, dict]:
+    """Registra y autentica al usuario de prueba; retorna (id, cabeceras)"""
+    user_id = client.post("/api/v1/auth/register", json=test_user_data).json()["id"]
+    token = client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    }).json()["access_token"]
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+def test_principal_is_cached(client: TestClient, session: Session, test_user_data: dict):
+    """Test the principal is served from cache after the first request"""
+    user_id, headers = _login(client, test_user_data)
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    # Sin invalidación explícita la caché no vuelve a consultar la tabla
+    session.exec(update(User).where(User.id == user_id).values(is_active=False))
+    session.commit()
+
+    principal = load_principal(user_id, session)
+    assert principal == Principal(user_id=user_id, role="student", is_active=True, token_version=0)
+
+
+def test_role_change_revokes_token(client: TestClient, test_user_data: dict):
+    """Test updating the user invalidates the cache and outstanding tokens"""
+    user_id, headers = _login(client, test_user_data)
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    response = client.put(f"/api/v1/users/{user_id}", json={"role": "teacher"})
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+
+    # Un login nuevo emite un token con la versión actual
+    token = client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    }).json()["access_token"]
+    response = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["role"] == "teacher"
+
+
+def test_deleted_user_rejected(client: TestClient, test_user_data: dict):
+    """Test deleting the user invalidates the cached principal"""
+    user_id, headers = _login(client, test_user_data)
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    assert client.delete(f"/api/v1/users/{user_id}").status_code == 204
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 401
+
+
+def test_principal_shared_through_redis(client: TestClient, session: Session, test_user_data: dict, redis):
+    """Test the principal is stored in Redis for other workers"""
+    user_id, headers = _login(client, test_user_data)
+    client.get("/api/v1/auth/me", headers=headers)
+    PrincipalCache.clear_local_cache()
+
+    assert PrincipalCache.get(user_id) == Principal(user_id=user_id, role="student", is_active=True, token_version=0)
+    assert redis.ttl(f"exam-scan:principal:{user_id}") > 0
+
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_stale_principal_not_cached_after_invalidation(client: TestClient, session: Session, test_user_data: dict, request, use_redis):
+    """Test a principal read before an invalidation is not written back to the cache"""
+    if use_redis:
+        request.getfixturevalue("redis")
+    user_id, _ = _login(client, test_user_data)
+    stale = Principal(user_id=user_id, role="student", is_active=True, token_version=0)
+
+    # Lectura lenta: la fila se lee, el usuario se desactiva y después se guarda lo leído
+    generation = PrincipalCache.generation(user_id)
+    PrincipalCache.invalidate(user_id)
+    PrincipalCache.store(stale, generation)
+
+    assert PrincipalCache.get(user_id) is None
+    PrincipalCache.store(stale, PrincipalCache.generation(user_id))
+    assert PrincipalCache.get(user_id) == stale
+
+
+def test_password_hashing_pool_roundtrip():
+    """Test async hashing API runs in the process pool"""
+    async def roundtrip():
+        hashed = await get_password_hash_async("testpassword123")
+        return hashed, await verify_password_async("testpassword123", hashed), await verify_password_async("wrong", hashed)
+
+    hashed, valid, invalid = asyncio.run(roundtrip())
+
+    assert verify_password("testpassword123", hashed)
+    assert valid is True
+    assert invalid is False
+    assert password_hash_queue_depth._value.get() == 0
+
+
+def test_login_rejected_when_hash_queue_full(client: TestClient, test_user_data: dict, monkeypatch):
+    """Test login sheds load with 503 when the hashing queue is full"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 0)
+
+    response = client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def _login_tokens(client: TestClient, test_user_data: dict) -> dict:
+    """Registra y autentica al usuario de prueba; retorna la respuesta del login"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    return client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    }).json()
+
+
+def test_refresh_token_rotation(client: TestClient, test_user_data: dict):
+    """Test refresh issues a new token pair and revokes the used refresh token"""
+    tokens = _login_tokens(client, test_user_data)
+    assert tokens["refresh_token"]
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refresh_token"] != tokens["refresh_token"]
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {data['access_token']}"})
+    assert me.status_code == 200
+
+    # El refresh token usado ya no sirve
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_refresh_token_not_accepted_as_access_token(client: TestClient, test_user_data: dict):
+    """Test refresh tokens cannot authenticate API requests and vice versa"""
+    tokens = _login_tokens(client, test_user_data)
+
+    response = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_tokens(client: TestClient, test_user_data: dict):
+    """Test logout revokes the access token and the refresh token"""
+    tokens = _login_tokens(client, test_user_data)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = client.post("/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert response.status_code == 204
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_revocation_visible_after_sync(redis):
+    """Test a revocation made by another worker is seen after the filter sync"""
+    token = get_token_data(create_access_token(user_id=1, username="user", role="student"))
+    assert not TokenRevocationList.is_revoked(token["jti"])
+
+    # Otro worker revoca el token: solo queda constancia en Redis
+    TokenRevocationList.revoke(token["jti"], token["expires_at"])
+    TokenRevocationList.clear_local_state()
+    assert not TokenRevocationList.is_revoked(token["jti"])
+
+    assert TokenRevocationList.sync() == 1
+    assert TokenRevocationList.is_revoked(token["jti"])
+    assert redis.ttl(f"exam-scan:revoked:{token['jti']}") > 0
+
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_refresh_token_claimed_once(use_redis: bool, request):
+    """Test only one of two concurrent refreshes can consume the same token"""
+    if use_redis:
+        request.getfixturevalue("redis")
+    token = get_token_data(create_refresh_token(1, 0), REFRESH_TOKEN)
+
+    # Ambas peticiones pasan la comprobación de revocación antes de rotar
+    assert not TokenRevocationList.is_revoked(token["jti"])
+    assert not TokenRevocationList.is_revoked(token["jti"])
+    assert TokenRevocationList.claim(token["jti"], token["expires_at"])
+    assert not TokenRevocationList.claim(token["jti"], token["expires_at"])
+    assert TokenRevocationList.is_revoked(token["jti"])
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test the Bloom filter finds every added item with a low false positive rate"""
+    bloom = BloomFilter(1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_login_throttled_per_email_before_password_check(client: TestClient, test_user_data: dict, monkeypatch):
+    """Test excess login attempts for an email get 429 without running bcrypt"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_EMAIL", 3)
+    wrong = {"email": test_user_data["email"], "password": "wrongpassword"}
+    for _ in range(3):
+        assert client.post("/api/v1/auth/login", json=wrong).status_code == 401
+
+    async def fail_verify(*args):
+        raise AssertionError("verify_password must not run for throttled attempts")
+    monkeypatch.setattr("app.api.v1.routers.auth.verify_password_async", fail_verify)
+
+    response = client.post("/api/v1/auth/login", json=wrong)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_login_throttled_per_ip(client: TestClient, monkeypatch):
+    """Test the per-IP limit applies across different emails"""
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_IP", 2)
+    for i in range(2):
+        response = client.post("/api/v1/auth/login", json={"email": f"user{i}@example.com", "password": "x"})
+        assert response.status_code == 401
+
+    response = client.post("/api/v1/auth/login", json={"email": "other@example.com", "password": "x"})
+    assert response.status_code == 429
+
+
+def test_successful_logins_do_not_count_per_ip(client: TestClient, test_user_data: dict, monkeypatch):
+    """Test only failed attempts count towards the shared per-IP limit"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_IP", 2)
+    credentials = {"email": test_user_data["email"], "password": test_user_data["password"]}
+    for _ in range(5):
+        assert client.post("/api/v1/auth/login", json=credentials).status_code == 200
+
+    assert client.post("/api/v1/auth/login", json={**credentials, "password": "wrong"}).status_code == 401
+    assert client.post("/api/v1/auth/login", json={**credentials, "password": "wrong"}).status_code == 401
+    assert client.post("/api/v1/auth/login", json=credentials).status_code == 429
+
+
+def test_login_throttle_uses_forwarded_client_ip(client: TestClient, monkeypatch):
+    """Test behind a trusted proxy each client gets its own per-IP window"""
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_IP", 1)
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 1)
+    credentials = {"email": "nobody@example.com", "password": "x"}
+    # La primera entrada la pone el cliente y se ignora
+    first = {"X-Forwarded-For": "1.1.1.1, 10.0.0.1"}
+    second = {"X-Forwarded-For": "1.1.1.1, 10.0.0.2"}
+
+    assert client.post("/api/v1/auth/login", json=credentials, headers=first).status_code == 401
+    assert client.post("/api/v1/auth/login", json=credentials, headers=first).status_code == 429
+    assert client.post("/api/v1/auth/login", json=credentials, headers=second).status_code == 401
+
+
+def test_successful_login_resets_email_window(client: TestClient, test_user_data: dict, monkeypatch):
+    """Test a successful login clears the failed attempts of the email"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_EMAIL", 2)
+    credentials = {"email": test_user_data["email"], "password": test_user_data["password"]}
+
+    assert client.post("/api/v1/auth/login", json={**credentials, "password": "wrong"}).status_code == 401
+    assert client.post("/api/v1/auth/login", json=credentials).status_code == 200
+    assert client.post("/api/v1/auth/login", json={**credentials, "password": "wrong"}).status_code == 401
+    assert client.post("/api/v1/auth/login", json=credentials).status_code == 200
+
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_login_throttle_sliding_window(use_redis: bool, request, monkeypatch):
+    """Test attempts leave the window as time passes (in-process and Redis)"""
+    if use_redis:
+        request.getfixturevalue("redis")
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_WINDOW_SECONDS", 60)
+    monkeypatch.setattr(settings, "LOGIN_MAX_ATTEMPTS_PER_EMAIL", 2)
+
+    assert LoginThrottle.hit("User@Example.com", "10.0.0.1", now=1000).allowed
+    assert LoginThrottle.hit("user@example.com", "10.0.0.1", now=1030).allowed
+    rejected = LoginThrottle.hit("user@example.com", "10.0.0.1", now=1040)
+    assert not rejected.allowed
+    assert rejected.retry_after == 20
+
+    # El primer intento sale de la ventana
+    assert LoginThrottle.hit("user@example.com", "10.0.0.1", now=1061).allowed
+    assert not LoginThrottle.hit("user@example.com", "10.0.0.1", now=1062).allowed
@@ -0,0 +1,171 @@
+"""
+Tests para la exportación en streaming de preguntas y sesiones
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.models.user import User
+from app.models.exam import Exam
+from app.models.question import Question, Option, QuestionType
+from app.models.session import ExamSession, SessionStatus, StudentAnswer
+from app.services.export_service import CHUNK_SIZE, ExportService
+
+
+@pytest.fixture(name="export_data")
+def export_data_fixture(session: Session, sample_user: User):
+    """Dos exámenes con preguntas, opciones y sesiones"""
+    first = Exam(title="Geografía", subject="Sociales", creator_id=sample_user.id)
+    second = Exam(title="Física", subject="Ciencias", creator_id=sample_user.id)
+    session.add_all([first, second])
+    session.commit()
+
+    capital = Question(exam_id=first.id, text="Capital de Francia, \"París\"?", order_index=0)
+    rivers = Question(
+        exam_id=first.id, text="Ríos de España", question_type=QuestionType.MULTIPLE_CHOICE, order_index=1
+    )
+    empty = Question(exam_id=second.id, text="Sin opciones")
+    session.add_all([capital, rivers, empty])
+    session.commit()
+    session.add_all([
+        Option(question_id=capital.id, text="París", is_correct=True, order_index=0),
+        Option(question_id=capital.id, text="Lyon", order_index=1),
+        Option(question_id=rivers.id, text="Ebro", is_correct=True, order_index=0),
+        Option(question_id=rivers.id, text="Sena", order_index=1),
+        Option(question_id=rivers.id, text="Tajo", is_correct=True, order_index=2),
+        ExamSession(exam_id=first.id, student_id=sample_user.id, status=SessionStatus.COMPLETED, score=80.0),
+        ExamSession(exam_id=second.id, student_id=sample_user.id),
+    ])
+    session.commit()
+    return {"exams": [first, second], "questions": [capital, rivers, empty]}
+
+
+@pytest.fixture(name="answer_data")
+def answer_data_fixture(session: Session, export_data: dict):
+    """Respuestas de la sesión completada a las dos preguntas del primer examen"""
+    capital, rivers, _ = export_data["questions"]
+    completed = session.exec(
+        select(ExamSession).where(ExamSession.status == SessionStatus.COMPLETED)
+    ).one()
+    options = {option.text: option.id for option in session.exec(select(Option)).all()}
+    session.add_all([
+        StudentAnswer(
+            session_id=completed.id, question_id=capital.id, selected_option_id=options["París"],
+            is_correct=True, points_earned=1.0,
+        ),
+        StudentAnswer(
+            session_id=completed.id, question_id=rivers.id,
+            selected_option_ids=[options["Ebro"], options["Sena"]], is_correct=False, points_earned=0.0,
+        ),
+    ])
+    session.commit()
+    return {**export_data, "session": completed, "options": options}
+
+
+class TestExports:
+
+    def test_export_questions_csv(self, client: TestClient, export_data: dict):
+        response = client.get("/api/v1/exports/questions")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"] == 'attachment; filename="questions.csv"'
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["text"] for row in rows] == ["Capital de Francia, \"París\"?", "Ríos de España", "Sin opciones"]
+        assert rows[1]["options"] == "Ebro | Sena | Tajo"
+        assert rows[1]["correct_options"] == "Ebro | Tajo"
+        assert rows[1]["question_type"] == "multiple_choice"
+        assert rows[2]["options"] == ""
+
+    def test_export_questions_ndjson_by_exam(self, client: TestClient, export_data: dict):
+        exam_id = export_data["exams"][0].id
+        response = client.get("/api/v1/exports/questions", params={"format": "ndjson", "exam_id": exam_id})
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["exam_id"] for row in rows] == [exam_id, exam_id]
+        assert rows[0]["options"] == [{"text": "París", "is_correct": True}, {"text": "Lyon", "is_correct": False}]
+
+    def test_export_sessions_filtered(self, client: TestClient, export_data: dict, sample_user: User):
+        response = client.get("/api/v1/exports/sessions", params={"format": "ndjson", "status": "completed"})
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == 1
+        assert rows[0]["exam_title"] == "Geografía"
+        assert rows[0]["student_email"] == sample_user.email
+        assert rows[0]["status"] == "completed"
+        assert rows[0]["score"] == 80.0
+        assert rows[0]["start_time"]
+
+    def test_export_sessions_gzip(self, client: TestClient, export_data: dict):
+        response = client.get("/api/v1/exports/sessions", params={"compression": "gzip"})
+
+        assert response.headers["content-type"] == "application/gzip"
+        assert response.headers["content-disposition"] == 'attachment; filename="sessions.csv.gz"'
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+        assert [row["exam_title"] for row in rows] == ["Geografía", "Física"]
+        assert rows[1]["score"] == ""
+
+    def test_serializers_emit_bounded_chunks(self):
+        rows = ({"id": i, "text": "x" * 100} for i in range(5000))
+        chunks = list(ExportService.to_ndjson(rows))
+
+        assert len(chunks) > 1
+        assert all(len(chunk) < CHUNK_SIZE + 200 for chunk in chunks)
+        assert len(b"".join(chunks).splitlines()) == 5000
+
+        compressed = b"".join(ExportService.gzip(ExportService.to_csv(({"id": i} for i in range(3)), ["id"])))
+        assert gzip.decompress(compressed).decode().splitlines() == ["id", "0", "1", "2"]
+
+
+class TestColumnarExport:
+
+    def test_missing_pyarrow_returns_501(self, client: TestClient, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+        response = client.get("/api/v1/exports/answers")
+
+        assert response.status_code == 501
+
+    def test_parquet_answer_matrix(self, client: TestClient, answer_data: dict):
+        pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        response = client.get("/api/v1/exports/answers", params={"exam_id": answer_data["exams"][0].id})
+
+        assert response.status_code == 200
+        assert response.headers["content-disposition"] == (
+            f'attachment; filename="answers-exam-{answer_data["exams"][0].id}.parquet"'
+        )
+        table = pq.read_table(io.BytesIO(response.content))
+        rows = table.to_pylist()
+        assert table.column_names[:3] == ["session_id", "exam_id", "student_id"]
+        assert [row["question_id"] for row in rows] == [question.id for question in answer_data["questions"][:2]]
+        assert rows[0]["selected_option_id"] == answer_data["options"]["París"]
+        assert rows[1]["selected_option_ids"] == [answer_data["options"]["Ebro"], answer_data["options"]["Sena"]]
+        assert [row["is_correct"] for row in rows] == [True, False]
+
+    def test_arrow_answer_matrix_in_batches(self, client: TestClient, answer_data: dict, monkeypatch):
+        pa = pytest.importorskip("pyarrow")
+        monkeypatch.setattr("app.core.config.settings.EXPORT_BATCH_SIZE", 1)
+
+        response = client.get("/api/v1/exports/answers", params={"format": "arrow"})
+
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.file"
+        reader = pa.ipc.open_file(pa.BufferReader(response.content))
+        assert reader.num_record_batches == 2
+        assert reader.read_all().column("points_earned").to_pylist() == [1.0, 0.0]
+
+    def test_empty_export_keeps_schema(self, client: TestClient):
+        pa = pytest.importorskip("pyarrow")
+
+        response = client.get("/api/v1/exports/answers", params={"format": "arrow"})
+
+        table = pa.ipc.open_file(pa.BufferReader(response.content)).read_all()
+        assert table.num_rows == 0
+        assert "answered_at" in table.column_names
@@ -0,0 +1,174 @@
+"""
+Tests para la detección de respuestas similares entre sesiones
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.models.user import User
+from app.models.exam import Exam, ExamStatus
+from app.models.question import Question, Option
+from app.models.session import ExamSession, StudentAnswer, SessionStatus
+from app.services.scoring_service import ScoringService
+from app.services.similarity_service import SimilarityService
+from app.services.statistics_service import StatisticsService
+
+# Respuesta de cada estudiante a las 6 preguntas: índice de opción (0 es la correcta)
+RESPONSES = {
+    "ana": [0, 2, 3, 1, 2, 0],
+    "bea": [0, 2, 3, 1, 2, 1],  # Copia de ana: mismos 4 fallos
+    "carlos": [0, 0, 0, 0, 1, 0],
+    "dani": [1, 0, 2, 0, 0, 3],
+    "eva": [0, 0, 0, 0, 0, 0],
+}
+
+
+@pytest.fixture(name="answered_exam")
+def answered_exam_fixture(session: Session, sample_user: User):
+    """Examen de 6 preguntas con 4 opciones y una sesión corregida por estudiante"""
+    exam = Exam(title="Integridad", subject="Historia", creator_id=sample_user.id, status=ExamStatus.PUBLISHED)
+    students = {
+        name: User(email=f"{name}@example.com", username=name, full_name=name.title(), hashed_password="hashed_password_123")
+        for name in RESPONSES
+    }
+    session.add_all([exam, *students.values()])
+    session.commit()
+
+    questions = [Question(exam_id=exam.id, text=f"Pregunta {index}", order_index=index) for index in range(6)]
+    session.add_all(questions)
+    session.commit()
+    options = [
+        [Option(question_id=question.id, text=f"Opción {index}", is_correct=index == 0) for index in range(4)]
+        for question in questions
+    ]
+    session.add_all([option for question_options in options for option in question_options])
+    session.commit()
+
+    sessions = {}
+    for name, choices in RESPONSES.items():
+        exam_session = ExamSession(
+            exam_id=exam.id, student_id=students[name].id, status=SessionStatus.COMPLETED,
+            score=100.0 * choices.count(0) / len(choices)
+        )
+        session.add(exam_session)
+        session.commit()
+        session.add_all([
+            StudentAnswer(
+                session_id=exam_session.id, question_id=question.id,
+                selected_option_id=question_options[choice].id, is_correct=choice == 0
+            )
+            for question, question_options, choice in zip(questions, options, choices)
+        ])
+        StatisticsService.record_completion(exam_session, session)
+        session.commit()
+        sessions[name] = exam_session
+    return {"exam": exam, "students": students, "sessions": sessions}
+
+
+class TestSimilarityReport:
+
+    def test_copied_wrong_answers_ranked_first(self, client: TestClient, answered_exam: dict):
+        exam_id = answered_exam["exam"].id
+        assert client.get(f"/api/v1/exams/{exam_id}/similarity").status_code == 404
+
+        response = client.post(f"/api/v1/exams/{exam_id}/similarity")
+
+        assert response.status_code == 200
+        report = response.json()
+        assert report["sessions_analyzed"] == 5
+        assert len(report["pairs"]) == 1
+        pair = report["pairs"][0]
+        sessions = answered_exam["sessions"]
+        assert (pair["session_a"], pair["session_b"]) == (sessions["ana"].id, sessions["bea"].id)
+        assert (pair["shared_wrong"], pair["shared_correct"]) == (4, 1)
+        assert pair["similarity"] > 0.5
+        assert client.get(f"/api/v1/exams/{exam_id}/similarity").json() == report
+
+    def test_shared_correct_answers_are_not_suspicious(self, answered_exam: dict, session: Session):
+        # carlos y eva solo comparten aciertos: nunca superan el mínimo de fallos comunes
+        report = SimilarityService.generate_report(answered_exam["exam"].id, session)
+        students = {(pair["student_a"], pair["student_b"]) for pair in report.pairs}
+        carlos, eva = answered_exam["students"]["carlos"].id, answered_exam["students"]["eva"].id
+        assert (carlos, eva) not in students
+
+    def test_pending_job_only_regenerates_changed_exams(self, answered_exam: dict, session: Session):
+        assert SimilarityService.generate_pending_job(lambda: Session(session.get_bind())) == 1
+        assert SimilarityService.generate_pending_job(lambda: Session(session.get_bind())) == 0
+
+        # Un intento iniciado cambia las estadísticas pero no las sesiones analizadas
+        StatisticsService.record_attempt(answered_exam["exam"].id, session)
+        session.commit()
+        assert SimilarityService.pending_exam_ids(session) == []
+
+        # Nueva sesión finalizada: el informe queda obsoleto
+        exam_session = ExamSession(
+            exam_id=answered_exam["exam"].id, student_id=answered_exam["students"]["eva"].id,
+            status=SessionStatus.COMPLETED, score=50.0, attempt_number=2
+        )
+        session.add(exam_session)
+        StatisticsService.record_completion(exam_session, session)
+        session.commit()
+        assert SimilarityService.pending_exam_ids(session) == [answered_exam["exam"].id]
+
+    def test_regrade_makes_report_pending(self, answered_exam: dict, session: Session):
+        exam_id = answered_exam["exam"].id
+        assert SimilarityService.generate_pending_job(lambda: Session(session.get_bind())) == 1
+
+        # La recorrección puede cambiar is_correct sin finalizar sesiones nuevas
+        ScoringService.regrade_exam(exam_id, session)
+        assert SimilarityService.pending_exam_ids(session) == [exam_id]
+        assert SimilarityService.generate_pending_job(lambda: Session(session.get_bind())) == 1
+        assert SimilarityService.pending_exam_ids(session) == []
+
+    def test_pending_job_continues_after_failure(self, answered_exam: dict, session: Session, monkeypatch):
+        exam_id = answered_exam["exam"].id
+        generate_report = SimilarityService.generate_report
+        calls = []
+
+        def flaky_report(pending_exam_id, db):
+            calls.append(pending_exam_id)
+            if len(calls) == 1:
+                raise RuntimeError("analysis failed")
+            return generate_report(pending_exam_id, db)
+
+        monkeypatch.setattr(SimilarityService, "pending_exam_ids", staticmethod(lambda db: [exam_id, exam_id]))
+        monkeypatch.setattr(SimilarityService, "generate_report", staticmethod(flaky_report))
+
+        assert SimilarityService.generate_pending_job(lambda: Session(session.get_bind())) == 1
+        assert calls == [exam_id, exam_id]
+
+    def test_unknown_exam(self, client: TestClient):
+        assert client.post("/api/v1/exams/9999/similarity").status_code == 404
+
+
+class TestMinHashLSH:
+
+    def test_lsh_finds_similar_sets_without_all_pairs(self):
+        rng = np.random.default_rng(5)
+        sets = [np.unique(rng.choice(100000, size=30, replace=False)) for _ in range(500)]
+        # Dos conjuntos casi iguales (Jaccard 28/32) entre 500 aleatorios
+        sets.append(np.unique(np.concatenate([sets[42][:28], [200001, 200002]])))
+
+        signatures = SimilarityService.minhash_signatures(sets, 128)
+        candidates = SimilarityService.lsh_candidates(signatures, bands=32, rows=4)
+
+        assert (42, 500) in candidates
+        assert len(candidates) < 50
+
+    def test_chunked_signatures_match_single_pass(self):
+        rng = np.random.default_rng(11)
+        sets = [np.unique(rng.choice(5000, size=rng.integers(1, 40), replace=False)) for _ in range(250)]
+
+        single = SimilarityService.minhash_signatures(sets, 64, chunk_size=len(sets))
+        chunked = SimilarityService.minhash_signatures(sets, 64, chunk_size=7)
+
+        np.testing.assert_array_equal(chunked, single)
+
+    def test_minhash_estimates_jaccard(self):
+        left = np.arange(0, 1000)
+        right = np.arange(500, 1500)
+        signatures = SimilarityService.minhash_signatures([left, right], 512)
+
+        estimate = (signatures[0] == signatures[1]).mean()
+        assert estimate == pytest.approx(1 / 3, abs=0.06)
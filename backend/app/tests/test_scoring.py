@@ -0,0 +1,798 @@
+"""
+Tests para el motor de corrección vectorizado
+"""
+
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models.user import User
+from app.models.exam import Exam, ExamStatus
+from app.models.question import Question, Option, QuestionType
+from app.models.session import BufferedAnswer, ExamSession, StudentAnswer, StudentAnswerCreate, SessionStatus
+from app.services.scoring_service import ScoringService
+from app.services.session_service import SessionService
+from app.services.answer_buffer import AnswerBuffer, ANSWERS_KEY, DIRTY_SESSIONS_KEY
+from app.services.exam_service import ExamService
+from app.services.item_analysis_service import ItemAnalysisService
+from app.services.snapshot_service import SnapshotService
+
+
+@pytest.fixture(name="graded_exam")
+def graded_exam_fixture(session: Session, sample_user: User):
+    """
+    Examen publicado con una pregunta de cada tipo
+    - Opción única (2 puntos)
+    - Verdadero/falso (1 punto)
+    - Opción múltiple con 2 correctas de 4 (3 puntos)
+    """
+    exam = Exam(
+        title="Graded Exam",
+        subject="Science",
+        creator_id=sample_user.id,
+        status=ExamStatus.PUBLISHED,
+        max_attempts=5
+    )
+    session.add(exam)
+    session.commit()
+    session.refresh(exam)
+
+    single = Question(exam_id=exam.id, text="Capital of France?", question_type=QuestionType.SINGLE_CHOICE, points=2.0)
+    true_false = Question(exam_id=exam.id, text="Water boils at 100C", question_type=QuestionType.TRUE_FALSE, points=1.0)
+    multiple = Question(exam_id=exam.id, text="Prime numbers?", question_type=QuestionType.MULTIPLE_CHOICE, points=3.0)
+    session.add_all([single, true_false, multiple])
+    session.commit()
+
+    options = {
+        "paris": Option(question_id=single.id, text="Paris", is_correct=True),
+        "rome": Option(question_id=single.id, text="Rome", is_correct=False),
+        "true": Option(question_id=true_false.id, text="True", is_correct=True),
+        "false": Option(question_id=true_false.id, text="False", is_correct=False),
+        "two": Option(question_id=multiple.id, text="2", is_correct=True),
+        "three": Option(question_id=multiple.id, text="3", is_correct=True),
+        "four": Option(question_id=multiple.id, text="4", is_correct=False),
+        "six": Option(question_id=multiple.id, text="6", is_correct=False),
+    }
+    session.add_all(options.values())
+    session.commit()
+    for option in options.values():
+        session.refresh(option)
+
+    return {
+        "exam": exam,
+        "single": single,
+        "true_false": true_false,
+        "multiple": multiple,
+        "options": {name: option.id for name, option in options.items()},
+    }
+
+
+def _add_answers(session: Session, exam_session: ExamSession, answers: list) -> None:
+    """Inserta respuestas (question_id, option_id o lista de opciones) en orden"""
+    for question_id, selection in answers:
+        session.add(StudentAnswer(
+            session_id=exam_session.id,
+            question_id=question_id,
+            selected_option_id=None if isinstance(selection, list) else selection,
+            selected_option_ids=selection if isinstance(selection, list) else None
+        ))
+    session.commit()
+
+
+def _post_answers(client: TestClient, session_id: int, answers: list) -> None:
+    """Envía respuestas (question_id, option_id o lista de opciones) a través de la API"""
+    for question_id, selection in answers:
+        key = "selected_option_ids" if isinstance(selection, list) else "selected_option_id"
+        response = client.post(f"/api/v1/sessions/{session_id}/answers", json={
+            "question_id": question_id,
+            key: selection
+        })
+        assert response.status_code == 201
+
+
+class TestScoringService:
+    """Tests para ScoringService"""
+
+    def test_build_answer_key(self, session: Session, graded_exam: dict):
+        """Test clave de respuestas como arrays"""
+        key = ScoringService.build_answer_key(graded_exam["exam"].id, session)
+
+        assert len(key.question_ids) == 3
+        assert key.total_points == 6.0
+        assert list(key.correct_counts) == [1, 1, 2]
+        assert list(key.is_multiple) == [False, False, True]
+        assert np.all(np.diff(key.option_ids) > 0)
+
+    def test_score_all_correct(self, session: Session, sample_user: User, graded_exam: dict):
+        """Test puntuación máxima"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _add_answers(session, exam_session, [
+            (graded_exam["single"].id, options["paris"]),
+            (graded_exam["true_false"].id, options["true"]),
+            (graded_exam["multiple"].id, [options["two"], options["three"]]),
+        ])
+
+        ScoringService.score_session(exam_session, session)
+
+        assert exam_session.earned_points == 6.0
+        assert exam_session.total_points == 6.0
+        assert exam_session.score == 100.0
+
+    def test_multiple_choice_partial_credit(self, session: Session, sample_user: User, graded_exam: dict):
+        """Test crédito parcial: un acierto suma la mitad; un acierto y un fallo anulan"""
+        options = graded_exam["options"]
+        for selection, expected in (
+            ([options["two"]], 1.5),
+            ([options["two"], options["four"]], 0.0),
+            ([options["two"], options["three"], options["six"]], 1.5),
+        ):
+            key = ScoringService.build_answer_key(graded_exam["exam"].id, session)
+            result = ScoringService.grade_answers(
+                key, np.zeros(1, dtype=np.int64), [(graded_exam["multiple"].id, None, selection)], n_groups=1
+            )
+            assert result.earned_points[0] == expected
+            assert result.answer_points[0] == expected
+            assert bool(result.answer_is_correct[0]) is False
+
+    def test_last_single_choice_selection_wins(self, session: Session, graded_exam: dict):
+        """Test que en opción única solo cuenta la última selección"""
+        options = graded_exam["options"]
+        key = ScoringService.build_answer_key(graded_exam["exam"].id, session)
+        result = ScoringService.grade(
+            key,
+            np.zeros(2, dtype=np.int64),
+            np.full(2, graded_exam["single"].id),
+            np.asarray([options["paris"], options["rome"]]),
+            n_groups=1,
+        )
+
+        assert result.earned_points[0] == 0.0
+        assert list(result.answer_is_correct) == [True, False]
+        assert list(result.answer_points) == [0.0, 0.0]
+
+    def test_option_from_other_question_is_wrong(self, session: Session, sample_user: User, graded_exam: dict):
+        """Test que una opción de otra pregunta no puntúa"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _add_answers(session, exam_session, [
+            (graded_exam["single"].id, options["true"]),
+        ])
+
+        ScoringService.score_session(exam_session, session)
+        assert exam_session.earned_points == 0.0
+
+    def test_finish_endpoint_returns_score(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test que finalizar la sesión calcula la puntuación real"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _post_answers(client, exam_session.id, [
+            (graded_exam["single"].id, options["paris"]),
+            (graded_exam["true_false"].id, options["false"]),
+        ])
+
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/finish")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == SessionStatus.COMPLETED
+        assert data["earned_points"] == 2.0
+        assert data["total_points"] == 6.0
+        assert data["score"] == pytest.approx(33.33)
+
+    def test_grade_many_sessions_vectorized(self, session: Session, graded_exam: dict):
+        """Test corrección de varias sesiones en una sola llamada"""
+        key = ScoringService.build_answer_key(graded_exam["exam"].id, session)
+        options = graded_exam["options"]
+        n_groups = 100
+        groups = np.repeat(np.arange(n_groups), 2)
+        question_ids = np.tile([graded_exam["single"].id, graded_exam["true_false"].id], n_groups)
+        option_ids = np.tile([options["paris"], options["false"]], n_groups)
+
+        result = ScoringService.grade(key, groups, question_ids, option_ids, n_groups)
+
+        assert result.earned_points.shape == (n_groups,)
+        assert np.all(result.earned_points == 2.0)
+        assert result.answer_is_correct.sum() == n_groups
+
+
+class TestRegradeExam:
+    """Tests para la recorrección masiva de un examen"""
+
+    def test_regrade_after_answer_key_fix(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test que corregir la clave y recorregir actualiza respuestas, sesiones y estadísticas"""
+        options = graded_exam["options"]
+        finished = []
+        for option_name in ("paris", "rome"):
+            exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+            _post_answers(client, exam_session.id, [(graded_exam["single"].id, options[option_name])])
+            finished.append(SessionService.finish_exam_session(exam_session.id, session))
+        assert [s.earned_points for s in finished] == [2.0, 0.0]
+
+        # El profesor corrige la clave: la respuesta buena era "Rome"
+        paris = session.get(Option, options["paris"])
+        rome = session.get(Option, options["rome"])
+        paris.is_correct = False
+        rome.is_correct = True
+        session.add_all([paris, rome])
+        session.commit()
+
+        response = client.post(f"/api/v1/exams/{graded_exam['exam'].id}/regrade")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["sessions_regraded"] == 2
+        assert data["answers_regraded"] == 2
+
+        session.expire_all()
+        assert [session.get(ExamSession, s.id).earned_points for s in finished] == [0.0, 2.0]
+        answers = session.exec(
+            select(StudentAnswer).where(StudentAnswer.question_id == graded_exam["single"].id).order_by(StudentAnswer.id)
+        ).all()
+        assert [answer.is_correct for answer in answers] == [False, True]
+
+        stats = client.get(f"/api/v1/exams/{graded_exam['exam'].id}/statistics").json()
+        assert stats["sessions_completed"] == 2
+        assert stats["average_score"] == pytest.approx(16.665, abs=0.01)
+
+    def test_regrade_skips_sessions_in_progress(self, session: Session, sample_user: User, graded_exam: dict):
+        """Test que solo se recorrigen sesiones finalizadas"""
+        SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+
+        result = ScoringService.regrade_exam(graded_exam["exam"].id, session, batch_size=1)
+        assert result["sessions_regraded"] == 0
+        assert result["sessions_pending_rescore"] == 1
+
+    def test_regrade_marks_sessions_in_progress(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test que una sesión en curso se corrige completa al finalizar tras recorregir"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _post_answers(client, exam_session.id, [(graded_exam["single"].id, options["paris"])])
+
+        paris = session.get(Option, options["paris"])
+        paris.is_correct = False
+        session.add(paris)
+        session.commit()
+        ScoringService.regrade_exam(graded_exam["exam"].id, session)
+
+        session.refresh(exam_session)
+        assert exam_session.answer_key_hash is None
+        finished = SessionService.finish_exam_session(exam_session.id, session)
+        assert finished.earned_points == 0.0
+        assert finished.score == 0.0
+
+    def test_regrade_exam_not_found(self, client: TestClient):
+        """Test recorregir examen inexistente"""
+        response = client.post("/api/v1/exams/9999/regrade")
+        assert response.status_code == 404
+
+
+class TestRunningScore:
+    """Tests para el acumulado de puntuación al responder"""
+
+    def test_running_score_on_create_update_delete(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test que crear, cambiar y borrar respuestas mantiene earned_points"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        assert exam_session.earned_points == 0.0
+        assert exam_session.total_points == 6.0
+
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/answers", json={
+            "question_id": graded_exam["single"].id,
+            "selected_option_id": options["paris"]
+        })
+        assert response.status_code == 201
+        answer = response.json()
+        assert answer["is_correct"] is True
+        assert answer["points_earned"] == 2.0
+        assert client.get(f"/api/v1/sessions/{exam_session.id}").json()["earned_points"] == 2.0
+
+        _post_answers(client, exam_session.id, [
+            (graded_exam["multiple"].id, [options["two"], options["three"]]),
+        ])
+        assert client.get(f"/api/v1/sessions/{exam_session.id}").json()["earned_points"] == 5.0
+
+        response = client.put(f"/api/v1/sessions/{exam_session.id}/answers/{answer['id']}", json={
+            "selected_option_id": options["rome"]
+        })
+        assert response.status_code == 200
+        assert response.json()["is_correct"] is False
+        assert client.get(f"/api/v1/sessions/{exam_session.id}").json()["earned_points"] == 3.0
+
+        _post_answers(client, exam_session.id, [
+            (graded_exam["multiple"].id, [options["two"]]),
+        ])
+        assert client.get(f"/api/v1/sessions/{exam_session.id}").json()["earned_points"] == 1.5
+
+        response = client.delete(f"/api/v1/sessions/{exam_session.id}/answers/{answer['id']}")
+        assert response.status_code == 204
+        assert client.get(f"/api/v1/sessions/{exam_session.id}").json()["earned_points"] == 1.5
+
+        data = client.post(f"/api/v1/sessions/{exam_session.id}/finish").json()
+        assert data["earned_points"] == 1.5
+        assert data["score"] == 25.0
+
+    def test_running_score_concurrent_writers(self, session: Session, sample_user: User, graded_exam: dict):
+        """Test que dos escrituras con la sesión leída a la vez suman ambos deltas"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+
+        with Session(session.get_bind()) as first, Session(session.get_bind()) as second:
+            first_view = first.get(ExamSession, exam_session.id)
+            second_view = second.get(ExamSession, exam_session.id)
+            assert first_view.earned_points == second_view.earned_points == 0.0
+
+            SessionService.upsert_answers(first_view, [StudentAnswerCreate(
+                question_id=graded_exam["single"].id, selected_option_id=options["paris"]
+            )], first)
+            SessionService.upsert_answers(second_view, [StudentAnswerCreate(
+                question_id=graded_exam["true_false"].id, selected_option_id=options["true"]
+            )], second)
+
+        session.refresh(exam_session)
+        assert exam_session.earned_points == 3.0
+
+    def test_key_change_during_exam_rescores_on_finish(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test si la clave cambia durante el examen el sellado no mezcla puntos de dos claves"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _post_answers(client, exam_session.id, [(graded_exam["single"].id, options["paris"])])
+
+        # Paris deja de ser correcta después de puntuarla con la clave anterior
+        response = client.put(f"/api/v1/questions/options/{options['paris']}", json={"is_correct": False})
+        assert response.status_code == 200
+        _post_answers(client, exam_session.id, [(graded_exam["true_false"].id, options["true"])])
+        session.refresh(exam_session)
+        assert exam_session.answer_key_hash is None
+
+        finished = client.post(f"/api/v1/sessions/{exam_session.id}/finish").json()
+
+        assert finished["earned_points"] == 1.0
+        assert finished["score"] == 16.67
+
+    def test_answer_key_cache_invalidated_on_option_change(self, session: Session, graded_exam: dict, client: TestClient):
+        """Test que modificar una opción invalida la clave cacheada"""
+        exam_id = graded_exam["exam"].id
+        key = ScoringService.get_answer_key(exam_id, session)
+        assert ScoringService.get_answer_key(exam_id, session) is key
+
+        response = client.put(f"/api/v1/questions/options/{graded_exam['options']['six']}", json={"is_correct": True})
+        assert response.status_code == 200
+
+        new_key = ScoringService.get_answer_key(exam_id, session)
+        assert new_key is not key
+        assert list(new_key.correct_counts) == [1, 1, 3]
+
+
+class TestAnswerBuffer:
+    """Tests para el buffer de respuestas en Redis (modo buffered)"""
+
+    @pytest.fixture(autouse=True)
+    def buffered_mode(self, monkeypatch, redis):
+        monkeypatch.setattr(settings, "ANSWER_INGEST_MODE", "buffered")
+
+    def _autosave(self, client: TestClient, session_id: int, answers: list):
+        payload = [
+            {"question_id": question_id, "selected_option_ids" if isinstance(selection, list) else "selected_option_id": selection}
+            for question_id, selection in answers
+        ]
+        return client.put(f"/api/v1/sessions/{session_id}/answers/autosave", json=payload)
+
+    def test_autosave_is_buffered(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, redis):
+        """Test el autoguardado no escribe en la base de datos"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+
+        response = self._autosave(client, exam_session.id, [
+            (graded_exam["single"].id, options["rome"]),
+            (graded_exam["single"].id, options["paris"]),
+            (graded_exam["multiple"].id, [options["two"]]),
+        ])
+
+        assert response.status_code == 202
+        assert response.json() == {"session_id": exam_session.id, "buffered": True, "answers_count": 2}
+        assert session.exec(select(StudentAnswer)).all() == []
+        assert redis.sismember(DIRTY_SESSIONS_KEY, exam_session.id)
+
+    def test_flush_pending_writes_answers(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, redis):
+        """Test el volcado en segundo plano aplica el upsert y la puntuación"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        self._autosave(client, exam_session.id, [(graded_exam["single"].id, options["rome"])])
+        self._autosave(client, exam_session.id, [
+            (graded_exam["single"].id, options["paris"]),
+            (graded_exam["true_false"].id, options["true"]),
+        ])
+
+        flushed = SessionService.flush_pending_answers(lambda: Session(session.get_bind()))
+
+        assert flushed == 2
+        answers = session.exec(select(StudentAnswer)).all()
+        assert {answer.question_id: answer.selected_option_id for answer in answers} == {
+            graded_exam["single"].id: options["paris"],
+            graded_exam["true_false"].id: options["true"],
+        }
+        session.refresh(exam_session)
+        assert exam_session.earned_points == 3.0
+        assert redis.scard(DIRTY_SESSIONS_KEY) == 0
+
+    def test_flush_does_not_overwrite_newer_answer(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test una respuesta guardada directamente después del autoguardado prevalece al volcar"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        self._autosave(client, exam_session.id, [
+            (graded_exam["single"].id, options["rome"]),
+            (graded_exam["true_false"].id, options["true"]),
+        ])
+        _post_answers(client, exam_session.id, [(graded_exam["single"].id, options["paris"])])
+
+        SessionService.flush_pending_answers(lambda: Session(session.get_bind()))
+
+        answers = session.exec(select(StudentAnswer)).all()
+        assert {answer.question_id: answer.selected_option_id for answer in answers} == {
+            graded_exam["single"].id: options["paris"],
+            graded_exam["true_false"].id: options["true"],
+        }
+        session.refresh(exam_session)
+        assert exam_session.earned_points == 3.0
+
+    def test_flush_does_not_overwrite_updated_answer(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test un autoguardado anterior a un PUT de la respuesta no la pisa al volcar"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        _post_answers(client, exam_session.id, [(graded_exam["single"].id, options["rome"])])
+        self._autosave(client, exam_session.id, [(graded_exam["single"].id, options["rome"])])
+        answer = session.exec(select(StudentAnswer)).one()
+
+        response = client.put(
+            f"/api/v1/sessions/{exam_session.id}/answers/{answer.id}", json={"selected_option_id": options["paris"]}
+        )
+        assert response.status_code == 200
+        SessionService.flush_pending_answers(lambda: Session(session.get_bind()))
+
+        session.refresh(answer)
+        assert answer.selected_option_id == options["paris"]
+        session.refresh(exam_session)
+        assert exam_session.earned_points == 2.0
+
+    def test_finish_forces_flush(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test finalizar la sesión vuelca el buffer antes de puntuar"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        self._autosave(client, exam_session.id, [
+            (graded_exam["single"].id, options["paris"]),
+            (graded_exam["true_false"].id, options["true"]),
+            (graded_exam["multiple"].id, [options["two"], options["three"]]),
+        ])
+
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/finish")
+
+        assert response.status_code == 200
+        assert response.json()["score"] == 100.0
+        assert AnswerBuffer.drain(exam_session.id) == []
+
+    def test_autosave_drops_unknown_ids(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test los ids que no son del examen no llegan al buffer"""
+        options = graded_exam["options"]
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+
+        response = self._autosave(client, exam_session.id, [
+            (graded_exam["single"].id, options["paris"]),
+            (9999, options["paris"]),
+            (graded_exam["true_false"].id, options["paris"]),  # Opción de otra pregunta
+            (graded_exam["multiple"].id, [options["two"], 9999]),
+        ])
+
+        assert response.json()["answers_count"] == 1
+        assert [answer.question_id for answer in AnswerBuffer.drain(exam_session.id)] == [graded_exam["single"].id]
+
+    def test_restore_keeps_buffer_ttl(self, session: Session, sample_user: User, graded_exam: dict, redis):
+        """Test las respuestas devueltas al buffer siguen caducando"""
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        answers = [BufferedAnswer(question_id=graded_exam["single"].id, selected_option_id=graded_exam["options"]["paris"])]
+
+        AnswerBuffer.restore(exam_session.id, answers)
+
+        assert redis.ttl(ANSWERS_KEY.format(session_id=exam_session.id)) > 0
+
+    def test_expiry_sweep_skips_session_that_fails_to_flush(self, session: Session, sample_user: User, graded_exam: dict, monkeypatch):
+        """Test un volcado fallido no impide expirar las demás sesiones"""
+        other = User(email="other@example.com", username="other", full_name="Other", hashed_password="hashed_password_123")
+        session.add(other)
+        session.commit()
+        deadline = datetime.utcnow() - timedelta(minutes=1)
+        broken, healthy = [
+            ExamSession(exam_id=graded_exam["exam"].id, student_id=user_id, status=SessionStatus.IN_PROGRESS,
+                        end_time=deadline, earned_points=0.0, total_points=6.0)
+            for user_id in (sample_user.id, other.id)
+        ]
+        session.add_all([broken, healthy])
+        session.commit()
+        for exam_session in (broken, healthy):
+            AnswerBuffer.buffer_answers(exam_session.id, [
+                StudentAnswerCreate(question_id=graded_exam["single"].id, selected_option_id=graded_exam["options"]["paris"])
+            ])
+
+        upsert_answers = SessionService.upsert_answers
+
+        def failing_upsert(exam_session, answers, db):
+            if exam_session.id == broken.id:
+                raise RuntimeError("database unavailable")
+            return upsert_answers(exam_session, answers, db)
+
+        monkeypatch.setattr(SessionService, "upsert_answers", staticmethod(failing_upsert))
+
+        assert SessionService.expire_overdue_sessions(session) == 1
+        session.refresh(broken)
+        session.refresh(healthy)
+        assert broken.status == SessionStatus.IN_PROGRESS
+        assert healthy.status == SessionStatus.EXPIRED
+        assert healthy.score == pytest.approx(33.33)
+        assert len(AnswerBuffer.drain(broken.id)) == 1
+
+    def test_flush_skips_closed_session(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, redis):
+        """Test el volcado no escribe respuestas ni puntos en una sesión ya cerrada"""
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        self._autosave(client, exam_session.id, [(graded_exam["single"].id, graded_exam["options"]["paris"])])
+        exam_session.status = SessionStatus.COMPLETED
+        session.add(exam_session)
+        session.commit()
+
+        assert SessionService.flush_pending_answers(lambda: Session(session.get_bind())) == 0
+
+        assert session.exec(select(StudentAnswer)).all() == []
+        session.refresh(exam_session)
+        assert exam_session.earned_points == 0.0
+        assert AnswerBuffer.drain(exam_session.id) == []
+
+    def test_unprocessed_sessions_stay_pending(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, redis):
+        """Test las sesiones extraídas que no llegan a volcarse vuelven a quedar pendientes"""
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        self._autosave(client, exam_session.id, [(graded_exam["single"].id, graded_exam["options"]["paris"])])
+
+        def unavailable():
+            raise RuntimeError("database unavailable")
+
+        with pytest.raises(RuntimeError):
+            SessionService.flush_pending_answers(unavailable)
+
+        assert redis.sismember(DIRTY_SESSIONS_KEY, exam_session.id)
+        assert SessionService.flush_pending_answers(lambda: Session(session.get_bind())) == 1
+
+    def test_direct_mode_without_redis(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, monkeypatch):
+        """Test sin modo buffered el autoguardado escribe directamente"""
+        monkeypatch.setattr(settings, "ANSWER_INGEST_MODE", "direct")
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+
+        response = self._autosave(client, exam_session.id, [(graded_exam["single"].id, graded_exam["options"]["paris"])])
+
+        assert response.status_code == 202
+        assert response.json()["buffered"] is False
+        assert len(session.exec(select(StudentAnswer)).all()) == 1
+
+
+class TestExamSnapshot:
+    """Tests para la caché de snapshots de exámenes"""
+
+    def _forbid_db_build(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("snapshot rebuilt from the database")
+        monkeypatch.setattr(SnapshotService, "build_snapshot", staticmethod(fail))
+
+    def test_publish_prewarms_snapshot(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient, monkeypatch):
+        """Test tras publicar, la vista del alumno y la corrección no reconstruyen el examen"""
+        exam = graded_exam["exam"]
+        exam.status = ExamStatus.DRAFT
+        session.add(exam)
+        session.commit()
+
+        response = client.post(f"/api/v1/exams/{exam.id}/publish")
+        assert response.status_code == 200
+        self._forbid_db_build(monkeypatch)
+
+        response = client.get(f"/api/v1/exams/{exam.id}/snapshot")
+        assert response.status_code == 200
+        data = response.json()
+        assert [question["id"] for question in data["questions"]] == [
+            graded_exam["single"].id, graded_exam["true_false"].id, graded_exam["multiple"].id
+        ]
+        assert all("is_correct" not in option for question in data["questions"] for option in question["options"])
+        assert ScoringService.get_answer_key(exam.id, session).total_points == 6.0
+
+    def test_option_change_creates_new_version(self, session: Session, graded_exam: dict, client: TestClient):
+        """Test modificar una opción invalida el snapshot y su hash de clave"""
+        exam_id = graded_exam["exam"].id
+        before = SnapshotService.get_snapshot(exam_id, session)
+
+        client.put(f"/api/v1/questions/options/{graded_exam['options']['rome']}", json={"is_correct": True})
+        after = SnapshotService.get_snapshot(exam_id, session)
+
+        assert after.version == before.version + 1
+        assert after.answer_key_hash != before.answer_key_hash
+
+    def test_local_snapshot_revalidated_without_redis(self, session: Session, graded_exam: dict, monkeypatch):
+        """Test sin Redis un cambio hecho en otro worker se ve al caducar el TTL local"""
+        exam_id = graded_exam["exam"].id
+        before = SnapshotService.get_snapshot(exam_id, session)
+        key = ScoringService.get_answer_key(exam_id, session)
+
+        # Escritura de otro worker: no pasa por la versión local de este
+        option = session.get(Option, graded_exam["options"]["rome"])
+        option.is_correct = True
+        session.add(option)
+        session.commit()
+        assert SnapshotService.get_snapshot(exam_id, session) is before
+
+        monkeypatch.setattr(settings, "EXAM_SNAPSHOT_LOCAL_TTL_SECONDS", 0.0)
+        after = SnapshotService.get_snapshot(exam_id, session)
+        assert after.version == before.version + 1
+        assert after.answer_key_hash != before.answer_key_hash
+        assert ScoringService.get_answer_key(exam_id, session) is not key
+        # Sin cambios la versión se mantiene
+        assert SnapshotService.get_snapshot(exam_id, session).version == after.version
+
+    def test_snapshot_shared_through_redis(self, session: Session, graded_exam: dict, monkeypatch, redis):
+        """Test otro worker (LRU vacía) lee el snapshot de Redis"""
+        exam_id = graded_exam["exam"].id
+        snapshot = SnapshotService.warm(exam_id, session)
+        SnapshotService.clear_local_cache()
+        self._forbid_db_build(monkeypatch)
+
+        cached = SnapshotService.get_snapshot(exam_id, session)
+
+        assert cached == snapshot
+        assert redis.get(f"exam-scan:exam-version:{exam_id}") == str(snapshot.version)
+
+    def test_snapshot_not_published(self, session: Session, graded_exam: dict, client: TestClient):
+        exam = graded_exam["exam"]
+        ExamService.archive_exam(exam.id, session)
+        assert client.get(f"/api/v1/exams/{exam.id}/snapshot").status_code == 400
+        assert client.get("/api/v1/exams/9999/snapshot").status_code == 404
+
+
+class TestSeededShuffle:
+    """Tests para el orden aleatorio reproducible por sesión"""
+
+    def test_permute_is_reproducible(self):
+        items = list(range(50))
+        first = SnapshotService.permute(items, 1234)
+        assert first == SnapshotService.permute(items, 1234)
+        assert sorted(first) == items
+        assert first != items
+        assert first != SnapshotService.permute(items, 4321)
+
+    def test_session_exam_shuffled_by_seed(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test el examen de la sesión se sirve permutado y siempre igual"""
+        exam = graded_exam["exam"]
+        exam.randomize_questions = True
+        exam.randomize_options = True
+        session.add(exam)
+        session.commit()
+        exam_session = SessionService.start_exam_session(sample_user.id, exam.id, session)
+        assert exam_session.shuffle_seed is not None
+
+        first = client.get(f"/api/v1/sessions/{exam_session.id}/exam").json()
+        second = client.get(f"/api/v1/sessions/{exam_session.id}/exam").json()
+
+        assert first == second
+        snapshot = SnapshotService.get_snapshot(exam.id, session)
+        expected = [q.id for q in SnapshotService.permute(snapshot.questions, exam_session.shuffle_seed)]
+        assert [q["id"] for q in first["questions"]] == expected
+        questions = {q["id"]: q for q in first["questions"]}
+        # Verdadero/falso no se baraja
+        assert [o["id"] for o in questions[graded_exam["true_false"].id]["options"]] == [
+            graded_exam["options"]["true"], graded_exam["options"]["false"]
+        ]
+        assert sorted(o["id"] for o in questions[graded_exam["multiple"].id]["options"]) == sorted(
+            graded_exam["options"][name] for name in ("two", "three", "four", "six")
+        )
+
+    def test_session_exam_without_randomization(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        exam_session = SessionService.start_exam_session(sample_user.id, graded_exam["exam"].id, session)
+        data = client.get(f"/api/v1/sessions/{exam_session.id}/exam").json()
+        assert [q["id"] for q in data["questions"]] == [
+            graded_exam["single"].id, graded_exam["true_false"].id, graded_exam["multiple"].id
+        ]
+        assert client.get("/api/v1/sessions/9999/exam").status_code == 404
+
+
+class TestItemAnalysis:
+    """Tests para el análisis de ítems"""
+
+    def _finish_sessions(self, session: Session, client: TestClient, user: User, graded_exam: dict, responses: list):
+        for answers in responses:
+            exam_session = SessionService.start_exam_session(user.id, graded_exam["exam"].id, session)
+            _post_answers(client, exam_session.id, answers)
+            SessionService.finish_exam_session(exam_session.id, session)
+
+    def test_item_indices(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test tasa de acierto, discriminación, biserial, distractores y alfa frente al cálculo directo"""
+        options = graded_exam["options"]
+        single, true_false, multiple = graded_exam["single"].id, graded_exam["true_false"].id, graded_exam["multiple"].id
+        self._finish_sessions(session, client, sample_user, graded_exam, [
+            [(single, options["paris"]), (true_false, options["true"]), (multiple, [options["two"], options["three"]])],
+            [(single, options["paris"]), (true_false, options["false"]), (multiple, [options["two"]])],
+            [(single, options["rome"]), (true_false, options["true"]), (multiple, [options["two"], options["four"]])],
+            [(single, options["rome"]), (multiple, [options["four"], options["six"]])],
+        ])
+
+        response = client.get(f"/api/v1/exams/{graded_exam['exam'].id}/item-analysis")
+
+        assert response.status_code == 200
+        report = response.json()
+        assert report["sessions_analyzed"] == 4
+        items = {item["question_id"]: item for item in report["items"]}
+        assert items[single]["p_value"] == 0.5
+        assert items[multiple]["p_value"] == 0.375
+        assert items[true_false]["omit_rate"] == 0.25
+        # Grupos de 1 estudiante: el mejor acierta todo y el peor nada
+        assert [items[q]["discrimination"] for q in (single, true_false, multiple)] == [1.0, 1.0, 1.0]
+
+        points = np.array([[2.0, 1.0, 3.0], [2.0, 0.0, 1.5], [0.0, 1.0, 0.0], [0.0, 0.0, 0.0]])
+        totals = points.sum(axis=1)
+        expected_rpb = np.corrcoef(points[:, 0] / 2.0, totals - points[:, 0])[0, 1]
+        assert items[single]["point_biserial"] == pytest.approx(expected_rpb, abs=1e-4)
+        expected_alpha = 3 / 2 * (1 - points.var(axis=0, ddof=1).sum() / totals.var(ddof=1))
+        assert report["cronbach_alpha"] == pytest.approx(expected_alpha, abs=1e-4)
+
+        rates = {option["option_id"]: option for item in report["items"] for option in item["options"]}
+        assert rates[options["rome"]]["selection_rate"] == 0.5
+        assert rates[options["four"]]["selection_rate"] == 0.5
+        assert rates[options["six"]]["selection_rate"] == 0.25
+        assert (rates[options["paris"]]["upper_rate"], rates[options["paris"]]["lower_rate"]) == (1.0, 0.0)
+
+    def test_report_cached_until_new_session(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test que el informe se reutiliza hasta que se corrige otra sesión o cambia el examen"""
+        options = graded_exam["options"]
+        single = graded_exam["single"].id
+        self._finish_sessions(session, client, sample_user, graded_exam, [[(single, options["paris"])]])
+        url = f"/api/v1/exams/{graded_exam['exam'].id}/item-analysis"
+
+        first = client.get(url).json()
+        assert client.get(url).json() == first
+        assert first["sessions_analyzed"] == 1
+
+        self._finish_sessions(session, client, sample_user, graded_exam, [[(single, options["rome"])]])
+        second = client.get(url).json()
+        assert second["sessions_analyzed"] == 2
+        assert second["items"][0]["p_value"] == 0.5
+
+        client.put(f"/api/v1/questions/options/{options['rome']}", json={"is_correct": True})
+        assert client.get(url).json()["version"] > second["version"]
+
+    def test_response_matrix_ignores_unknown_sessions(self, session: Session, graded_exam: dict):
+        """Test respuestas de sesiones que no están en la lista no se atribuyen a otro estudiante"""
+        options = graded_exam["options"]
+        key = ScoringService.get_answer_key(graded_exam["exam"].id, session)
+        single = graded_exam["single"].id
+        answers = [
+            (10, single, options["paris"], None, 2.0),
+            (15, single, options["paris"], None, 2.0),  # Terminó entre dos lecturas
+            (30, single, options["rome"], None, 0.0),   # Mayor que todos los ids
+        ]
+
+        matrix = ItemAnalysisService.response_matrix(key, np.asarray([10, 20], dtype=np.int64), answers)
+
+        assert matrix.item_points[:, 0].tolist() == [2.0, 0.0]
+        assert matrix.answered[:, 0].tolist() == [True, False]
+        assert matrix.selection_groups.tolist() == [0]
+
+    def test_session_without_answers_is_analyzed(self, session: Session, sample_user: User, graded_exam: dict, client: TestClient):
+        """Test una sesión corregida sin respuestas cuenta como omisión"""
+        options = graded_exam["options"]
+        self._finish_sessions(session, client, sample_user, graded_exam, [[(graded_exam["single"].id, options["paris"])], []])
+
+        report = client.get(f"/api/v1/exams/{graded_exam['exam'].id}/item-analysis").json()
+
+        assert report["sessions_analyzed"] == 2
+        items = {item["question_id"]: item for item in report["items"]}
+        assert items[graded_exam["single"].id]["omit_rate"] == 0.5
+
+    def test_item_analysis_without_sessions(self, graded_exam: dict, client: TestClient):
+        """Test examen sin sesiones corregidas e inexistente"""
+        report = client.get(f"/api/v1/exams/{graded_exam['exam'].id}/item-analysis").json()
+        assert report["sessions_analyzed"] == 0
+        assert report["cronbach_alpha"] is None
+        assert all(item["discrimination"] is None and item["p_value"] == 0.0 for item in report["items"])
+
+        assert client.get("/api/v1/exams/9999/item-analysis").status_code == 404
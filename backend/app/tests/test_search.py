@@ -0,0 +1,249 @@
+"""
+Tests para la búsqueda de texto completo
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from sqlmodel import Session, text
+from app.models.user import User
+from app.models.exam import Exam
+from app.models.question import Question
+from app.models.tag import Tag
+from app.models.search import SearchHitType, search_vector_expression
+from app.services.autocomplete_service import AutocompleteService, AutocompleteTrie, trigram_similarity
+from app.services.search_index import DocumentChange, InMemorySearchBackend, InvertedIndex, tokenize
+
+
+@pytest.fixture(name="question_bank")
+def question_bank_fixture(session: Session, sample_user: User):
+    """Dos exámenes con preguntas para buscar"""
+    algebra = Exam(
+        title="Álgebra lineal", subject="Matemáticas", creator_id=sample_user.id,
+        description="Matrices y determinantes"
+    )
+    history = Exam(
+        title="Historia moderna", subject="Historia", creator_id=sample_user.id,
+        instructions="Responde sobre matrices de datos históricos"
+    )
+    session.add_all([algebra, history])
+    session.commit()
+    session.add_all([
+        Question(exam_id=algebra.id, text="Calcula el determinante de la matriz", explanation="Usa matrices triangulares"),
+        Question(exam_id=algebra.id, text="Define espacio vectorial"),
+        Question(exam_id=history.id, text="¿En qué año comenzó la revolución francesa?"),
+    ])
+    session.commit()
+    return {"algebra": algebra, "history": history}
+
+
+class TestSearch:
+
+    def test_search_ranks_weighted_fields(self, client: TestClient, question_bank: dict):
+        response = client.get("/api/v1/search/", params={"q": "matrices"})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        # Empate entre campos de peso B (descripción y explicación): primero el examen; las instrucciones pesan C
+        assert [(hit["type"], hit["exam_id"]) for hit in results] == [
+            ("exam", question_bank["algebra"].id),
+            ("question", question_bank["algebra"].id),
+            ("exam", question_bank["history"].id),
+        ]
+        assert results[0]["rank"] >= results[1]["rank"] >= results[2]["rank"]
+
+    def test_search_requires_all_terms(self, client: TestClient, question_bank: dict):
+        results = client.get("/api/v1/search/", params={"q": "determinante matriz"}).json()["results"]
+
+        assert len(results) == 1
+        assert results[0]["type"] == "question"
+        assert results[0]["title"] == "Calcula el determinante de la matriz"
+
+    def test_search_scope_and_exam_filter(self, client: TestClient, question_bank: dict):
+        results = client.get(
+            "/api/v1/search/", params={"q": "matrices", "scope": "questions"}
+        ).json()["results"]
+        assert {hit["type"] for hit in results} == {"question"}
+
+        history_id = question_bank["history"].id
+        results = client.get("/api/v1/search/", params={"q": "revolución", "exam_id": history_id}).json()["results"]
+        assert [hit["exam_id"] for hit in results] == [history_id]
+
+    def test_search_pagination(self, client: TestClient, question_bank: dict):
+        first = client.get("/api/v1/search/", params={"q": "matrices", "limit": 2}).json()["results"]
+        second = client.get("/api/v1/search/", params={"q": "matrices", "limit": 2, "offset": 2}).json()["results"]
+
+        assert len(first) == 2
+        assert len(second) == 1
+        assert second[0] not in first
+
+    def test_search_ignores_like_wildcards(self, client: TestClient, question_bank: dict):
+        assert client.get("/api/v1/search/", params={"q": "%"}).json()["results"] == []
+        assert client.get("/api/v1/search/", params={"q": "_"}).json()["results"] == []
+
+    def test_search_vector_ddl_for_postgres(self):
+        expression = search_vector_expression("question", "english")
+
+        assert expression == (
+            "setweight(to_tsvector('english'::regconfig, coalesce(text, '')), 'A') || "
+            "setweight(to_tsvector('english'::regconfig, coalesce(explanation, '')), 'B')"
+        )
+        # El modelo no declara la columna: create_all en SQLite no la crea
+        assert "search_vector" not in str(CreateTable(Question.__table__).compile(dialect=postgresql.dialect()))
+
+
+class TestInMemorySearchIndex:
+
+    def test_index_follows_write_events(self, client: TestClient, question_bank: dict):
+        algebra_id = question_bank["algebra"].id
+        assert client.get("/api/v1/search/", params={"q": "eigenvalores"}).json()["results"] == []
+
+        # Alta, modificación y borrado después de construir el índice
+        question_id = client.post(
+            f"/api/v1/questions/?exam_id={algebra_id}", json={"text": "Calcula los eigenvalores"}
+        ).json()["id"]
+        results = client.get("/api/v1/search/", params={"q": "eigenvalores"}).json()["results"]
+        assert [hit["id"] for hit in results] == [question_id]
+
+        client.put(f"/api/v1/questions/{question_id}", json={"text": "Calcula los autovalores"})
+        assert client.get("/api/v1/search/", params={"q": "eigenvalores"}).json()["results"] == []
+        assert len(client.get("/api/v1/search/", params={"q": "autovalores"}).json()["results"]) == 1
+
+        client.delete(f"/api/v1/questions/{question_id}")
+        assert client.get("/api/v1/search/", params={"q": "autovalores"}).json()["results"] == []
+
+    def test_rolled_back_writes_not_indexed(self, client: TestClient, session: Session, question_bank: dict):
+        client.get("/api/v1/search/", params={"q": "matrices"})
+
+        session.add(Question(exam_id=question_bank["algebra"].id, text="Pregunta descartada"))
+        session.flush()
+        session.rollback()
+
+        assert client.get("/api/v1/search/", params={"q": "descartada"}).json()["results"] == []
+
+    def test_rebuild_picks_up_external_writes(self, client: TestClient, session: Session, question_bank: dict):
+        client.get("/api/v1/search/", params={"q": "matrices"})
+
+        # Escritura de otro proceso: no pasa por los eventos de esta sesión
+        session.execute(text(
+            "INSERT INTO question (exam_id, text, question_type, points, difficulty, order_index, is_active, created_at) "
+            f"VALUES ({question_bank['history'].id}, 'Tratado de Westfalia', 'MULTIPLE_CHOICE', 1.0, 'MEDIUM', 0, 1, CURRENT_TIMESTAMP)"
+        ))
+        session.commit()
+        assert client.get("/api/v1/search/", params={"q": "westfalia"}).json()["results"] == []
+
+        assert InMemorySearchBackend.rebuild_job(lambda: Session(session.get_bind())) == 6
+        assert len(client.get("/api/v1/search/", params={"q": "westfalia"}).json()["results"]) == 1
+
+    def test_accent_insensitive_tokens(self):
+        assert tokenize("¿Revolución FRANCESA?") == ["revolucion", "francesa"]
+
+    def test_bm25_prefers_rarer_terms_and_shorter_documents(self):
+        index = InvertedIndex()
+        index.add((SearchHitType.QUESTION, 1), 1, "a", [("gato perro", "A")])
+        index.add((SearchHitType.QUESTION, 2), 1, "b", [("gato perro raton elefante jirafa tigre", "A")])
+        index.add((SearchHitType.QUESTION, 3), 1, "c", [("perro", "A")])
+
+        ranked = index.search("gato perro", SearchHitType.QUESTION, limit=10)
+        assert [document.key[1] for _, document in ranked] == [1, 2]
+        assert ranked[0][0] > ranked[1][0]
+
+    def test_compaction_keeps_results(self, monkeypatch):
+        monkeypatch.setattr("app.services.search_index.COMPACT_MIN_DEAD", 2)
+        index = InvertedIndex()
+        for question_id in range(1, 6):
+            index.add((SearchHitType.QUESTION, question_id), 1, "", [(f"comun termino{question_id}", "A")])
+        # Reescribir todos deja más huecos que documentos vivos: se compacta
+        for question_id in range(1, 6):
+            index.add((SearchHitType.QUESTION, question_id), 1, "", [(f"comun editado{question_id}", "B")])
+
+        assert len(index) == 5
+        assert index._dead == 0
+        assert len(index.search("comun", SearchHitType.QUESTION, limit=10)) == 5
+        assert index.search("termino1", SearchHitType.QUESTION, limit=10) == []
+        # Tras compactar, las postings siguen aceptando altas al final
+        index.add((SearchHitType.QUESTION, 6), 1, "", [("comun", "A")])
+        assert len(index.search("comun", SearchHitType.QUESTION, limit=10)) == 6
+
+    def test_deleting_exam_drops_its_questions(self):
+        index = InvertedIndex()
+        index.add((SearchHitType.EXAM, 1), 1, "", [("algebra", "A")])
+        index.add((SearchHitType.QUESTION, 10), 1, "", [("algebra matrices", "A")])
+        index.add((SearchHitType.QUESTION, 11), 2, "", [("algebra", "A")])
+
+        index.apply(DocumentChange(key=(SearchHitType.EXAM, 1), deleted=True))
+
+        assert [document.key for _, document in index.search("algebra", SearchHitType.QUESTION, limit=10)] == [
+            (SearchHitType.QUESTION, 11)
+        ]
+
+
+@pytest.fixture(name="catalog")
+def catalog_fixture(session: Session, sample_user: User):
+    """Exámenes y etiquetas para autocompletar"""
+    session.add_all([
+        Exam(title="Álgebra lineal", subject="Matemáticas", creator_id=sample_user.id),
+        Exam(title="Álgebra lineal", subject="Matemáticas", creator_id=sample_user.id),
+        Exam(title="Álgebra básica", subject="Matemáticas", creator_id=sample_user.id),
+        Exam(title="Historia moderna", subject="Historia", creator_id=sample_user.id),
+        Tag(name="geometría"),
+        Tag(name="geografía"),
+    ])
+    session.commit()
+
+
+class TestAutocomplete:
+
+    def test_autocomplete_by_prefix_and_weight(self, client: TestClient, catalog):
+        response = client.get("/api/v1/search/autocomplete", params={"prefix": "alg"})
+
+        assert response.status_code == 200
+        suggestions = response.json()["suggestions"]
+        # Sin acentos en el prefijo; primero el título con más exámenes
+        assert [(s["value"], s["weight"]) for s in suggestions] == [("Álgebra lineal", 2), ("Álgebra básica", 1)]
+
+    def test_autocomplete_matches_inner_words(self, client: TestClient, catalog):
+        suggestions = client.get("/api/v1/search/autocomplete", params={"prefix": "line"}).json()["suggestions"]
+        assert [s["value"] for s in suggestions] == ["Álgebra lineal"]
+
+        suggestions = client.get(
+            "/api/v1/search/autocomplete", params={"prefix": "ge", "field": "tag"}
+        ).json()["suggestions"]
+        assert [s["value"] for s in suggestions] == ["geografía", "geometría"]
+
+    def test_autocomplete_served_from_trie(self, client: TestClient, session: Session, catalog):
+        client.get("/api/v1/search/autocomplete", params={"prefix": "his", "field": "subject"})
+        session.add(Exam(title="Historia antigua", subject="Historia", creator_id=1))
+        session.commit()
+
+        # Hasta la siguiente reconstrucción no hay consultas a la BD
+        suggestions = client.get(
+            "/api/v1/search/autocomplete", params={"prefix": "his", "field": "subject"}
+        ).json()["suggestions"]
+        assert suggestions[0]["weight"] == 1
+
+        AutocompleteService.rebuild_job(lambda: Session(session.get_bind()))
+        suggestions = client.get(
+            "/api/v1/search/autocomplete", params={"prefix": "his", "field": "subject"}
+        ).json()["suggestions"]
+        assert suggestions[0]["weight"] == 2
+
+    def test_trie_keeps_top_k(self):
+        trie = AutocompleteTrie({f"tema {i}": i for i in range(20)}, top_k=3)
+
+        assert [value for _, value in trie.suggest("tema", 10)] == ["tema 19", "tema 18", "tema 17"]
+        assert trie.suggest("x", 10) == []
+
+    def test_fuzzy_search_tolerates_typos(self, client: TestClient, catalog):
+        suggestions = client.get("/api/v1/search/fuzzy", params={"q": "algebra lienal"}).json()["suggestions"]
+
+        assert suggestions[0]["value"] == "Álgebra lineal"
+        assert suggestions[0]["similarity"] >= 0.3
+        assert "Historia moderna" not in [s["value"] for s in suggestions]
+
+    def test_trigram_similarity_matches_pg_trgm(self):
+        # SELECT similarity('word', 'two words') = 0.36363637
+        assert trigram_similarity("word", "two words") == pytest.approx(4 / 11)
+        assert trigram_similarity("abc", "abc") == 1.0
+        assert trigram_similarity("", "abc") == 0.0
@@ -3,12 +3,20 @@ Tests para sesiones de examen - CRUD y servicios
 """
 
 import pytest
-from sqlmodel import Session
+import random
+from datetime import datetime, timedelta
+from sqlmodel import Session, select
+from app.core.admission import AdmissionController
+from app.core.config import settings
+from app.core.idempotency import request_fingerprint, reserve_key, store_response
 from app.models.user import User
 from app.models.exam import Exam, ExamStatus
-from app.models.session import ExamSession, SessionStatus
+from app.models.session import ExamSession, StudentAnswer, SessionStatus
 from app.models.question import Question
+from app.core.tdigest import TDigest
+from app.models.statistics import ExamStatistics
 from app.services.session_service import SessionService
+from app.services.statistics_service import StatisticsService
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -351,4 +359,564 @@ class TestSessionService:
         assert exam_session.student_id == sample_user.id
         assert exam_session.exam_id == published_exam.id
         assert exam_session.status == SessionStatus.IN_PROGRESS
-        assert exam_session.attempt_number >= 1
\ No newline at end of file
+        assert exam_session.attempt_number >= 1
+
+class TestExamStatistics:
+    """Tests para las estadísticas materializadas de exámenes"""
+    
+    def test_statistics_updated_on_start_and_finish(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que iniciar y finalizar una sesión actualiza los agregados"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        stats = session.get(ExamStatistics, published_exam.id)
+        assert stats is not None
+        assert stats.attempt_count == 1
+        assert stats.completed_count == 0
+        
+        SessionService.finish_exam_session(exam_session.id, session)
+        
+        response = client.get(f"/api/v1/exams/{published_exam.id}/statistics")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["attempts_count"] == 1
+        assert data["sessions_completed"] == 1
+        assert sum(data["score_histogram"]) == 1
+    
+    def test_record_attempt_increments_in_place(self, session: Session, published_exam: Exam):
+        """Test el contador de intentos se crea y se incrementa con un upsert"""
+        for _ in range(3):
+            StatisticsService.record_attempt(published_exam.id, session)
+        session.commit()
+        
+        stats = session.get(ExamStatistics, published_exam.id)
+        assert stats.attempt_count == 3
+        assert stats.completed_count == 0
+    
+    def test_record_completion_aggregates(self, session: Session, sample_user: User, published_exam: Exam):
+        """Test media, desviación e histograma a partir de sumas incrementales"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        for score in (40.0, 80.0, 100.0):
+            exam_session = ExamSession(
+                student_id=sample_user.id,
+                exam_id=published_exam.id,
+                status=SessionStatus.COMPLETED,
+                score=score
+            )
+            StatisticsService.record_completion(exam_session, session)
+        session.commit()
+        
+        summary = StatisticsService.get_summary(published_exam.id, session)
+        assert summary["sessions_completed"] == 3
+        assert summary["average_score"] == pytest.approx(73.33, abs=0.01)
+        assert summary["score_stddev"] == pytest.approx(24.94, abs=0.01)
+        assert summary["score_histogram"][4] == 1
+        assert summary["score_histogram"][8] == 1
+        assert summary["score_histogram"][9] == 1
+    
+    def test_rebuild_matches_incremental_histogram(self, session: Session, sample_user: User, published_exam: Exam):
+        """Test la reconstrucción asigna las mismas cubetas que record_completion (sin redondear)"""
+        scores = (66.67, 85.5, 99.99, 100.0)
+        session.add_all([
+            ExamSession(student_id=sample_user.id, exam_id=published_exam.id, status=SessionStatus.COMPLETED, score=score)
+            for score in scores
+        ])
+        session.commit()
+        
+        StatisticsService.rebuild(published_exam.id, session)
+        session.commit()
+        
+        expected = [0] * 10
+        for score in scores:
+            expected[StatisticsService.score_bucket(score)] += 1
+        assert StatisticsService.get_summary(published_exam.id, session)["score_histogram"] == expected
+        assert expected[6] == 1 and expected[8] == 1
+    
+    def test_statistics_without_sessions(self, session: Session, draft_exam: Exam):
+        """Test estadísticas de un examen sin sesiones"""
+        if draft_exam.id is None:
+            pytest.skip("Exam ID not available")
+        
+        summary = StatisticsService.get_summary(draft_exam.id, session)
+        assert summary["attempts_count"] == 0
+        assert summary["sessions_completed"] == 0
+        assert summary["average_score"] == 0.0
+    
+    def _record_scores(self, session: Session, user: User, exam: Exam, scores: list) -> None:
+        for score in scores:
+            exam_session = ExamSession(
+                student_id=user.id, exam_id=exam.id, status=SessionStatus.COMPLETED, score=score
+            )
+            StatisticsService.record_completion(exam_session, session)
+        session.commit()
+    
+    def test_score_distribution(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test mediana, percentiles e histograma desde el t-digest persistido"""
+        self._record_scores(session, sample_user, published_exam, [float(score) for score in range(1, 101)])
+        
+        response = client.get(
+            f"/api/v1/exams/{published_exam.id}/statistics/distribution",
+            params={"q": [0.25, 0.75], "bins": 4}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 100
+        assert data["median"] == pytest.approx(50.5, abs=0.5)
+        assert data["p90"] == pytest.approx(90.5, abs=0.5)
+        assert [p["score"] for p in data["percentiles"]] == pytest.approx([25.5, 75.5], abs=0.5)
+        assert [b["upper"] for b in data["histogram"]] == [25.0, 50.0, 75.0, 100.0]
+        assert sum(b["count"] for b in data["histogram"]) == pytest.approx(100, abs=0.1)
+        assert data["histogram"][0]["count"] == pytest.approx(24.5, abs=1)
+        
+        summary = client.get(f"/api/v1/exams/{published_exam.id}/statistics").json()
+        assert summary["median_score"] == data["median"]
+    
+    def test_distribution_histogram_matches_summary(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test el histograma del digest coincide con el de /statistics (sin repartir peso entre cubetas)"""
+        self._record_scores(session, sample_user, published_exam, [60.0] * 10 + [80.0] * 10)
+        
+        data = client.get(f"/api/v1/exams/{published_exam.id}/statistics/distribution", params={"bins": 10}).json()
+        summary = client.get(f"/api/v1/exams/{published_exam.id}/statistics").json()
+        
+        assert [b["count"] for b in data["histogram"]] == [0, 0, 0, 0, 0, 0, 10, 0, 10, 0]
+        assert [b["count"] for b in data["histogram"]] == summary["score_histogram"]
+    
+    def test_percentile_rank(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test rango percentil de una puntuación y en la respuesta de finalizar"""
+        self._record_scores(session, sample_user, published_exam, [10.0, 20.0, 30.0, 40.0])
+        
+        url = f"/api/v1/exams/{published_exam.id}/statistics/percentile-rank"
+        assert client.get(url, params={"score": 5}).json()["percentile_rank"] == 0.0
+        assert client.get(url, params={"score": 30}).json()["percentile_rank"] == 62.5
+        assert client.get(url, params={"score": 100}).json()["percentile_rank"] == 100.0
+        assert client.get(url, params={"score": 101}).status_code == 422
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/finish")
+        assert response.json()["score"] == 0.0
+        assert response.json()["percentile_rank"] == 10.0
+    
+    def test_distribution_empty_and_rebuild(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test examen sin puntuaciones y reconstrucción del digest desde las sesiones"""
+        data = client.get(f"/api/v1/exams/{published_exam.id}/statistics/distribution").json()
+        assert data["count"] == 0
+        assert data["median"] is None
+        assert client.get("/api/v1/exams/9999/statistics/distribution").status_code == 404
+        
+        session.add_all([
+            ExamSession(student_id=sample_user.id, exam_id=published_exam.id, status=SessionStatus.COMPLETED, score=score)
+            for score in (60.0, 70.0, 80.0)
+        ])
+        session.commit()
+        StatisticsService.rebuild(published_exam.id, session)
+        session.commit()
+        
+        data = client.get(f"/api/v1/exams/{published_exam.id}/statistics/distribution").json()
+        assert data["count"] == 3
+        assert data["median"] == 70.0
+
+
+class TestTDigest:
+    """Tests para el t-digest de puntuaciones"""
+    
+    def test_quantiles_close_to_exact(self):
+        """Test error de cuantiles y CDF acotado con pocos centroides"""
+        rng = random.Random(3)
+        values = sorted(min(100.0, max(0.0, rng.gauss(65, 15))) for _ in range(20000))
+        digest = TDigest(100)
+        for value in values:
+            digest.add(value)
+        
+        assert len(digest) < 200
+        for q in (0.01, 0.1, 0.5, 0.9):
+            assert digest.quantile(q) == pytest.approx(values[int(q * len(values))], abs=0.5)
+        below_50 = sum(1 for value in values if value < 50) / len(values)
+        assert digest.cdf(50) == pytest.approx(below_50, abs=0.005)
+    
+    def test_serialization_round_trip(self):
+        """Test que el digest persistido conserva cuantiles, extremos y se puede seguir ampliando"""
+        digest = TDigest(50)
+        for value in range(1000):
+            digest.add(value % 97)
+        data = digest.to_bytes()
+        restored = TDigest.from_bytes(data)
+        
+        assert len(data) < 2000
+        assert restored.count == 1000
+        assert (restored.min, restored.max) == (0, 96)
+        assert restored.quantile(0.5) == digest.quantile(0.5)
+        restored.add(500)
+        assert restored.quantile(1.0) == 500
+    
+    def test_tied_scores(self):
+        """Test que los empates (notas en pasos de 20) no se cuentan de más en CDF e histograma"""
+        counts = {0: 250, 20: 500, 40: 1000, 60: 1500, 80: 1250, 100: 500}
+        values = [score for score, count in counts.items() for _ in range(count)]
+        random.Random(7).shuffle(values)
+        digest = TDigest(100)
+        for value in values:
+            digest.add(value)
+        
+        assert len(digest) == len(counts)
+        # Rango medio: los empates cuentan la mitad
+        assert digest.cdf(40) == pytest.approx(0.25, abs=0.01)
+        assert digest.cdf(60) == pytest.approx(0.50, abs=0.01)
+        # Cada nota cuenta en su intervalo [inferior, superior); el último incluye el 100
+        assert digest.histogram([0, 20, 40, 60, 80, 100]) == [250, 500, 1000, 1500, 1750]
+        assert digest.histogram([0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]) == [
+            250, 0, 500, 0, 1000, 0, 1500, 0, 1250, 500
+        ]
+        
+        # Con más valores distintos que la compresión los empates siguen agrupados
+        wide = [round(random.Random(index).gauss(60, 15)) for index in range(5000)]
+        digest = TDigest(50)
+        for value in wide:
+            digest.add(value)
+        exact = (sum(value < 60 for value in wide) + sum(value == 60 for value in wide) / 2) / len(wide)
+        assert digest.cdf(60) == pytest.approx(exact, abs=0.01)
+    
+    def test_merge(self):
+        """Test que fusionar dos digests equivale a uno con todos los valores"""
+        left, right = TDigest(), TDigest()
+        for value in range(0, 1000, 2):
+            left.add(value)
+        for value in range(1, 1000, 2):
+            right.add(value)
+        left.merge(right)
+        
+        assert left.count == 1000
+        assert left.quantile(0.5) == pytest.approx(499.5, abs=2)
+
+
+class TestBatchAnswers:
+    """Tests para el guardado de respuestas en lote con upsert"""
+    
+    def test_batch_upsert_answers(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que el lote inserta y después reemplaza respuestas sin duplicar"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        question = session.exec(select(Question).where(Question.exam_id == published_exam.id)).first()
+        
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/answers/batch", json=[
+            {"question_id": question.id, "selected_option_id": None},
+            {"question_id": 9999, "selected_option_id": None},
+        ])
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/answers/batch", json=[
+            {"question_id": question.id, "selected_option_ids": [1, 2]},
+        ])
+        assert response.status_code == 200
+        assert response.json()[0]["selected_option_ids"] == [1, 2]
+        
+        answers = client.get(f"/api/v1/sessions/{exam_session.id}/answers").json()
+        assert len(answers) == 2
+    
+    def test_create_answer_replaces_previous(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que responder dos veces a la misma pregunta no duplica la fila"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        first = client.post(f"/api/v1/sessions/{exam_session.id}/answers", json={"question_id": 1, "selected_option_id": 1})
+        second = client.post(f"/api/v1/sessions/{exam_session.id}/answers", json={"question_id": 1, "selected_option_id": 2})
+        assert first.status_code == 201
+        assert second.status_code == 201
+        assert first.json()["id"] == second.json()["id"]
+        assert second.json()["selected_option_id"] == 2
+    
+    def test_batch_session_not_in_progress(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test lote sobre una sesión finalizada"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        SessionService.finish_exam_session(exam_session.id, session)
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/answers/batch", json=[{"question_id": 1}])
+        assert response.status_code == 400
+
+
+class TestIdempotencyKey:
+    """Tests para reintentos con cabecera Idempotency-Key"""
+    
+    def test_answer_retry_returns_stored_response(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que un reintento devuelve la misma respuesta sin nuevas escrituras"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/answers"
+        payload = {"question_id": 1, "selected_option_id": 1}
+        headers = {"Idempotency-Key": "answer-1"}
+        
+        first = client.post(url, json=payload, headers=headers)
+        # Cambiar la fila en BD: el reintento no debe leerla ni modificarla
+        answer = session.exec(select(StudentAnswer)).one()
+        answer.selected_option_id = 3
+        session.add(answer)
+        session.commit()
+        retry = client.post(url, json=payload, headers=headers)
+        
+        assert first.status_code == 201
+        assert retry.status_code == 201
+        assert retry.json() == first.json()
+        session.refresh(answer)
+        assert answer.selected_option_id == 3
+    
+    def test_answer_key_reused_with_other_payload(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test reutilizar la clave con otro cuerpo es un error"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/answers"
+        headers = {"Idempotency-Key": "answer-1"}
+        
+        client.post(url, json={"question_id": 1, "selected_option_id": 1}, headers=headers)
+        response = client.post(url, json={"question_id": 1, "selected_option_id": 2}, headers=headers)
+        assert response.status_code == 422
+    
+    def test_finish_retry(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que reintentar la finalización no devuelve error"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/finish"
+        
+        first = client.post(url, headers={"Idempotency-Key": "finish-1"})
+        retry = client.post(url, headers={"Idempotency-Key": "finish-1"})
+        without_key = client.post(url)
+        
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert without_key.status_code == 400
+    
+    def test_retry_with_redis_store(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient, redis):
+        """Test que las respuestas se guardan en Redis con caducidad"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/finish"
+        
+        first = client.post(url, headers={"Idempotency-Key": "finish-1"})
+        retry = client.post(url, headers={"Idempotency-Key": "finish-1"})
+        
+        assert retry.json() == first.json()
+        keys = redis.keys("exam-scan:idempotency:*")
+        assert len(keys) == 1
+        assert redis.ttl(keys[0]) > 0
+    
+    @pytest.mark.parametrize("use_redis", [False, True])
+    def test_retry_while_in_progress(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient, request, use_redis):
+        """Test que un reintento concurrente recibe 409 mientras la clave está reservada"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        if use_redis:
+            request.getfixturevalue("redis")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/finish"
+        scope, fingerprint = f"finish:{exam_session.id}", request_fingerprint(None)
+        # Otra petición con la misma clave se está ejecutando
+        assert reserve_key(scope, "finish-1", fingerprint) is None
+        
+        response = client.post(url, headers={"Idempotency-Key": "finish-1"})
+        
+        assert response.status_code == 409
+        assert response.headers["Retry-After"] == "1"
+        session.refresh(exam_session)
+        assert exam_session.status == SessionStatus.IN_PROGRESS
+        
+        # Al guardar la respuesta los reintentos la reciben
+        store_response(scope, "finish-1", fingerprint, 200, {"id": exam_session.id})
+        assert client.post(url, headers={"Idempotency-Key": "finish-1"}).json() == {"id": exam_session.id}
+    
+    def test_failed_request_releases_key(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient, redis):
+        """Test que una petición fallida no deja la clave reservada"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        url = f"/api/v1/sessions/{exam_session.id}/answers"
+        headers = {"Idempotency-Key": "answer-1"}
+        exam_session.status = SessionStatus.COMPLETED
+        session.add(exam_session)
+        session.commit()
+        
+        failed = client.post(url, json={"question_id": 1, "selected_option_id": 1}, headers=headers)
+        
+        assert failed.status_code == 400
+        assert redis.keys("exam-scan:idempotency:*") == []
+        
+        exam_session.status = SessionStatus.IN_PROGRESS
+        session.add(exam_session)
+        session.commit()
+        retry = client.post(url, json={"question_id": 1, "selected_option_id": 1}, headers=headers)
+        assert retry.status_code == 201
+
+
+class TestSessionExpiry:
+    """Tests para el barrido de sesiones con tiempo agotado"""
+    
+    def test_expire_overdue_sessions(self, session: Session, sample_user: User, published_exam: Exam):
+        """Test que solo se expiran las sesiones en curso con fecha límite pasada"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        overdue = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        deadline = overdue.end_time
+        
+        # Antes de la fecha límite no se expira nada
+        assert SessionService.expire_overdue_sessions(session, now=deadline - timedelta(minutes=1)) == 0
+        
+        expired = SessionService.expire_overdue_sessions(session, now=deadline + timedelta(seconds=1))
+        
+        assert expired == 1
+        session.refresh(overdue)
+        assert overdue.status == SessionStatus.EXPIRED
+        assert overdue.end_time == deadline
+        assert overdue.score == 0.0
+        stats = session.get(ExamStatistics, published_exam.id)
+        assert stats.completed_count == 1
+    
+    def test_expire_in_batches(self, session: Session, sample_user: User, published_exam: Exam):
+        """Test que el barrido procesa todas las sesiones en varios lotes"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        now = datetime.utcnow()
+        for minutes in range(5):
+            session.add(ExamSession(
+                student_id=sample_user.id,
+                exam_id=published_exam.id,
+                status=SessionStatus.IN_PROGRESS,
+                end_time=now - timedelta(minutes=minutes + 1),
+                earned_points=0.0
+            ))
+        session.add(ExamSession(
+            student_id=sample_user.id,
+            exam_id=published_exam.id,
+            status=SessionStatus.IN_PROGRESS,
+            end_time=None
+        ))
+        session.commit()
+        
+        assert SessionService.expire_overdue_sessions(session, now=now, batch_size=2) == 5
+        statuses = session.exec(select(ExamSession.status)).all()
+        assert statuses.count(SessionStatus.EXPIRED) == 5
+        assert statuses.count(SessionStatus.IN_PROGRESS) == 1
+    
+    def test_time_remaining_does_not_finish_session(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que consultar el tiempo restante no modifica la sesión"""
+        if published_exam.id is None or sample_user.id is None:
+            pytest.skip("Required IDs not available")
+        
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        exam_session.end_time = datetime.utcnow() - timedelta(minutes=5)
+        session.add(exam_session)
+        session.commit()
+        
+        response = client.get(f"/api/v1/sessions/{exam_session.id}/time-remaining")
+        
+        assert response.status_code == 200
+        assert response.json()["time_remaining"] == 0
+        session.refresh(exam_session)
+        assert exam_session.status == SessionStatus.IN_PROGRESS
+    
+    def test_answer_after_deadline_expires_session(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que una respuesta fuera de plazo se rechaza y cierra la sesión como EXPIRED"""
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        question = published_exam.questions[0]
+        deadline = datetime.utcnow() - timedelta(seconds=1)
+        exam_session.end_time = deadline
+        session.add(exam_session)
+        session.commit()
+        
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/answers", json={"question_id": question.id})
+        
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Session time has expired"
+        session.refresh(exam_session)
+        assert exam_session.status == SessionStatus.EXPIRED
+        assert exam_session.end_time == deadline
+        assert session.exec(select(StudentAnswer)).all() == []
+    
+    def test_finish_after_deadline_closes_as_expired(self, session: Session, sample_user: User, published_exam: Exam, client: TestClient):
+        """Test que finalizar fuera de plazo sella la sesión como EXPIRED en su fecha límite"""
+        exam_session = SessionService.start_exam_session(sample_user.id, published_exam.id, session)
+        deadline = datetime.utcnow() - timedelta(seconds=1)
+        exam_session.end_time = deadline
+        session.add(exam_session)
+        session.commit()
+        
+        response = client.post(f"/api/v1/sessions/{exam_session.id}/finish")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == SessionStatus.EXPIRED.value
+        session.refresh(exam_session)
+        assert exam_session.end_time == deadline
+        # Ya cerrada: ni otra finalización ni el barrido la vuelven a sellar
+        assert client.post(f"/api/v1/sessions/{exam_session.id}/finish").status_code == 400
+        assert SessionService.expire_overdue_sessions(session) == 0
+        assert session.get(ExamStatistics, published_exam.id).completed_count == 1
+
+
+class TestAdmissionControl:
+    """Tests para el control de admisión de inicios simultáneos"""
+    
+    @pytest.fixture(autouse=True)
+    def admission_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "ADMISSION_RATE_PER_SECOND", 1.0)
+        monkeypatch.setattr(settings, "ADMISSION_BURST", 2)
+        monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_SECONDS", 2.0)
+    
+    def _reserve_many(self, count: int) -> list:
+        return [AdmissionController.reserve(exam_id=1, now=1000.0) for _ in range(count)]
+    
+    def test_burst_then_queue_then_reject(self):
+        """Test la ráfaga entra sin esperar, después se espacia y al final se rechaza"""
+        admissions = self._reserve_many(5)
+        
+        assert [a.admitted for a in admissions] == [True, True, True, True, False]
+        assert [a.wait_seconds for a in admissions[:4]] == [0.0, 0.0, 1.0, 2.0]
+        assert admissions[4].retry_after == 1
+        assert admissions[4].position == 3
+        # Otro examen tiene su propio bucket
+        assert AdmissionController.reserve(exam_id=2, now=1000.0).wait_seconds == 0.0
+    
+    def test_tokens_refill(self):
+        """Test el bucket se recupera con el tiempo"""
+        self._reserve_many(4)
+        assert AdmissionController.reserve(exam_id=1, now=1010.0).wait_seconds == 0.0
+    
+    def test_redis_bucket(self, redis):
+        """Test la reserva atómica en Redis da el mismo resultado"""
+        admissions = self._reserve_many(5)
+        
+        assert [a.admitted for a in admissions] == [True, True, True, True, False]
+        assert [a.wait_seconds for a in admissions[:4]] == [0.0, 0.0, 1.0, 2.0]
+        assert redis.exists("exam-scan:admission:1")
+    
+    def test_create_session_rejected_with_retry_after(self, sample_user: User, published_exam: Exam, client: TestClient, monkeypatch):
+        """Test el endpoint responde 429 con Retry-After y la posición"""
+        monkeypatch.setattr(settings, "ADMISSION_BURST", 1)
+        monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_SECONDS", 0.0)
+        payload = {"exam_id": published_exam.id, "student_id": sample_user.id}
+        
+        first = client.post("/api/v1/sessions/", json=payload)
+        second = client.post("/api/v1/sessions/", json=payload)
+        
+        assert first.status_code == 201
+        assert first.json()["attempt_number"] == 1
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        assert second.json()["detail"]["position"] >= 1
@@ -0,0 +1,176 @@
+"""
+Tests para etiquetas, su asignación y el filtrado por facetas
+"""
+
+import random
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.core.bitmap import RoaringBitmap, ARRAY_MAX_SIZE
+from app.models.user import User
+from app.models.exam import Exam
+from app.models.question import Question, QuestionDifficulty
+from app.models.tag import Tag
+
+
+@pytest.fixture(name="tagged_bank")
+def tagged_bank_fixture(session: Session, sample_user: User):
+    """Banco de preguntas en dos asignaturas con etiquetas"""
+    math = Exam(title="Álgebra", subject="Matemáticas", creator_id=sample_user.id)
+    history = Exam(title="Edad Media", subject="Historia", creator_id=sample_user.id)
+    tags = [Tag(name="repaso"), Tag(name="examen final"), Tag(name="sin usar")]
+    session.add_all([math, history, *tags])
+    session.commit()
+
+    # Las etiquetas ya están en la sesión: sin autoflush mientras se enlazan
+    with session.no_autoflush:
+        questions = [
+            Question(exam_id=math.id, text="Q1", difficulty=QuestionDifficulty.EASY, tags=[tags[0]]),
+            Question(exam_id=math.id, text="Q2", difficulty=QuestionDifficulty.HARD, tags=[tags[0], tags[1]]),
+            Question(exam_id=math.id, text="Q3", difficulty=QuestionDifficulty.HARD, tags=[tags[1]]),
+            Question(exam_id=history.id, text="Q4", difficulty=QuestionDifficulty.HARD, tags=[tags[0], tags[1]]),
+            Question(exam_id=history.id, text="Q5", difficulty=QuestionDifficulty.EASY),
+        ]
+        session.add_all(questions)
+    session.commit()
+    return {"exams": [math, history], "tags": tags, "questions": questions}
+
+
+class TestTags:
+
+    def test_create_and_list_tags(self, client: TestClient):
+        assert client.post("/api/v1/tags/", json={"name": "repaso"}).status_code == 201
+        assert client.post("/api/v1/tags/", json={"name": "álgebra", "color": "#FF0000"}).status_code == 201
+
+        response = client.get("/api/v1/tags/")
+        assert response.status_code == 200
+        assert [tag["name"] for tag in response.json()] == ["repaso", "álgebra"]
+
+    def test_duplicate_tag_name(self, client: TestClient):
+        client.post("/api/v1/tags/", json={"name": "repaso"})
+        assert client.post("/api/v1/tags/", json={"name": "repaso"}).status_code == 400
+
+    def test_set_question_and_exam_tags(self, client: TestClient, tagged_bank: dict):
+        question = tagged_bank["questions"][4]
+        repaso, final, _ = tagged_bank["tags"]
+
+        response = client.put(f"/api/v1/questions/{question.id}/tags", json={"tag_ids": [final.id, repaso.id]})
+        assert response.status_code == 200
+        assert [tag["name"] for tag in response.json()] == ["examen final", "repaso"]
+
+        response = client.put(f"/api/v1/exams/{tagged_bank['exams'][0].id}/tags", json={"tag_ids": [repaso.id]})
+        assert response.status_code == 200
+        assert [tag["id"] for tag in response.json()] == [repaso.id]
+
+        # Reemplaza, no acumula
+        response = client.put(f"/api/v1/questions/{question.id}/tags", json={"tag_ids": []})
+        assert response.json() == []
+
+    def test_set_tags_unknown_tag(self, client: TestClient, tagged_bank: dict):
+        question = tagged_bank["questions"][0]
+        response = client.put(f"/api/v1/questions/{question.id}/tags", json={"tag_ids": [9999]})
+        assert response.status_code == 404
+
+    def test_delete_tag_removes_assignments(self, client: TestClient, tagged_bank: dict):
+        repaso = tagged_bank["tags"][0]
+        assert client.delete(f"/api/v1/tags/{repaso.id}").status_code == 204
+
+        facets = client.get("/api/v1/search/facets").json()["tags"]
+        assert repaso.id not in [facet["tag_id"] for facet in facets]
+
+
+class TestFacetFilter:
+
+    def test_combined_filters_intersect(self, client: TestClient, tagged_bank: dict):
+        repaso, final, _ = tagged_bank["tags"]
+        questions = tagged_bank["questions"]
+
+        response = client.get("/api/v1/search/facets", params={
+            "tag_ids": [repaso.id, final.id], "difficulty": "hard", "subject": "Matemáticas"
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["ids"] == [questions[1].id]
+
+    def test_facet_counts_within_result(self, client: TestClient, tagged_bank: dict):
+        repaso, final, _ = tagged_bank["tags"]
+
+        data = client.get("/api/v1/search/facets", params={"tag_ids": [repaso.id]}).json()
+
+        assert data["total"] == 3
+        assert [(facet["name"], facet["count"]) for facet in data["tags"]] == [("repaso", 3), ("examen final", 2)]
+        assert [(facet["value"], facet["count"]) for facet in data["subjects"]] == [("Matemáticas", 2), ("Historia", 1)]
+        assert [(facet["value"], facet["count"]) for facet in data["difficulties"]] == [("hard", 2), ("easy", 1)]
+
+    def test_pagination_and_unknown_values(self, client: TestClient, tagged_bank: dict):
+        ids = [question.id for question in tagged_bank["questions"]]
+
+        data = client.get("/api/v1/search/facets", params={"limit": 2, "offset": 1}).json()
+        assert data["total"] == 5
+        assert data["ids"] == ids[1:3]
+
+        data = client.get("/api/v1/search/facets", params={"subject": "Física"}).json()
+        assert data["total"] == 0
+        assert data["tags"] == []
+
+    def test_exam_facets(self, client: TestClient, tagged_bank: dict):
+        math, history = tagged_bank["exams"]
+        client.put(f"/api/v1/exams/{history.id}/tags", json={"tag_ids": [tagged_bank["tags"][2].id]})
+
+        data = client.get("/api/v1/search/facets", params={"entity": "exam"}).json()
+        assert data["ids"] == [math.id, history.id]
+        assert [(facet["name"], facet["count"]) for facet in data["tags"]] == [("sin usar", 1)]
+
+        response = client.get("/api/v1/search/facets", params={"entity": "exam", "difficulty": "easy"})
+        assert response.status_code == 400
+
+    def test_index_invalidated_by_writes(self, client: TestClient, tagged_bank: dict):
+        final = tagged_bank["tags"][1]
+        assert client.get("/api/v1/search/facets", params={"tag_ids": [final.id]}).json()["total"] == 3
+
+        question = tagged_bank["questions"][4]
+        client.put(f"/api/v1/questions/{question.id}/tags", json={"tag_ids": [final.id]})
+        assert client.get("/api/v1/search/facets", params={"tag_ids": [final.id]}).json()["total"] == 4
+
+        client.delete(f"/api/v1/questions/{question.id}")
+        assert client.get("/api/v1/search/facets", params={"tag_ids": [final.id]}).json()["total"] == 3
+
+
+class TestRoaringBitmap:
+
+    def test_matches_set_semantics(self):
+        rng = random.Random(7)
+        # Bloques densos (bitset), dispersos (array) y en varios bloques de 2^16
+        left_values = set(rng.sample(range(0, 70000), 12000)) | {200000, 200001}
+        right_values = set(rng.sample(range(0, 70000), 300)) | set(range(65536, 65536 + 5000)) | {200001}
+        left, right = RoaringBitmap(left_values), RoaringBitmap(right_values)
+
+        expected = left_values & right_values
+        assert list(left & right) == sorted(expected)
+        assert left.intersection_len(right) == len(expected)
+        assert len(left) == len(left_values)
+        assert list(left) == sorted(left_values)
+        assert 200000 in left and 200002 not in left
+
+    def test_facet_counts_at_scale(self):
+        rng = random.Random(11)
+        ids = range(1, 200001)
+        result_values = set(rng.sample(ids, 100000))
+        tag_values = [set(rng.sample(ids, size)) for size in (50, 3000, 20000, 60000)]
+        result = RoaringBitmap(result_values)
+
+        for values in tag_values:
+            bitmap = RoaringBitmap(values)
+            assert result.intersection_len(bitmap) == len(result_values & values)
+            assert len(result & bitmap) == len(result_values & values)
+
+    def test_dense_intersection_shrinks_to_array(self):
+        evens = RoaringBitmap(range(0, 65536, 2))
+        multiples_of_three = RoaringBitmap(range(0, 65536, 3))
+        assert len(evens) > ARRAY_MAX_SIZE
+
+        result = evens & multiples_of_three
+        assert list(result) == list(range(0, 65536, 6))
+        assert len(RoaringBitmap(range(0, 65536, 2)) & RoaringBitmap([1, 3, 5])) == 0
@@ -0,0 +1,142 @@
+"""
+Tests para el temporizador push de sesiones (SSE)
+"""
+
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.models.user import User
+from app.models.exam import Exam, ExamStatus
+from app.services.session_service import SessionService
+from app.services.timer_hub import TimerHub, TimerEvent
+
+
+@pytest.fixture(name="timed_exam")
+def timed_exam_fixture(session: Session, sample_user: User):
+    """Examen publicado con duración"""
+    exam = Exam(
+        title="Timed Exam",
+        subject="History",
+        creator_id=sample_user.id,
+        status=ExamStatus.PUBLISHED,
+        duration_minutes=30,
+        max_attempts=3
+    )
+    session.add(exam)
+    session.commit()
+    session.refresh(exam)
+    return exam
+
+
+class TestTimerHub:
+    """Tests para TimerHub"""
+
+    def test_deadline_then_expired(self):
+        """Test el cliente recibe la fecha límite y después la expiración"""
+        async def scenario():
+            hub = TimerHub(heartbeat_seconds=60)
+            queue = hub.subscribe(1, datetime.utcnow() + timedelta(milliseconds=50))
+            first = await asyncio.wait_for(queue.get(), 1)
+            second = await asyncio.wait_for(queue.get(), 1)
+            hub.unsubscribe(1, queue)
+            await hub.stop()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first.event == "deadline"
+        assert second.event == "expired"
+        assert second.is_final
+
+    def test_heartbeats_fan_out(self):
+        """Test una sola tarea envía latidos a todos los clientes"""
+        async def scenario():
+            hub = TimerHub(heartbeat_seconds=0.05)
+            queues = [hub.subscribe(session_id, None) for session_id in (1, 1, 2)]
+            task = hub._task
+            events = []
+            for queue in queues:
+                await queue.get()  # deadline
+                events.append(await asyncio.wait_for(queue.get(), 1))
+            same_task = hub._task is task
+            for session_id, queue in zip((1, 1, 2), queues):
+                hub.unsubscribe(session_id, queue)
+            await hub.stop()
+            return events, same_task, hub.connections
+
+        events, same_task, connections = asyncio.run(scenario())
+        assert [event.event for event in events] == ["heartbeat"] * 3
+        assert events[0].data["seconds_remaining"] is None
+        assert same_task
+        assert connections == 0
+
+    def test_broadcast_from_thread_without_redis(self):
+        """Test sin Redis el cierre publicado desde el threadpool llega al cliente"""
+        async def scenario():
+            hub = TimerHub(heartbeat_seconds=60)
+            queue = hub.subscribe(1, None)
+            await queue.get()  # deadline
+            await asyncio.to_thread(hub.broadcast, 1, TimerEvent("closed", {"session_id": 1, "status": "completed"}))
+            event = await asyncio.wait_for(queue.get(), 1)
+            hub.unsubscribe(1, queue)
+            await hub.stop()
+            return event
+
+        event = asyncio.run(scenario())
+        assert event.event == "closed"
+        assert event.data["status"] == "completed"
+
+    def test_broadcast_reaches_every_worker_via_redis(self, redis):
+        """Test con Redis el cierre llega a los hubs de todos los workers"""
+        async def scenario():
+            workers = [TimerHub(heartbeat_seconds=60), TimerHub(heartbeat_seconds=60)]
+            queues = [hub.subscribe(7, None) for hub in workers]
+            for hub, queue in zip(workers, queues):
+                hub.start_listener()
+                await queue.get()  # deadline
+            await asyncio.sleep(0.1)  # suscripciones activas
+
+            await asyncio.to_thread(workers[0].broadcast, 7, TimerEvent("closed", {"session_id": 7, "status": "expired"}))
+            events = [await asyncio.wait_for(queue.get(), 3) for queue in queues]
+            for hub, queue in zip(workers, queues):
+                hub.unsubscribe(7, queue)
+                await hub.stop()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [event.event for event in events] == ["closed", "closed"]
+        assert all(event.is_final for event in events)
+
+
+class TestTimerEndpoint:
+    """Tests para GET /sessions/{id}/timer"""
+
+    def test_timer_expired_session(self, session: Session, sample_user: User, timed_exam: Exam, client: TestClient):
+        """Test stream de una sesión cuya fecha límite ya pasó"""
+        exam_session = SessionService.start_exam_session(sample_user.id, timed_exam.id, session)
+        exam_session.end_time = datetime.utcnow() - timedelta(seconds=1)
+        session.add(exam_session)
+        session.commit()
+
+        response = client.get(f"/api/v1/sessions/{exam_session.id}/timer")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "event: deadline" in response.text
+        assert "event: expired" in response.text
+
+    def test_timer_finished_session(self, session: Session, sample_user: User, timed_exam: Exam, client: TestClient):
+        """Test stream de una sesión ya finalizada"""
+        exam_session = SessionService.start_exam_session(sample_user.id, timed_exam.id, session)
+        SessionService.finish_exam_session(exam_session.id, session)
+
+        response = client.get(f"/api/v1/sessions/{exam_session.id}/timer")
+
+        assert response.status_code == 200
+        assert response.text.startswith("event: closed")
+        assert '"status": "completed"' in response.text
+
+    def test_timer_session_not_found(self, client: TestClient):
+        response = client.get("/api/v1/sessions/9999/timer")
+        assert response.status_code == 404